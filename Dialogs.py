@@ -1,13 +1,23 @@
 import sqlite3
 from PySide6.QtWidgets import (QVBoxLayout, QHBoxLayout,
-                             QLabel, QLineEdit, QPushButton, QComboBox, QTableWidget,
-                             QTableWidgetItem,
+                             QLabel, QLineEdit, QPushButton, QComboBox, QTableView,
                              QMessageBox, QDialog, QFormLayout, QSpinBox, QHeaderView,
-                             QCheckBox, QDoubleSpinBox)
-from PySide6.QtGui import QFont
+                             QCheckBox, QDoubleSpinBox, QTableWidget, QTableWidgetItem, QFileDialog)
+from PySide6.QtGui import QFont, QKeySequence, QShortcut
 from PySide6.QtCore import Qt
 
-DB_NAME = "gestion_scolaire.db"
+from database import read_cursor, submit_write
+from bulletins import safe_filename, student_bulletin
+from exports import DATASETS
+from deliberation import export_pv, load_deliberation, pv_header, pv_row
+from grades import load_cohort_grades, parse_grade, upsert_cohort_grades
+from models import BulletinTableModel, CohortGradesModel, LazyQueryModel
+from rollover import insert_rollover, next_academic_year, preview_rollover
+import profiling
+import queries
+import reference
+import tablefiles
+from workers import WriteWatcher
 
 
 class DepartmentDialog(QDialog):
@@ -93,11 +103,8 @@ class ProgramDialog(QDialog):
 
     def load_departments(self):
         try:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id, name FROM departments ORDER BY name")
-                for dep_id, name in cursor.fetchall():
-                    self.department_combo.addItem(name, dep_id)
+            for dep_id, name, _ in reference.departments():
+                self.department_combo.addItem(name, dep_id)
         except sqlite3.Error as e:
             QMessageBox.warning(self, "Erreur", f"Impossible de charger les départements: {e}")
 
@@ -241,21 +248,15 @@ class EnrollStudentDialog(QDialog):
 
     def load_programs(self):
         try:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id, name FROM programs ORDER BY name")
-                for prog_id, name in cursor.fetchall():
-                    self.program_combo.addItem(name, prog_id)
+            for prog_id, name, *_ in reference.programs():
+                self.program_combo.addItem(name, prog_id)
         except sqlite3.Error as e:
             QMessageBox.warning(self, "Erreur", f"Chargement des formations impossible: {e}")
 
     def load_academic_years(self):
         try:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id, name FROM academic_years ORDER BY start_year DESC")
-                for year_id, name in cursor.fetchall():
-                    self.academic_year_combo.addItem(name, year_id)
+            for year_id, name, *_ in reference.academic_years():
+                self.academic_year_combo.addItem(name, year_id)
         except sqlite3.Error as e:
             QMessageBox.warning(self, "Erreur", f"Chargement des années académiques impossible: {e}")
 
@@ -380,11 +381,11 @@ class BulletinDialog(QDialog):
         self.academic_year_filter.currentIndexChanged.connect(self.refresh_bulletin)
         self.semester_filter.currentIndexChanged.connect(self.refresh_bulletin)
 
-        self.bulletin_table = QTableWidget()
-        self.bulletin_table.setColumnCount(5)
-        self.bulletin_table.setHorizontalHeaderLabels(["Semestre", "Unités d'Enseignement", "Note Finale", "Observation", "Crédits"])
+        self.bulletin_model = BulletinTableModel(self)
+        self.bulletin_table = QTableView()
+        self.bulletin_table.setModel(self.bulletin_model)
         self.bulletin_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.bulletin_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.bulletin_table.setEditTriggers(QTableView.NoEditTriggers)
         self.bulletin_table.setAlternatingRowColors(True)
         layout.addWidget(self.bulletin_table)
 
@@ -407,16 +408,11 @@ class BulletinDialog(QDialog):
         self.academic_year_filter.blockSignals(True)
         self.academic_year_filter.clear()
         try:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT DISTINCT ay.id, ay.name
-                    FROM academic_years ay
-                    JOIN students s ON s.academic_year_id = ay.id
-                    WHERE s.matricule = ?
-                    ORDER BY ay.start_year DESC
-                """, (self.student_matricule,))
-                for year_id, name in cursor.fetchall():
+            with read_cursor() as cursor:
+                cursor.execute(queries.STUDENT_ENROLLMENT_YEARS, (self.student_matricule,))
+                enrolled = {year_id for (year_id,) in cursor.fetchall()}
+            for year_id, name, *_ in reference.academic_years():
+                if year_id in enrolled:
                     self.academic_year_filter.addItem(name, year_id)
         except sqlite3.Error as e:
             QMessageBox.warning(self, "Erreur", f"Impossible de charger les années de l'étudiant: {e}")
@@ -427,7 +423,7 @@ class BulletinDialog(QDialog):
 
     def refresh_bulletin(self):
         """Met à jour l'affichage des notes à l'écran en fonction des filtres."""
-        self.bulletin_table.setRowCount(0)
+        self.bulletin_model.clear()
         self.bulletin_summary_label.setText("")
         
         academic_year_id = self.academic_year_filter.currentData()
@@ -436,70 +432,585 @@ class BulletinDialog(QDialog):
             return
 
         try:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT s.first_name, s.last_name, p.name, s.year_of_study
-                    FROM students s
-                    LEFT JOIN programs p ON s.program_id = p.id
-                    WHERE s.matricule = ? AND s.academic_year_id = ?
-                """, (self.student_matricule, academic_year_id))
-                student_info = cursor.fetchone()
-                
-                if not student_info:
-                    self.bulletin_info_label.setText("Aucune inscription trouvée pour cet étudiant cette année-là.")
-                    return
-
-                fname, lname, prog_name, year_of_study = student_info
-                self.current_year_of_study = year_of_study
-                
-                academic_year_text = self.academic_year_filter.currentText()
-                self.bulletin_info_label.setText(f"Bulletin de {lname.upper()} {fname} ({prog_name})\nAnnée Académique : {academic_year_text}")
-                
-                period_index = self.semester_filter.currentIndex()
-                query = """
-                    SELECT c.name, c.credits, c.semester, c.has_two_grades, g.grade1, g.grade2, g.resit_grade, d.validation_grade
-                    FROM grades g
-                    JOIN courses c ON g.course_id = c.id
-                    JOIN programs p ON c.program_id = p.id
-                    JOIN departments d ON p.department_id = d.id
-                    WHERE g.student_matricule = ? AND g.academic_year_id = ? AND c.year_of_study = ?
-                """
-                params = [self.student_matricule, academic_year_id, year_of_study]
-                
-                if period_index != 0: 
-                    query += " AND c.semester = ?"
-                    params.append(period_index)
-                query += " ORDER BY c.semester, c.name"
-
-                cursor.execute(query, params)
-                grades_data = cursor.fetchall()
-
-                total_points, total_credits, validated_credits = 0, 0, 0
-                for row_data in grades_data:
-                    c_name, credits, semester, has_two_grades, g1, g2, gr, validation_grade = row_data
-                    final_grade, status = MainWindow.calculate_final_grade_and_status(g1, g2, gr, has_two_grades, validation_grade)
-                    
-                    row = self.bulletin_table.rowCount()
-                    self.bulletin_table.insertRow(row)
-                    self.bulletin_table.setItem(row, 0, QTableWidgetItem(f"Semestre {semester}"))
-                    self.bulletin_table.setItem(row, 1, QTableWidgetItem(c_name))
-                    self.bulletin_table.setItem(row, 2, QTableWidgetItem(f"{final_grade:.2f}" if final_grade is not None else "-"))
-                    self.bulletin_table.setItem(row, 3, QTableWidgetItem(status))
-                    self.bulletin_table.setItem(row, 4, QTableWidgetItem(str(credits)))
-
-                    total_credits += credits
-                    if final_grade is not None:
-                        total_points += final_grade * credits
-                    if status == "Validée":
-                        validated_credits += credits
-                
-                if total_credits > 0:
-                    average = total_points / total_credits
-                    summary = f"Moyenne: {average:.2f}/20  |  Crédits Validés: {validated_credits}/{total_credits}"
-                    self.bulletin_summary_label.setText(summary)
-                else:
-                    self.bulletin_summary_label.setText("Aucune note à afficher pour cette période.")
-
+            bulletin = student_bulletin(self.student_matricule, academic_year_id, self.semester_filter.currentIndex() or None)
         except sqlite3.Error as e:
             QMessageBox.warning(self, "Erreur", f"Impossible de rafraîchir le bulletin: {e}")
+            return
+        if bulletin is None:
+            self.bulletin_info_label.setText("Aucune inscription trouvée pour cet étudiant cette année-là.")
+            return
+
+        self.current_year_of_study = bulletin['year_of_study']
+        academic_year_text = self.academic_year_filter.currentText()
+        self.bulletin_info_label.setText(f"Bulletin de {bulletin['last_name'].upper()} {bulletin['first_name']} "
+                                         f"({bulletin['program']})\nAnnée Académique : {academic_year_text}")
+        self.bulletin_model.set_rows(bulletin['rows'])
+        if bulletin['total_credits'] > 0:
+            summary = (f"Moyenne: {bulletin['average']:.2f}/20  |  "
+                       f"Crédits Validés: {bulletin['validated_credits']}/{bulletin['total_credits']}")
+            self.bulletin_summary_label.setText(summary)
+        else:
+            self.bulletin_summary_label.setText("Aucune note à afficher pour cette période.")
+
+class CohortGradesDialog(QDialog):
+    """Saisie des notes de toute une promotion pour toutes les matières d'un semestre.
+
+    Les notes sont chargées en une requête et enregistrées en une transaction par le thread
+    d'écriture ; saved vaut le nombre de notes enregistrées à la fermeture.
+    """
+
+    def __init__(self, cohort, courses, parent=None):
+        super().__init__(parent)
+        self.cohort = cohort
+        self.courses = courses
+        self.saved = 0
+        self.saving = False
+        self.setWindowTitle(f"Notes de la promotion {cohort['program_name']} - Année {cohort['year_of_study']}, "
+                            f"Semestre {cohort['semester']} ({cohort['academic_year_name']})")
+        self.setMinimumSize(1100, 700)
+        layout = QVBoxLayout(self)
+        layout.setSpacing(15)
+
+        self.info_label = QLabel("Chargement...")
+        layout.addWidget(self.info_label)
+
+        self.model = CohortGradesModel(self)
+        self.model.grade_edited.connect(self.stage_grade)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.setAlternatingRowColors(True)
+        layout.addWidget(self.table)
+        QShortcut(QKeySequence.Undo, self.table, self.undo)
+
+        buttons = QHBoxLayout()
+        self.undo_button = QPushButton("Annuler")
+        self.undo_button.setObjectName("secondary")
+        self.discard_button = QPushButton("Abandonner")
+        self.discard_button.setObjectName("danger")
+        self.save_button = QPushButton("Enregistrer")
+        self.save_button.setObjectName("success")
+        close_button = QPushButton("Fermer")
+        close_button.setObjectName("secondary")
+
+        buttons.addStretch()
+        buttons.addWidget(self.undo_button)
+        buttons.addWidget(self.discard_button)
+        buttons.addWidget(self.save_button)
+        buttons.addWidget(close_button)
+        layout.addLayout(buttons)
+
+        self.undo_button.clicked.connect(self.undo)
+        self.discard_button.clicked.connect(self.discard)
+        self.save_button.clicked.connect(self.save)
+        close_button.clicked.connect(self.reject)
+        self.load()
+
+    def load(self):
+        try:
+            rows = load_cohort_grades(self.cohort['program_id'], self.cohort['academic_year_id'],
+                                      self.cohort['year_of_study'], [course['id'] for course in self.courses])
+        except sqlite3.Error as e:
+            QMessageBox.warning(self, "Erreur", f"Chargement des notes impossible: {e}")
+            rows = []
+        self.model.set_cohort(self.courses, rows)
+        self.info_label.setText(f"{len(rows)} étudiant(s), {len(self.courses)} matière(s). "
+                                "Les notes modifiées sont surlignées jusqu'à l'enregistrement.")
+        self.update_buttons()
+
+    def update_buttons(self):
+        has_changes = self.model.has_changes() and not self.saving
+        self.undo_button.setEnabled(has_changes)
+        self.discard_button.setEnabled(has_changes)
+        self.save_button.setEnabled(has_changes)
+
+    def stage_grade(self, row, column, text):
+        try:
+            value = parse_grade(text)
+        except ValueError:
+            QMessageBox.warning(self, "Valeur invalide", "La note doit être un nombre entre 0 et 20.")
+            return
+        self.model.stage_grade(row, column, value)
+        self.update_buttons()
+
+    def undo(self):
+        self.model.undo()
+        self.update_buttons()
+
+    def discard(self):
+        self.model.discard_changes()
+        self.update_buttons()
+
+    def save(self, close=False):
+        """Enregistre toutes les notes modifiées en une seule transaction, sans bloquer l'interface.
+
+        La grille n'est plus modifiable jusqu'à la fin ; avec close, la fenêtre se ferme si l'enregistrement réussit.
+        """
+        changes = self.model.pending_changes()
+        if not changes:
+            self.model.mark_saved()
+            self.update_buttons()
+            if close:
+                super().reject()
+            return
+
+        def finish():
+            self.saving = False
+            self.table.setEnabled(True)
+            self.update_buttons()
+
+        def on_saved(_):
+            self.saved += len(changes)
+            self.model.mark_saved()
+            finish()
+            if close:
+                super(CohortGradesDialog, self).reject()
+
+        def on_error(error):
+            finish()
+            QMessageBox.warning(self, "Erreur DB", f"Impossible d'enregistrer les notes : {error}")
+
+        self.saving = True
+        self.table.setEnabled(False)
+        self.update_buttons()
+        WriteWatcher(submit_write(upsert_cohort_grades, self.cohort['academic_year_id'], changes),
+                     on_saved, on_error, self)
+
+    def reject(self):
+        if self.saving:
+            return
+        if self.model.has_changes():
+            reply = QMessageBox.question(self, "Notes non enregistrées",
+                                         "Des notes ont été modifiées sans être enregistrées.\nLes enregistrer maintenant ?",
+                                         QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel)
+            if reply == QMessageBox.Cancel:
+                return
+            if reply == QMessageBox.Yes:
+                self.save(close=True)
+                return
+        super().reject()
+
+
+class DeliberationDialog(QDialog):
+    """Délibération d'une promotion : classement, mentions et décisions, export du procès-verbal."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.pv = None
+        self.setWindowTitle("Délibération du jury")
+        self.setMinimumSize(1100, 700)
+        layout = QVBoxLayout(self)
+        layout.setSpacing(15)
+
+        filter_layout = QHBoxLayout()
+        self.program_combo = QComboBox()
+        self.academic_year_combo = QComboBox()
+        self.year_of_study_input = QSpinBox()
+        self.year_of_study_input.setRange(1, 10)
+        try:
+            for prog_id, name, *_ in reference.programs():
+                self.program_combo.addItem(name, prog_id)
+            for year_id, name, *_ in reference.academic_years():
+                self.academic_year_combo.addItem(name, year_id)
+        except sqlite3.Error as e:
+            QMessageBox.warning(self, "Erreur", f"Chargement des formations impossible: {e}")
+        deliberate_button = QPushButton("Délibérer")
+        deliberate_button.setObjectName("primary")
+
+        filter_layout.addWidget(QLabel("Formation:"))
+        filter_layout.addWidget(self.program_combo)
+        filter_layout.addWidget(QLabel("Année Académique:"))
+        filter_layout.addWidget(self.academic_year_combo)
+        filter_layout.addWidget(QLabel("Année d'Étude:"))
+        filter_layout.addWidget(self.year_of_study_input)
+        filter_layout.addStretch()
+        filter_layout.addWidget(deliberate_button)
+        layout.addLayout(filter_layout)
+
+        self.model = LazyQueryModel([], self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setEditTriggers(QTableView.NoEditTriggers)
+        self.table.setAlternatingRowColors(True)
+        layout.addWidget(self.table)
+
+        self.summary_label = QLabel()
+        self.summary_label.setFont(QFont("Arial", 11, QFont.Bold))
+        layout.addWidget(self.summary_label, alignment=Qt.AlignRight)
+
+        buttons = QHBoxLayout()
+        self.export_button = QPushButton("Exporter le PV")
+        self.export_button.setObjectName("success")
+        self.export_button.setEnabled(False)
+        close_button = QPushButton("Fermer")
+        close_button.setObjectName("secondary")
+        buttons.addStretch()
+        buttons.addWidget(self.export_button)
+        buttons.addWidget(close_button)
+        layout.addLayout(buttons)
+
+        deliberate_button.clicked.connect(self.deliberate)
+        self.export_button.clicked.connect(self.export)
+        close_button.clicked.connect(self.accept)
+
+    def deliberate(self):
+        program_id = self.program_combo.currentData()
+        academic_year_id = self.academic_year_combo.currentData()
+        if not program_id or not academic_year_id:
+            QMessageBox.warning(self, "Erreur", "Veuillez choisir une formation et une année académique.")
+            return
+        try:
+            pv = load_deliberation(program_id, academic_year_id, self.year_of_study_input.value())
+        except sqlite3.Error as e:
+            QMessageBox.warning(self, "Erreur DB", f"Impossible de charger les notes de la promotion : {e}")
+            return
+        self.pv = pv
+        self.model.set_rows((tuple(pv_row(pv, student)) for student in pv['students']), pv_header(pv))
+        if pv['students']:
+            self.summary_label.setText(f"{len(pv['students'])} étudiant(s) : " +
+                                       ", ".join(f"{label} {count}" for label, count in pv['counts'].items()))
+        else:
+            self.summary_label.setText("Aucun étudiant inscrit ou aucune matière pour cette promotion.")
+        self.export_button.setEnabled(bool(pv['students']))
+
+    def export(self):
+        pv = self.pv
+        default_name = safe_filename(f"pv_{pv['program']}_{pv['academic_year']}_A{pv['year_of_study']}") + ".csv"
+        path, _ = QFileDialog.getSaveFileName(self, "Enregistrer le procès-verbal", default_name, "Fichiers CSV (*.csv)")
+        if not path:
+            return
+        try:
+            count = export_pv(pv, path)
+        except OSError as e:
+            QMessageBox.warning(self, "Erreur", f"Impossible d'écrire le procès-verbal : {e}")
+            return
+        QMessageBox.information(self, "Succès", f"Procès-verbal de {count} étudiant(s) exporté.")
+
+
+class RolloverDialog(QDialog):
+    """Passage d'année d'une formation : aperçu des décisions puis réinscription en une transaction."""
+
+    HEADERS = ["Matricule", "Nom", "Prénom", "Année d'étude", "Moyenne", "Crédits validés", "Décision",
+               "Nouvelle inscription"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.enrolled = 0
+        self.previewed = None
+        self.applying = False
+        self.setWindowTitle("Passage d'année")
+        self.setMinimumSize(1000, 650)
+        layout = QVBoxLayout(self)
+        layout.setSpacing(15)
+
+        filter_layout = QHBoxLayout()
+        self.program_combo = QComboBox()
+        self.source_year_combo = QComboBox()
+        self.target_year_combo = QComboBox()
+        try:
+            for prog_id, name, *_ in reference.programs():
+                self.program_combo.addItem(name, prog_id)
+            for year_id, name, *_ in reference.academic_years():
+                self.source_year_combo.addItem(name, year_id)
+                self.target_year_combo.addItem(name, year_id)
+        except sqlite3.Error as e:
+            QMessageBox.warning(self, "Erreur", f"Chargement des formations impossible: {e}")
+        preview_button = QPushButton("Aperçu")
+        preview_button.setObjectName("primary")
+
+        filter_layout.addWidget(QLabel("Formation:"))
+        filter_layout.addWidget(self.program_combo)
+        filter_layout.addWidget(QLabel("De:"))
+        filter_layout.addWidget(self.source_year_combo)
+        filter_layout.addWidget(QLabel("Vers:"))
+        filter_layout.addWidget(self.target_year_combo)
+        filter_layout.addStretch()
+        filter_layout.addWidget(preview_button)
+        layout.addLayout(filter_layout)
+
+        self.model = LazyQueryModel(self.HEADERS, self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setEditTriggers(QTableView.NoEditTriggers)
+        self.table.setAlternatingRowColors(True)
+        layout.addWidget(self.table)
+
+        self.summary_label = QLabel()
+        self.summary_label.setFont(QFont("Arial", 11, QFont.Bold))
+        layout.addWidget(self.summary_label, alignment=Qt.AlignRight)
+
+        buttons = QHBoxLayout()
+        self.apply_button = QPushButton("Valider le passage")
+        self.apply_button.setObjectName("success")
+        self.apply_button.setEnabled(False)
+        close_button = QPushButton("Fermer")
+        close_button.setObjectName("secondary")
+        buttons.addStretch()
+        buttons.addWidget(self.apply_button)
+        buttons.addWidget(close_button)
+        layout.addLayout(buttons)
+
+        self.source_year_combo.currentIndexChanged.connect(self.select_next_year)
+        for combo in (self.program_combo, self.source_year_combo, self.target_year_combo):
+            combo.currentIndexChanged.connect(self.clear_preview)
+        preview_button.clicked.connect(self.preview)
+        self.apply_button.clicked.connect(self.apply)
+        close_button.clicked.connect(self.accept)
+        self.select_next_year()
+
+    def select_next_year(self):
+        next_year_id = next_academic_year(self.source_year_combo.currentData())
+        index = self.target_year_combo.findData(next_year_id)
+        if index >= 0:
+            self.target_year_combo.setCurrentIndex(index)
+
+    def selection(self):
+        return (self.program_combo.currentData(), self.source_year_combo.currentData(),
+                self.target_year_combo.currentData())
+
+    def clear_preview(self):
+        # L'aperçu affiché ne correspond plus à la sélection : il faut le recalculer avant de valider.
+        self.previewed = None
+        self.apply_button.setEnabled(False)
+
+    def preview(self):
+        program_id, source_year_id, target_year_id = self.selection()
+        if not program_id or not source_year_id or not target_year_id:
+            QMessageBox.warning(self, "Erreur", "Veuillez choisir une formation et les deux années académiques.")
+            return
+        if source_year_id == target_year_id:
+            QMessageBox.warning(self, "Erreur", "L'année d'arrivée doit être différente de l'année de départ.")
+            return
+        try:
+            preview = preview_rollover(program_id, source_year_id, target_year_id)
+        except sqlite3.Error as e:
+            QMessageBox.warning(self, "Erreur DB", f"Impossible de charger la promotion : {e}")
+            return
+        self.model.set_rows(
+            (matricule, last_name, first_name, year_of_study, "" if average is None else f"{average:.2f}",
+             f"{validated_credits}/{total_credits}", decision,
+             "Déjà inscrit" if already_enrolled else ("—" if next_year is None else f"Année {next_year}"))
+            for (matricule, last_name, first_name, year_of_study, average, validated_credits, total_credits,
+                 decision, already_enrolled, next_year) in preview['students'])
+        if preview['students']:
+            counts = ", ".join(f"{label} {count}" for label, count in preview['counts'].items())
+            self.summary_label.setText(f"{len(preview['students'])} étudiant(s) : {counts} — "
+                                       f"{preview['to_enroll']} inscription(s) à créer")
+        else:
+            self.summary_label.setText("Aucun étudiant inscrit dans cette formation pour cette année.")
+        self.previewed = self.selection() if preview['to_enroll'] else None
+        self.apply_button.setEnabled(self.previewed is not None and not self.applying)
+
+    def apply(self):
+        if self.previewed is None or self.previewed != self.selection():
+            return
+        reply = QMessageBox.question(self, "Passage d'année",
+                                     f"Inscrire les étudiants de {self.program_combo.currentText()} en "
+                                     f"{self.target_year_combo.currentText()} ?",
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+
+        def on_applied(enrolled):
+            self.applying = False
+            self.enrolled += enrolled
+            QMessageBox.information(self, "Succès", f"{enrolled} inscription(s) créée(s).")
+            self.preview()
+
+        def on_error(error):
+            self.applying = False
+            self.apply_button.setEnabled(self.previewed is not None)
+            QMessageBox.warning(self, "Erreur DB", f"Impossible d'enregistrer le passage : {error}")
+
+        # Enregistré par le thread d'écriture ; la fenêtre reste ouverte jusqu'à la fin.
+        self.applying = True
+        self.apply_button.setEnabled(False)
+        WriteWatcher(submit_write(insert_rollover, *self.previewed), on_applied, on_error, self)
+
+    def done(self, result):
+        if not self.applying:
+            super().done(result)
+
+
+class ExportDialog(QDialog):
+    """Choix des données, des filtres et du format d'un export (exports.py)."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Exporter des données")
+        layout = QFormLayout(self)
+        layout.setSpacing(15)
+
+        self.dataset_combo = QComboBox()
+        for name, (label, *_) in DATASETS.items():
+            self.dataset_combo.addItem(label, name)
+        self.program_combo = QComboBox()
+        self.program_combo.addItem("Toutes les formations", None)
+        self.academic_year_combo = QComboBox()
+        self.academic_year_combo.addItem("Toutes les années", None)
+        self.format_combo = QComboBox()
+        for extension, (_, label) in tablefiles.WRITERS.items():
+            self.format_combo.addItem(label, extension)
+
+        try:
+            for prog_id, name, *_ in reference.programs():
+                self.program_combo.addItem(name, prog_id)
+            for year_id, name, *_ in reference.academic_years():
+                self.academic_year_combo.addItem(name, year_id)
+        except sqlite3.Error as e:
+            QMessageBox.warning(self, "Erreur", f"Chargement des formations impossible: {e}")
+
+        layout.addRow("Données:", self.dataset_combo)
+        layout.addRow("Formation:", self.program_combo)
+        layout.addRow("Année Académique:", self.academic_year_combo)
+        layout.addRow("Format:", self.format_combo)
+
+        buttons = QHBoxLayout()
+        ok_button = QPushButton("Exporter")
+        ok_button.setObjectName("primary")
+        cancel_button = QPushButton("Annuler")
+        cancel_button.setObjectName("secondary")
+
+        buttons.addStretch()
+        buttons.addWidget(cancel_button)
+        buttons.addWidget(ok_button)
+        layout.addRow(buttons)
+
+        ok_button.clicked.connect(self.accept)
+        cancel_button.clicked.connect(self.reject)
+
+    def get_data(self):
+        return {
+            "dataset": self.dataset_combo.currentData(),
+            "dataset_name": self.dataset_combo.currentText(),
+            "program_id": self.program_combo.currentData(),
+            "academic_year_id": self.academic_year_combo.currentData(),
+            "extension": self.format_combo.currentData(),
+            "format_name": self.format_combo.currentText(),
+        }
+
+
+class BatchBulletinDialog(QDialog):
+    """Choix de la promotion et de la période pour l'export des bulletins en PDF."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Bulletins PDF d'une promotion")
+        layout = QFormLayout(self)
+        layout.setSpacing(15)
+
+        self.program_combo = QComboBox()
+        self.academic_year_combo = QComboBox()
+        self.year_of_study_input = QSpinBox()
+        self.year_of_study_input.setRange(1, 10)
+        self.semester_combo = QComboBox()
+        self.semester_combo.addItem("Année complète", None)
+        self.semester_combo.addItem("Semestre 1", 1)
+        self.semester_combo.addItem("Semestre 2", 2)
+        self.merged_checkbox = QCheckBox("Un seul fichier PDF pour toute la promotion")
+
+        try:
+            for prog_id, name, *_ in reference.programs():
+                self.program_combo.addItem(name, prog_id)
+            for year_id, name, *_ in reference.academic_years():
+                self.academic_year_combo.addItem(name, year_id)
+        except sqlite3.Error as e:
+            QMessageBox.warning(self, "Erreur", f"Chargement des formations impossible: {e}")
+
+        layout.addRow("Formation:", self.program_combo)
+        layout.addRow("Année Académique:", self.academic_year_combo)
+        layout.addRow("Année d'Étude:", self.year_of_study_input)
+        layout.addRow("Période:", self.semester_combo)
+        layout.addRow(self.merged_checkbox)
+
+        buttons = QHBoxLayout()
+        ok_button = QPushButton("Exporter")
+        ok_button.setObjectName("primary")
+        cancel_button = QPushButton("Annuler")
+        cancel_button.setObjectName("secondary")
+
+        buttons.addStretch()
+        buttons.addWidget(cancel_button)
+        buttons.addWidget(ok_button)
+        layout.addRow(buttons)
+
+        ok_button.clicked.connect(self.accept)
+        cancel_button.clicked.connect(self.reject)
+
+    def get_data(self):
+        return {
+            "program_id": self.program_combo.currentData(),
+            "program_name": self.program_combo.currentText(),
+            "academic_year_id": self.academic_year_combo.currentData(),
+            "academic_year_name": self.academic_year_combo.currentText(),
+            "year_of_study": self.year_of_study_input.value(),
+            "semester": self.semester_combo.currentData(),
+            "merged": self.merged_checkbox.isChecked()
+        }
+
+
+class DiagnosticsDialog(QDialog):
+    """Durées des requêtes SQL par méthode appelante depuis le lancement (profiling.py)."""
+
+    COLUMNS = ["Appel", "Requêtes", "p50 (ms)", "p95 (ms)", "max (ms)", "Lignes (moy.)"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Diagnostics des requêtes")
+        self.setMinimumSize(900, 500)
+        layout = QVBoxLayout(self)
+        layout.setSpacing(15)
+
+        layout.addWidget(QLabel(f"Requêtes de plus de {profiling.SLOW_QUERY_MS:g} ms journalisées dans "
+                                f"{profiling.SLOW_QUERY_LOG} (variable GESTION_SCOLAIRE_SLOW_MS)."))
+
+        self.table = QTableWidget()
+        self.table.setColumnCount(len(self.COLUMNS))
+        self.table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.table.setAlternatingRowColors(True)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        refresh_button = QPushButton("Actualiser")
+        refresh_button.setObjectName("primary")
+        reset_button = QPushButton("Réinitialiser")
+        reset_button.setObjectName("danger")
+        close_button = QPushButton("Fermer")
+        close_button.setObjectName("secondary")
+
+        buttons.addStretch()
+        buttons.addWidget(reset_button)
+        buttons.addWidget(refresh_button)
+        buttons.addWidget(close_button)
+        layout.addLayout(buttons)
+
+        refresh_button.clicked.connect(self.refresh)
+        reset_button.clicked.connect(self.reset)
+        close_button.clicked.connect(self.accept)
+        self.refresh()
+
+    def refresh(self):
+        lines = profiling.summary()
+        self.table.setRowCount(len(lines))
+        for row, line in enumerate(lines):
+            values = [line['site'], str(line['count']), f"{line['p50_ms']:.1f}", f"{line['p95_ms']:.1f}",
+                      f"{line['max_ms']:.1f}", f"{line['rows']:.0f}"]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if column:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                # La requête la plus lente de l'appelant, en info-bulle.
+                item.setToolTip(line['slowest_sql'])
+                self.table.setItem(row, column, item)
+
+    def reset(self):
+        profiling.reset()
+        self.refresh()
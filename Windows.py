@@ -1,22 +1,40 @@
 import sqlite3
 from PySide6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QLabel, QLineEdit, QPushButton, QComboBox, QTableWidget,
-                             QTableWidgetItem, QStackedWidget, QGridLayout,
+                             QTableWidgetItem, QTableView, QStackedWidget, QGridLayout,
                              QMessageBox, QDialog, QFormLayout, QHeaderView,
-                             QTabWidget, QFrame,
-                             QSplitter)
-from PySide6.QtGui import QPalette, QColor, QBrush, QLinearGradient
-from PySide6.QtCore import Qt, Signal
-from PySide6.QtWebEngineCore import *
-from functions import *
-from Dialogs import *
+                             QTabWidget, QFrame, QFileDialog, QCheckBox, QProgressDialog,
+                             QSplitter, QApplication)
+from PySide6.QtGui import QPalette, QColor, QBrush, QLinearGradient, QKeySequence, QShortcut
+from PySide6.QtCore import Qt, QTimer
+from functions import calculate_final_grade_and_status, fts_match_expression, hash_password, init_db, load_stylesheet
+from database import read_cursor, submit_write, uses_service
+from models import PAGE_SIZE, StudentsTableModel, GradesTableModel
+from workers import KeysetPager, QueryLoader, WriteWatcher
+from events import ChangeBus
+from enrollments import enroll
+from grades import (GradeFileError, load_grade_file, parse_grade, save_grade, upsert_course_grades,
+                    upsert_imported_grades)
+import events
+import mutations
+import queries
+import reference
+import startup
+
+# Les boîtes de dialogue (Dialogs.py) et l'export PDF (bulletins.py) sont importés
+# à leur première ouverture, pour ne pas ralentir le démarrage.
+
+# Délai sans frappe (ms) avant de lancer la recherche d'étudiants.
+STUDENT_SEARCH_DELAY_MS = 250
 
 class MainWindow(QMainWindow):
-    data_changed_signal = Signal()
-
     def __init__(self):
         super().__init__()
         self.user_info = None
+        self.views = []
+        self.tab_factories = {}
+        self.change_bus = ChangeBus(self)
+        self.change_bus.changed.connect(self.on_data_changed)
         self.setWindowTitle("SysGesco - Système de Gestion Scolaire")
         self.setGeometry(100, 100, 1400, 850)
         
@@ -33,8 +51,14 @@ class MainWindow(QMainWindow):
         self.main_layout.setContentsMargins(15, 15, 15, 15)
         self.stacked_widget.addWidget(self.main_page)
         
-        init_db()
-        
+        if not uses_service():
+            try:
+                init_db()
+            except sqlite3.Error as e:
+                QMessageBox.critical(self, "Erreur DB",
+                                     f"Impossible d'ouvrir ou de mettre à jour la base de données : {e}")
+                raise SystemExit(1)
+
     def create_login_page(self):
         page = QWidget()
         
@@ -102,9 +126,9 @@ class MainWindow(QMainWindow):
             self.error_label.setText("Veuillez remplir tous les champs.")
             return
 
+        startup.mark('login')
         try:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
+            with read_cursor() as cursor:
                 password_hash = hash_password(password)
                 cursor.execute("SELECT id, username, role, student_id FROM users WHERE username = ? AND password_hash = ?",
                                (username, password_hash))
@@ -119,6 +143,7 @@ class MainWindow(QMainWindow):
                 }
                 self.setup_main_ui()
                 self.stacked_widget.setCurrentIndex(1)
+                QTimer.singleShot(0, self.report_first_tab)
             else:
                 self.error_label.setText("Nom d'utilisateur ou mot de passe incorrect.")
                 
@@ -135,7 +160,7 @@ class MainWindow(QMainWindow):
         self.main_layout.addWidget(self.tabs)
         
         self.setup_ui_for_role()
-        self.data_changed_signal.connect(self.refresh_all_tabs)
+        self.tabs.currentChanged.connect(self.refresh_current_tab)
         
         bottom_layout = QHBoxLayout()
         user_label = QLabel(f"Connecté: <b>{self.user_info['username']}</b> ({self.user_info['role']})")
@@ -151,45 +176,131 @@ class MainWindow(QMainWindow):
         
         bottom_layout.addWidget(user_label)
         bottom_layout.addStretch()
+        if self.user_info['role'] == 'administrateur':
+            diagnostics_button = QPushButton("Diagnostics")
+            diagnostics_button.setObjectName("secondary")
+            diagnostics_button.clicked.connect(self.show_diagnostics)
+            bottom_layout.addWidget(diagnostics_button)
         bottom_layout.addWidget(change_pwd_button)
         bottom_layout.addWidget(logout_button)
         self.main_layout.addLayout(bottom_layout)
     
     def setup_ui_for_role(self):
         user_role = self.user_info['role']
+        # Les données de référence ont pu être modifiées depuis un autre poste.
+        reference.invalidate()
         self.tabs.clear()
+        self.views = []
+        self.tab_factories = {}
 
         if user_role == 'administrateur':
-            self.tabs.addTab(self.create_academic_years_tab(), "Années Académiques")
-            self.tabs.addTab(self.create_users_tab(), "Utilisateurs")
-            self.tabs.addTab(self.create_departments_tab(), "Départements")
-            self.tabs.addTab(self.create_programs_tab(), "Formations")
-            self.tabs.addTab(self.create_students_tab(), "Étudiants")
-            self.tabs.addTab(self.create_courses_grades_tab(), "Matières & Notes")
+            self.add_lazy_tab(self.create_academic_years_tab, "Années Académiques")
+            self.add_lazy_tab(self.create_users_tab, "Utilisateurs")
+            self.add_lazy_tab(self.create_departments_tab, "Départements")
+            self.add_lazy_tab(self.create_programs_tab, "Formations")
+            self.add_lazy_tab(self.create_students_tab, "Étudiants")
+            self.add_lazy_tab(self.create_courses_grades_tab, "Matières & Notes")
         elif user_role == 'responsable':
-            self.tabs.addTab(self.create_academic_years_tab(), "Années Académiques")
-            self.tabs.addTab(self.create_departments_tab(), "Départements")
-            self.tabs.addTab(self.create_programs_tab(), "Formations")
-            self.tabs.addTab(self.create_students_tab(), "Étudiants")
-            self.tabs.addTab(self.create_courses_grades_tab(), "Matières & Notes")
+            self.add_lazy_tab(self.create_academic_years_tab, "Années Académiques")
+            self.add_lazy_tab(self.create_departments_tab, "Départements")
+            self.add_lazy_tab(self.create_programs_tab, "Formations")
+            self.add_lazy_tab(self.create_students_tab, "Étudiants")
+            self.add_lazy_tab(self.create_courses_grades_tab, "Matières & Notes")
         elif user_role == 'secretaire':
-            self.tabs.addTab(self.create_students_tab(), "Étudiants")
-            self.tabs.addTab(self.create_courses_grades_tab(), "Matières & Notes")
+            self.add_lazy_tab(self.create_students_tab, "Étudiants")
+            self.add_lazy_tab(self.create_courses_grades_tab, "Matières & Notes")
         
         self.refresh_all_tabs()
     
+    def add_lazy_tab(self, create_tab, title):
+        """Ajoute un onglet vide ; create_tab() n'est appelé qu'au premier affichage (build_tab)."""
+        placeholder = QWidget()
+        QVBoxLayout(placeholder).setContentsMargins(0, 0, 0, 0)
+        self.tab_factories[placeholder] = create_tab
+        self.tabs.addTab(placeholder, title)
+
+    def build_tab(self, placeholder):
+        """Construit le contenu d'un onglet encore vide ; ses vues sont rattachées à l'onglet."""
+        create_tab = self.tab_factories.pop(placeholder, None)
+        if create_tab is None:
+            return
+        content = create_tab()
+        placeholder.layout().addWidget(content)
+        for view in self.views:
+            if view['tab'] is content:
+                view['tab'] = placeholder
+                view['dirty'] = True
+
+    def report_first_tab(self):
+        startup.mark('first_tab')
+        startup.report("connexion -> premier onglet", 'login', 'first_tab')
+
+    def register_view(self, tab, entities, refresh):
+        """Déclare les entités dont dépend un onglet et la fonction refresh(entité, clé) qui le met à jour."""
+        self.views.append({'tab': tab, 'entities': set(entities), 'refresh': refresh, 'dirty': False})
+
     def create_tool_button(self, text, object_name, on_click):
         button = QPushButton(text)
         button.setObjectName(object_name)
         button.clicked.connect(on_click)
         return button
 
+    def create_loader(self, layout, on_rows, error_message):
+        """Crée le chargeur d'arrière-plan d'une table et son indicateur « Chargement… »."""
+        loader = QueryLoader(self)
+        loading_label = QLabel("Chargement…")
+        loading_label.setStyleSheet("color: #6c757d;")
+        loading_label.setVisible(False)
+        layout.addWidget(loading_label)
+        loader.loading_changed.connect(loading_label.setVisible)
+        loader.rows_ready.connect(on_rows)
+        loader.failed.connect(lambda e: QMessageBox.warning(self, "Erreur", f"{error_message}: {e}"))
+        return loader
+
+    def create_pager(self, layout, model, error_message):
+        """Crée le chargement paginé d'un modèle, avec « Chargement… » et le nombre de lignes."""
+        pager = KeysetPager(PAGE_SIZE, self)
+        status_layout = QHBoxLayout()
+        loading_label = QLabel("Chargement…")
+        loading_label.setStyleSheet("color: #6c757d;")
+        loading_label.setVisible(False)
+        count_label = QLabel()
+        count_label.setStyleSheet("color: #6c757d;")
+        status_layout.addWidget(loading_label)
+        status_layout.addStretch()
+        status_layout.addWidget(count_label)
+        layout.addLayout(status_layout)
+        pager.loading_changed.connect(loading_label.setVisible)
+        pager.count_ready.connect(lambda count: count_label.setText(f"{count} ligne(s)"))
+        pager.failed.connect(lambda e: QMessageBox.warning(self, "Erreur", f"{error_message}: {e}"))
+        model.set_pager(pager)
+        model.modelReset.connect(count_label.clear)
+        return pager
+
+    def enable_server_sort(self, table, model, refresh):
+        """Tri par clic sur l'en-tête, exécuté par la base ; les colonnes non triables gardent l'ancien tri."""
+        header = table.horizontalHeader()
+        header.setSectionsClickable(True)
+        header.setSortIndicatorShown(True)
+        header.setSortIndicator(model.sort_column, model.sort_order)
+
+        def on_sort_changed(column, order):
+            if model.set_sort(column, order):
+                refresh()
+                return
+            header.blockSignals(True)
+            header.setSortIndicator(model.sort_column, model.sort_order)
+            header.blockSignals(False)
+
+        header.sortIndicatorChanged.connect(on_sort_changed)
+
     def create_academic_years_tab(self):
         tab = QWidget()
         layout = QVBoxLayout(tab)
         layout.setSpacing(15)
         
         layout.addWidget(QLabel("Gestion des Années Académiques", objectName="h2"))
+        self.year_loader = self.create_loader(layout, self.append_academic_year_rows, "Impossible de charger les années académiques")
 
         self.year_table = QTableWidget()
         self.year_table.setColumnCount(2)
@@ -207,6 +318,7 @@ class MainWindow(QMainWindow):
         btn_layout.addWidget(self.create_tool_button("Supprimer", 'danger', self.delete_academic_year))
         layout.addLayout(btn_layout)
 
+        self.register_view(tab, {events.ACADEMIC_YEARS}, lambda entity, key: self.refresh_academic_years_tab())
         return tab
 
     def create_departments_tab(self):
@@ -215,6 +327,7 @@ class MainWindow(QMainWindow):
         layout.setSpacing(15)
         
         layout.addWidget(QLabel("Gestion des Départements", objectName="h2"))
+        self.dep_loader = self.create_loader(layout, self.append_department_rows, "Impossible de charger les départements")
 
         self.dep_table = QTableWidget()
         self.dep_table.setColumnCount(2)
@@ -232,6 +345,7 @@ class MainWindow(QMainWindow):
         btn_layout.addWidget(self.create_tool_button("Supprimer", 'danger', self.delete_department))
         layout.addLayout(btn_layout)
 
+        self.register_view(tab, {events.DEPARTMENTS}, lambda entity, key: self.refresh_departments_tab())
         return tab
 
     def create_programs_tab(self):
@@ -239,6 +353,7 @@ class MainWindow(QMainWindow):
         layout = QVBoxLayout(tab)
         layout.setSpacing(15)
         layout.addWidget(QLabel("Gestion des Formations", objectName="h2"))
+        self.prog_loader = self.create_loader(layout, self.append_program_rows, "Impossible de charger les formations")
         
         self.prog_table = QTableWidget()
         self.prog_table.setColumnCount(3)
@@ -256,6 +371,8 @@ class MainWindow(QMainWindow):
         btn_layout.addWidget(self.create_tool_button("Supprimer", 'danger', self.delete_program))
         layout.addLayout(btn_layout)
         
+        self.register_view(tab, {events.PROGRAMS, events.DEPARTMENTS}, lambda entity, key: self.refresh_programs_tab())
+        
         return tab
 
     def create_students_tab(self):
@@ -268,16 +385,28 @@ class MainWindow(QMainWindow):
         self.student_prog_filter = QComboBox()
         filter_layout.addWidget(QLabel("Filtrer par formation:"))
         filter_layout.addWidget(self.student_prog_filter)
-        filter_layout.addStretch()
+        self.student_search_input = QLineEdit()
+        self.student_search_input.setPlaceholderText("Rechercher (nom, prénom, matricule)…")
+        self.student_search_input.setClearButtonEnabled(True)
+        filter_layout.addWidget(self.student_search_input, 1)
         self.student_prog_filter.currentIndexChanged.connect(self.refresh_students_tab)
         layout.addLayout(filter_layout)
 
-        self.stud_table = QTableWidget()
-        self.stud_table.setColumnCount(6)
-        self.stud_table.setHorizontalHeaderLabels(["N° Matricule", "Nom", "Prénom", "Formation", "Année Académique", "Année d'Étude"])
+        # Recherche pendant la frappe : la requête part une fois la saisie interrompue.
+        self.student_search_timer = QTimer(self)
+        self.student_search_timer.setSingleShot(True)
+        self.student_search_timer.setInterval(STUDENT_SEARCH_DELAY_MS)
+        self.student_search_timer.timeout.connect(self.refresh_students_tab)
+        self.student_search_input.textChanged.connect(self.student_search_timer.start)
+
+        self.students_model = StudentsTableModel(self)
+        self.students_pager = self.create_pager(layout, self.students_model, "Impossible de charger les étudiants")
+        self.stud_table = QTableView()
+        self.stud_table.setModel(self.students_model)
+        self.enable_server_sort(self.stud_table, self.students_model, self.refresh_students_tab)
         self.stud_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
-        self.stud_table.setEditTriggers(QTableWidget.NoEditTriggers)
-        self.stud_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.stud_table.setEditTriggers(QTableView.NoEditTriggers)
+        self.stud_table.setSelectionBehavior(QTableView.SelectRows)
         self.stud_table.setAlternatingRowColors(True)
         layout.addWidget(self.stud_table)
 
@@ -286,10 +415,17 @@ class MainWindow(QMainWindow):
         btn_layout.addWidget(self.create_tool_button("Créer", 'primary', self.add_student))
         btn_layout.addWidget(self.create_tool_button("Modifier", 'secondary', self.edit_student))
         btn_layout.addWidget(self.create_tool_button("Inscrire", 'secondary', self.enroll_student))
+        btn_layout.addWidget(self.create_tool_button("Rentrée", 'secondary', self.import_intake_file))
+        btn_layout.addWidget(self.create_tool_button("Passage d'année", 'secondary', self.open_rollover))
         btn_layout.addWidget(self.create_tool_button("Bulletin", 'secondary', self.view_student_bulletin))
+        btn_layout.addWidget(self.create_tool_button("Bulletins PDF", 'secondary', self.export_batch_bulletins))
+        btn_layout.addWidget(self.create_tool_button("Délibération", 'secondary', self.open_deliberation))
+        btn_layout.addWidget(self.create_tool_button("Exporter", 'secondary', self.export_data))
         btn_layout.addWidget(self.create_tool_button("Supprimer", 'danger', self.delete_student))
         layout.addLayout(btn_layout)
 
+        self.register_view(tab, {events.STUDENTS, events.PROGRAMS, events.DEPARTMENTS, events.ACADEMIC_YEARS},
+                           self.on_students_changed)
         return tab
 
     def create_courses_grades_tab(self):
@@ -315,6 +451,7 @@ class MainWindow(QMainWindow):
         filters_layout.addWidget(QLabel("Semestre:"), 2, 0)
         filters_layout.addWidget(self.course_semester_filter, 2, 1)
         courses_vbox.addLayout(filters_layout)
+        self.courses_loader = self.create_loader(courses_vbox, self.append_course_rows, "Impossible de charger les matières")
 
         self.course_prog_filter.currentIndexChanged.connect(self.update_course_year_filter)
         self.course_year_filter.currentIndexChanged.connect(self.refresh_courses_list)
@@ -346,18 +483,37 @@ class MainWindow(QMainWindow):
         self.grades_year_filter = QComboBox()
         year_filter_layout.addWidget(self.grades_year_filter)
         year_filter_layout.addStretch()
+        year_filter_layout.addWidget(self.create_tool_button("Saisie par promotion", 'secondary', self.open_cohort_grades))
+        year_filter_layout.addWidget(self.create_tool_button("Importer des notes", 'secondary', self.import_grades_file))
         grades_vbox.addLayout(year_filter_layout)
         
-        self.grades_table = QTableWidget()
-        self.grades_table = QTableWidget()
-        self.grades_table.setColumnCount(7)
-        self.grades_table.setHorizontalHeaderLabels(["Matricule", "Étudiant", "Note 1", "Note 2", "Rattrapage", "Moyenne/Finale", "Statut"])
+        self.grades_model = GradesTableModel(self)
+        self.grades_saving = False  # saisie groupée en cours d'enregistrement
+        self.grades_model.grade_edited.connect(self.update_grade)
+        self.grades_pager = self.create_pager(grades_vbox, self.grades_model, "Impossible de charger les notes")
+        self.grades_table = QTableView()
+        self.grades_table.setModel(self.grades_model)
+        self.enable_server_sort(self.grades_table, self.grades_model, self.refresh_grades_for_selected_course)
         self.grades_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
         self.grades_table.horizontalHeader().setStretchLastSection(True)
-        self.grades_table.itemChanged.connect(self.update_grade)
         self.grades_year_filter.currentIndexChanged.connect(self.refresh_grades_for_selected_course)
         self.grades_table.setAlternatingRowColors(True)
         grades_vbox.addWidget(self.grades_table)
+
+        batch_layout = QHBoxLayout()
+        self.grades_batch_checkbox = QCheckBox("Saisie groupée (enregistrer en une fois)")
+        self.grades_batch_checkbox.toggled.connect(self.toggle_grades_batch_mode)
+        self.grades_undo_button = self.create_tool_button("Annuler", 'secondary', self.undo_grade_edit)
+        self.grades_discard_button = self.create_tool_button("Abandonner", 'danger', self.discard_grade_edits)
+        self.grades_save_button = self.create_tool_button("Enregistrer", 'success', self.save_grade_edits)
+        batch_layout.addWidget(self.grades_batch_checkbox)
+        batch_layout.addStretch()
+        batch_layout.addWidget(self.grades_undo_button)
+        batch_layout.addWidget(self.grades_discard_button)
+        batch_layout.addWidget(self.grades_save_button)
+        grades_vbox.addLayout(batch_layout)
+        QShortcut(QKeySequence.Undo, self.grades_table, self.undo_grade_edit)
+        self.update_grade_buttons()
         
         main_splitter.addWidget(courses_widget)
         main_splitter.addWidget(grades_widget)
@@ -365,6 +521,8 @@ class MainWindow(QMainWindow):
         main_splitter.setStretchFactor(1, 3)
         layout.addWidget(main_splitter)
 
+        self.register_view(tab, {events.COURSES, events.GRADES, events.STUDENTS, events.PROGRAMS,
+                                 events.DEPARTMENTS, events.ACADEMIC_YEARS}, self.on_courses_grades_changed)
         return tab
         
     def create_users_tab(self):
@@ -372,6 +530,7 @@ class MainWindow(QMainWindow):
         layout = QVBoxLayout(tab)
         layout.setSpacing(15)
         layout.addWidget(QLabel("Gestion des Utilisateurs", objectName="h2"))
+        self.users_loader = self.create_loader(layout, self.append_user_rows, "Impossible de charger les utilisateurs")
 
         self.users_table = QTableWidget()
         self.users_table.setColumnCount(2)
@@ -388,33 +547,67 @@ class MainWindow(QMainWindow):
         btn_layout.addWidget(reset_btn)
         layout.addLayout(btn_layout)
 
+        self.register_view(tab, {events.USERS, events.STUDENTS}, lambda entity, key: self.refresh_users_tab())
         return tab
 
     # --- Méthodes de rafraîchissement ---
     def refresh_all_tabs(self):
-        role = self.user_info['role']
-        if role in ['administrateur', 'responsable', 'secretaire']:
-            self.update_filter_combos()
-
-        if hasattr(self, 'dep_table'): self.refresh_departments_tab()
-        if hasattr(self, 'prog_table'): self.refresh_programs_tab()
-        if hasattr(self, 'stud_table'): self.refresh_students_tab()
-        if hasattr(self, 'courses_table'): self.refresh_courses_and_grades_tab()
-        if hasattr(self, 'users_table'): self.refresh_users_tab()
-        if hasattr(self, 'year_table'): self.refresh_academic_years_tab()
-        if hasattr(self, 'grades_year_filter'):
+        """Marque tous les onglets à recharger ; seul l'onglet affiché l'est immédiatement."""
+        for view in self.views:
+            view['dirty'] = True
+        self.refresh_current_tab()
+
+    def refresh_current_tab(self, index=None):
+        current_tab = self.tabs.currentWidget()
+        self.build_tab(current_tab)
+        for view in self.views:
+            if view['tab'] is current_tab and view['dirty']:
+                view['dirty'] = False
+                view['refresh'](None, None)
+
+    def on_data_changed(self, entity, key):
+        """Met à jour les onglets qui dépendent de l'entité modifiée ; les onglets masqués
+        sont seulement marqués et rechargés lorsqu'ils seront affichés."""
+        reference.invalidate(entity)
+        current_tab = self.tabs.currentWidget()
+        for view in self.views:
+            if entity not in view['entities']:
+                continue
+            if view['tab'] is current_tab and not view['dirty']:
+                view['refresh'](entity, key)
+            else:
+                view['dirty'] = True
+
+    def on_students_changed(self, entity, key):
+        if entity == events.STUDENTS and key is not None:
+            self.refresh_student_row(key)
+            return
+        if entity != events.STUDENTS:
+            self.update_program_filter(self.student_prog_filter)
+        self.refresh_students_tab()
+
+    def on_courses_grades_changed(self, entity, key):
+        if entity == events.GRADES and key is not None:
+            return  # update_grade a déjà mis à jour la ligne affichée
+        if entity in (events.GRADES, events.STUDENTS):
+            self.refresh_grades_for_selected_course()
+            return
+        if entity == events.COURSES:
+            self.refresh_courses_list()
+            return
+        if entity in (None, events.ACADEMIC_YEARS):
             self.load_academic_years_into_combo(self.grades_year_filter)
+            self.refresh_grades_for_selected_course()
+        if entity in (None, events.PROGRAMS, events.DEPARTMENTS):
+            self.update_program_filter(self.course_prog_filter)
 
     def load_academic_years_into_combo(self, combo):
         combo.blockSignals(True)
         current_selection = combo.currentData()
         combo.clear()
         try:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id, name FROM academic_years ORDER BY start_year DESC")
-                for year_id, name in cursor.fetchall():
-                    combo.addItem(name, year_id)
+            for year_id, name, *_ in reference.academic_years():
+                combo.addItem(name, year_id)
         except sqlite3.Error as e:
             QMessageBox.warning(self, "Erreur", f"Chargement des années académiques impossible: {e}")
         
@@ -427,31 +620,23 @@ class MainWindow(QMainWindow):
         combo.blockSignals(False)
 
 
-    def update_filter_combos(self):
-        combos_to_update = []
-        if hasattr(self, 'student_prog_filter'): combos_to_update.append(self.student_prog_filter)
-        if hasattr(self, 'course_prog_filter'): combos_to_update.append(self.course_prog_filter)
+    def update_program_filter(self, combo):
+        combo.blockSignals(True)
+        current_selection = combo.currentData()
+        combo.clear()
+        combo.addItem("Toutes les formations", None)
+        try:
+            for prog_id, name, duration, _ in reference.programs():
+                combo.addItem(name, {'id': prog_id, 'duration': duration})
+        except sqlite3.Error as e:
+            QMessageBox.critical(self, "Erreur DB", f"Erreur de chargement des filtres : {e}")
         
-        for combo in combos_to_update:
-            combo.blockSignals(True)
-            current_selection = combo.currentData()
-            combo.clear()
-            combo.addItem("Toutes les formations", None)
-            try:
-                with sqlite3.connect(DB_NAME) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT id, name, duration_years FROM programs ORDER BY name")
-                    for prog_id, name, duration in cursor.fetchall():
-                        combo.addItem(name, {'id': prog_id, 'duration': duration})
-            except sqlite3.Error as e:
-                QMessageBox.critical(self, "Erreur DB", f"Erreur de chargement des filtres : {e}")
-            
-            if current_selection:
-                index = combo.findData(current_selection, role=Qt.UserRole)
-                if index != -1: combo.setCurrentIndex(index)
-            combo.blockSignals(False)
+        if current_selection:
+            index = combo.findData(current_selection, role=Qt.UserRole)
+            if index != -1: combo.setCurrentIndex(index)
+        combo.blockSignals(False)
         
-        if hasattr(self, 'course_prog_filter'): self.update_course_year_filter()
+        if combo is getattr(self, 'course_prog_filter', None): self.update_course_year_filter()
         
     def update_course_year_filter(self):
         if not hasattr(self, 'course_year_filter'): return
@@ -476,97 +661,106 @@ class MainWindow(QMainWindow):
     def refresh_departments_tab(self):
         if not hasattr(self, 'dep_table'): return
         self.dep_table.setRowCount(0)
-        try:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id, name, validation_grade FROM departments ORDER BY name")
-                for row, (dep_id, name, grade) in enumerate(cursor.fetchall()):
-                    self.dep_table.insertRow(row)
-                    name_item = QTableWidgetItem(name)
-                    name_item.setData(Qt.UserRole, dep_id)
-                    self.dep_table.setItem(row, 0, name_item)
-                    self.dep_table.setItem(row, 1, QTableWidgetItem(f"{grade:.2f}"))
-        except sqlite3.Error as e:
-            QMessageBox.warning(self, "Erreur", f"Impossible de charger les départements: {e}")
+        self.dep_loader.load("SELECT id, name, validation_grade FROM departments ORDER BY name")
+
+    def append_department_rows(self, rows):
+        for dep_id, name, grade in rows:
+            row = self.dep_table.rowCount()
+            self.dep_table.insertRow(row)
+            name_item = QTableWidgetItem(name)
+            name_item.setData(Qt.UserRole, dep_id)
+            self.dep_table.setItem(row, 0, name_item)
+            self.dep_table.setItem(row, 1, QTableWidgetItem(f"{grade:.2f}"))
 
     def refresh_programs_tab(self):
         if not hasattr(self, 'prog_table'): return
         self.prog_table.setRowCount(0)
-        try:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                query = """
-                    SELECT p.id, p.name, p.duration_years, d.name, p.department_id
-                    FROM programs p
-                    JOIN departments d ON p.department_id = d.id
-                    ORDER BY d.name, p.name
-                """
-                cursor.execute(query)
-                for row_num, (p_id, p_name, duration, d_name, d_id) in enumerate(cursor.fetchall()):
-                    self.prog_table.insertRow(row_num)
-                    name_item = QTableWidgetItem(p_name)
-                    name_item.setData(Qt.UserRole, {'id': p_id, 'name': p_name, 'duration': duration, 'department_id': d_id})
-                    self.prog_table.setItem(row_num, 0, name_item)
-                    self.prog_table.setItem(row_num, 1, QTableWidgetItem(str(duration)))
-                    self.prog_table.setItem(row_num, 2, QTableWidgetItem(d_name))
-        except sqlite3.Error as e:
-            QMessageBox.warning(self, "Erreur", f"Impossible de charger les formations: {e}")
+        self.prog_loader.load("""
+            SELECT p.id, p.name, p.duration_years, d.name, p.department_id
+            FROM programs p
+            JOIN departments d ON p.department_id = d.id
+            ORDER BY d.name, p.name
+        """)
+
+    def append_program_rows(self, rows):
+        for p_id, p_name, duration, d_name, d_id in rows:
+            row_num = self.prog_table.rowCount()
+            self.prog_table.insertRow(row_num)
+            name_item = QTableWidgetItem(p_name)
+            name_item.setData(Qt.UserRole, {'id': p_id, 'name': p_name, 'duration': duration, 'department_id': d_id})
+            self.prog_table.setItem(row_num, 0, name_item)
+            self.prog_table.setItem(row_num, 1, QTableWidgetItem(str(duration)))
+            self.prog_table.setItem(row_num, 2, QTableWidgetItem(d_name))
             
+    def student_filters(self):
+        """Conditions SQL et paramètres des filtres de l'onglet Étudiants (formation, recherche)."""
+        conditions, params = [], []
+        program_filter_data = self.student_prog_filter.currentData()
+        if program_filter_data:
+            conditions.append(queries.STUDENTS_PROGRAM_FILTER)
+            params.append(program_filter_data['id'])
+        match = fts_match_expression(self.student_search_input.text())
+        if match:
+            conditions.append(queries.STUDENTS_SEARCH_FILTER)
+            params.append(match)
+        return conditions, params
+
     def refresh_students_tab(self):
         if not hasattr(self, 'stud_table'): return
-        self.stud_table.setRowCount(0)
-        program_filter_data = self.student_prog_filter.currentData()
-        
+        self.student_search_timer.stop()
+        self.students_model.clear()
+        conditions, params = self.student_filters()
+        sort_keys, descending = self.students_model.sort_query_keys()
+        self.students_pager.load(queries.STUDENTS, conditions, params, sort_keys, descending,
+                                 count=(queries.students_count_query(conditions), params))
+
+    def refresh_student_row(self, matricule):
+        """Recharge la seule ligne d'un étudiant ; une ligne qui apparaît ou change de place
+        dans la liste filtrée entraîne un rechargement complet."""
+        conditions, params = self.student_filters()
+        query = queries.STUDENTS + " WHERE " + " AND ".join(["s.matricule = ?"] + conditions)
+        params = [matricule] + params
         try:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                query = """
-                    SELECT s.matricule, s.last_name, s.first_name, p.name, ay.name, s.year_of_study
-                    FROM students s 
-                    LEFT JOIN programs p ON s.program_id = p.id
-                    LEFT JOIN academic_years ay ON s.academic_year_id = ay.id
-                """
-                params = []
-                if program_filter_data:
-                    query += " WHERE s.program_id = ?"
-                    params.append(program_filter_data['id'])
-                query += " ORDER BY s.last_name, s.first_name"
-                
+            with read_cursor() as cursor:
                 cursor.execute(query, params)
-                for row_num, (matricule, lname, fname, pname, ay_name, year_study) in enumerate(cursor.fetchall()):
-                    self.stud_table.insertRow(row_num)
-                    self.stud_table.setItem(row_num, 0, QTableWidgetItem(matricule))
-                    self.stud_table.setItem(row_num, 1, QTableWidgetItem(lname))
-                    self.stud_table.setItem(row_num, 2, QTableWidgetItem(fname))
-                    self.stud_table.setItem(row_num, 3, QTableWidgetItem(pname or "Non inscrit"))
-                    self.stud_table.setItem(row_num, 4, QTableWidgetItem(ay_name or "-"))
-                    self.stud_table.setItem(row_num, 5, QTableWidgetItem(str(year_study) if year_study else "-"))
+                row = cursor.fetchone()
         except sqlite3.Error as e:
             QMessageBox.warning(self, "Erreur", f"Impossible de charger les étudiants: {e}")
+            return
+
+        current = self.students_model.find_row(matricule)
+        if row is None:
+            self.students_model.remove_row(matricule)
+        elif current is None or current[1:3] != row[1:3]:
+            self.refresh_students_tab()
+        else:
+            self.students_model.replace_row(matricule, row)
 
     def refresh_academic_years_tab(self):
         if not hasattr(self, 'year_table'): return
         self.year_table.setRowCount(0)
-        try:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id, name, start_year, end_year FROM academic_years ORDER BY start_year DESC")
-                for row, (yid, name, start, end) in enumerate(cursor.fetchall()):
-                    self.year_table.insertRow(row)
-                    name_item = QTableWidgetItem(name)
-                    name_item.setData(Qt.UserRole, {'id': yid, 'name': name, 'start_year': start, 'end_year': end})
-                    self.year_table.setItem(row, 0, name_item)
-                    self.year_table.setItem(row, 1, QTableWidgetItem(f"{start}-{end}"))
-        except sqlite3.Error as e:
-            QMessageBox.warning(self, "Erreur", f"Impossible de charger les années académiques: {e}")
+        self.year_loader.load("SELECT id, name, start_year, end_year FROM academic_years ORDER BY start_year DESC")
+
+    def append_academic_year_rows(self, rows):
+        for yid, name, start, end in rows:
+            row = self.year_table.rowCount()
+            self.year_table.insertRow(row)
+            name_item = QTableWidgetItem(name)
+            name_item.setData(Qt.UserRole, {'id': yid, 'name': name, 'start_year': start, 'end_year': end})
+            self.year_table.setItem(row, 0, name_item)
+            self.year_table.setItem(row, 1, QTableWidgetItem(f"{start}-{end}"))
 
     def refresh_courses_and_grades_tab(self):
         self.refresh_courses_list()
         
     def refresh_courses_list(self):
         if not hasattr(self, 'courses_table'): return
+        self.confirm_pending_grades()
+        self.courses_loader.cancel()
         self.courses_table.setRowCount(0)
-        if hasattr(self, 'grades_table'): self.grades_table.setRowCount(0)
+        if hasattr(self, 'grades_model'):
+            self.grades_pager.cancel()
+            self.grades_model.clear()
         
         program_data = self.course_prog_filter.currentData()
         year = self.course_year_filter.currentData()
@@ -574,31 +768,27 @@ class MainWindow(QMainWindow):
         
         if not (program_data and year and semester > 0): return
 
-        try:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT id, name, credits, semester, has_two_grades 
-                    FROM courses 
-                    WHERE program_id = ? AND year_of_study = ? AND semester = ?
-                    ORDER BY name
-                """, (program_data['id'], year, semester))
-                
-                for row, (c_id, c_name, credits, sem, two_grades) in enumerate(cursor.fetchall()):
-                    self.courses_table.insertRow(row)
-                    item = QTableWidgetItem(c_name)
-                    item.setData(Qt.UserRole, {'id': c_id, 'name': c_name, 'credits': credits, 'semester': sem, 'has_two_grades': two_grades, 'program_id': program_data['id']})
-                    self.courses_table.setItem(row, 0, item)
-                    self.courses_table.setItem(row, 1, QTableWidgetItem(str(credits)))
-                    self.courses_table.setItem(row, 2, QTableWidgetItem(str(sem)))
-                    self.courses_table.setItem(row, 3, QTableWidgetItem("2 Notes" if two_grades else "1 Note"))
-        except sqlite3.Error as e:
-            QMessageBox.warning(self, "Erreur", f"Impossible de charger les matières: {e}")
+        self.courses_loader.load(queries.COURSES_FOR_PROGRAM, (program_data['id'], year, semester))
 
+    def append_course_rows(self, rows):
+        program_data = self.course_prog_filter.currentData()
+        for c_id, c_name, credits, sem, two_grades, validation_grade in rows:
+            row = self.courses_table.rowCount()
+            self.courses_table.insertRow(row)
+            item = QTableWidgetItem(c_name)
+            item.setData(Qt.UserRole, {'id': c_id, 'name': c_name, 'credits': credits, 'semester': sem, 'has_two_grades': two_grades,
+                                       'program_id': program_data['id'], 'validation_grade': validation_grade})
+            self.courses_table.setItem(row, 0, item)
+            self.courses_table.setItem(row, 1, QTableWidgetItem(str(credits)))
+            self.courses_table.setItem(row, 2, QTableWidgetItem(str(sem)))
+            self.courses_table.setItem(row, 3, QTableWidgetItem("2 Notes" if two_grades else "1 Note"))
 
     def refresh_grades_for_selected_course(self):
         selected_items = self.courses_table.selectedItems()
-        self.grades_table.setRowCount(0)
+        self.confirm_pending_grades()
+        self.grades_pager.cancel()
+        self.grades_model.clear()
+        self.update_grade_buttons()
         if not selected_items or not self.grades_year_filter.currentData():
             return
         
@@ -607,95 +797,51 @@ class MainWindow(QMainWindow):
         program_id = course_data['program_id']
         academic_year_id = self.grades_year_filter.currentData() 
 
-        try:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT d.validation_grade FROM departments d
-                    JOIN programs p ON p.department_id = d.id
-                    WHERE p.id = ?
-                """, (program_id,))
-                res = cursor.fetchone()
-                validation_grade = res[0] if res else 10.0
-
-                cursor.execute("""
-                    SELECT s.matricule, s.last_name, s.first_name, g.grade1, g.grade2, g.resit_grade
-                    FROM students s
-                    LEFT JOIN grades g ON s.matricule = g.student_matricule AND g.course_id = ?
-                    WHERE s.program_id = ? AND s.academic_year_id = ?
-                    ORDER BY s.last_name, s.first_name
-                """, (course_id, program_id, academic_year_id))
-
-
-                
-                self.grades_table.blockSignals(True)
-                for row, (mat, lname, fname, g1, g2, gr) in enumerate(cursor.fetchall()):
-                    self.grades_table.insertRow(row)
-                    
-                    mat_item = QTableWidgetItem(mat)
-                    mat_item.setData(Qt.UserRole, course_id)
-                    self.grades_table.setItem(row, 0, mat_item)
-                    
-                    name_item = QTableWidgetItem(f"{lname.upper()} {fname}")
-                    name_item.setFlags(name_item.flags() & ~Qt.ItemIsEditable)
-                    self.grades_table.setItem(row, 1, name_item)
-                    
-                    self.grades_table.setItem(row, 2, QTableWidgetItem(str(g1) if g1 is not None else ""))
-                    
-                    grade2_item = QTableWidgetItem(str(g2) if g2 is not None else "")
-                    if not course_data['has_two_grades']:
-                        grade2_item.setFlags(grade2_item.flags() & ~Qt.ItemIsEditable)
-                        grade2_item.setBackground(QColor('lightgray'))
-                    self.grades_table.setItem(row, 3, grade2_item)
-                    
-                    self.grades_table.setItem(row, 4, QTableWidgetItem(str(gr) if gr is not None else ""))
-
-                    final_grade, status = self.calculate_final_grade_and_status(g1, g2, gr, course_data['has_two_grades'], validation_grade)
-                    
-                    grade_str = f"{final_grade:.2f}" if final_grade is not None else "-"
-                    final_grade_item = QTableWidgetItem(grade_str)
-                    final_grade_item.setFlags(final_grade_item.flags() & ~Qt.ItemIsEditable)
-
-                    status_item = QTableWidgetItem(status)
-                    status_item.setFlags(status_item.flags() & ~Qt.ItemIsEditable)
-
-                    self.grades_table.setItem(row, 5, final_grade_item)
-                    self.grades_table.setItem(row, 6, status_item)
-
-                self.grades_table.blockSignals(False)
-        except sqlite3.Error as e:
-            QMessageBox.warning(self, "Erreur", f"Impossible de charger les notes: {e}")
+        self.grades_model.set_course(course_data, course_data['validation_grade'], academic_year_id)
+        sort_keys, descending = self.grades_model.sort_query_keys()
+        self.grades_pager.load(queries.GRADES_FOR_COURSE, [queries.GRADES_FOR_COURSE_FILTER],
+                               [course_id, program_id, academic_year_id], sort_keys, descending,
+                               count=(queries.GRADES_COUNT + " WHERE " + queries.GRADES_FOR_COURSE_FILTER,
+                                      [program_id, academic_year_id]))
             
     def refresh_users_tab(self):
         if not hasattr(self, 'users_table'): return
         self.users_table.setRowCount(0)
-        try:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT id, username, role FROM users ORDER BY username")
-                for row, (uid, uname, role) in enumerate(cursor.fetchall()):
-                    self.users_table.insertRow(row)
-                    item = QTableWidgetItem(uname)
-                    item.setData(Qt.UserRole, uid)
-                    self.users_table.setItem(row, 0, item)
-                    self.users_table.setItem(row, 1, QTableWidgetItem(role))
-        except sqlite3.Error as e:
-            QMessageBox.warning(self, "Erreur", f"Impossible de charger les utilisateurs: {e}")
+        self.users_loader.load("SELECT id, username, role FROM users ORDER BY username")
+
+    def append_user_rows(self, rows):
+        for uid, uname, role in rows:
+            row = self.users_table.rowCount()
+            self.users_table.insertRow(row)
+            item = QTableWidgetItem(uname)
+            item.setData(Qt.UserRole, uid)
+            self.users_table.setItem(row, 0, item)
+            self.users_table.setItem(row, 1, QTableWidgetItem(role))
+
+    def submit_change(self, work, args, message, entity, key=None, duplicate_message=None,
+                      error_message="Échec de l'enregistrement"):
+        """Confie work(*args) au thread d'écriture sans bloquer l'interface ; à la fin, affiche
+        message et publie le changement, ou duplicate_message si une contrainte d'unicité a échoué."""
+        def on_saved(_):
+            QMessageBox.information(self, "Succès", message)
+            self.change_bus.publish(entity, key)
+
+        def on_error(error):
+            if duplicate_message and isinstance(error, sqlite3.IntegrityError):
+                QMessageBox.warning(self, "Erreur", duplicate_message)
+            else:
+                QMessageBox.critical(self, "Erreur DB", f"{error_message} : {error}")
+
+        WriteWatcher(submit_write(work, *args), on_saved, on_error, self)
 
     def add_academic_year(self):
+        from Dialogs import AcademicYearDialog
         dialog = AcademicYearDialog(parent=self)
         if dialog.exec():
             data = dialog.get_data()
-            try:
-                with sqlite3.connect(DB_NAME) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("INSERT INTO academic_years (name, start_year, end_year) VALUES (?, ?, ?)", 
-                                   (data['name'], data['start_year'], data['end_year']))
-                    conn.commit()
-                QMessageBox.information(self, "Succès", f"Année académique '{data['name']}' ajoutée.")
-                self.data_changed_signal.emit()
-            except sqlite3.IntegrityError:
-                QMessageBox.warning(self, "Erreur", "Cette année académique existe déjà.")
+            self.submit_change(mutations.add_academic_year, (data['name'], data['start_year'], data['end_year']),
+                               f"Année académique '{data['name']}' ajoutée.", events.ACADEMIC_YEARS,
+                               duplicate_message="Cette année académique existe déjà.")
 
     def edit_academic_year(self):
         selected_row = self.year_table.currentRow()
@@ -704,19 +850,14 @@ class MainWindow(QMainWindow):
             return
 
         year_data = self.year_table.item(selected_row, 0).data(Qt.UserRole)
+        from Dialogs import AcademicYearDialog
         dialog = AcademicYearDialog(year_data, self)
         if dialog.exec():
             new_data = dialog.get_data()
-            try:
-                with sqlite3.connect(DB_NAME) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("UPDATE academic_years SET name = ?, start_year = ?, end_year = ? WHERE id = ?",
-                                   (new_data['name'], new_data['start_year'], new_data['end_year'], year_data['id']))
-                    conn.commit()
-                QMessageBox.information(self, "Succès", "Année académique mise à jour.")
-                self.data_changed_signal.emit()
-            except sqlite3.IntegrityError:
-                QMessageBox.warning(self, "Erreur", "Ce nom d'année académique est déjà utilisé.")
+            self.submit_change(mutations.update_academic_year,
+                               (year_data['id'], new_data['name'], new_data['start_year'], new_data['end_year']),
+                               "Année académique mise à jour.", events.ACADEMIC_YEARS, year_data['id'],
+                               duplicate_message="Ce nom d'année académique est déjà utilisé.")
 
     def delete_academic_year(self):
         selected_row = self.year_table.currentRow()
@@ -729,32 +870,18 @@ class MainWindow(QMainWindow):
                                     f"Supprimer l'année académique '{year_data['name']}' ?\nCeci supprimera toutes les inscriptions associées.",
                                     QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
-            try:
-                with sqlite3.connect(DB_NAME) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("PRAGMA foreign_keys = ON;")
-                    cursor.execute("DELETE FROM academic_years WHERE id = ?", (year_data['id'],))
-                    conn.commit()
-                QMessageBox.information(self, "Succès", "Année académique supprimée.")
-                self.data_changed_signal.emit()
-            except sqlite3.Error as e:
-                QMessageBox.critical(self, "Erreur DB", f"Erreur lors de la suppression : {e}")
+            self.submit_change(mutations.delete_academic_year, (year_data['id'],), "Année académique supprimée.",
+                               events.ACADEMIC_YEARS, year_data['id'], error_message="Erreur lors de la suppression")
 
     def add_department(self):
+        from Dialogs import DepartmentDialog
         dialog = DepartmentDialog(parent=self)
         if dialog.exec():
             data = dialog.get_data()
             if data['name']:
-                try:
-                    with sqlite3.connect(DB_NAME) as conn:
-                        cursor = conn.cursor()
-                        cursor.execute("INSERT INTO departments (name, validation_grade) VALUES (?, ?)", 
-                                       (data['name'], data['validation_grade']))
-                        conn.commit()
-                    QMessageBox.information(self, "Succès", f"Département '{data['name']}' ajouté.")
-                    self.data_changed_signal.emit()
-                except sqlite3.IntegrityError:
-                    QMessageBox.warning(self, "Erreur", "Ce nom de département existe déjà.")
+                self.submit_change(mutations.add_department, (data['name'], data['validation_grade']),
+                                   f"Département '{data['name']}' ajouté.", events.DEPARTMENTS,
+                                   duplicate_message="Ce nom de département existe déjà.")
 
     def edit_department(self):
         selected_row = self.dep_table.currentRow()
@@ -766,20 +893,14 @@ class MainWindow(QMainWindow):
         current_name = self.dep_table.item(selected_row, 0).text()
         current_grade = float(self.dep_table.item(selected_row, 1).text())
         
+        from Dialogs import DepartmentDialog
         dialog = DepartmentDialog({'name': current_name, 'validation_grade': current_grade}, self)
         if dialog.exec():
             data = dialog.get_data()
             if data['name']:
-                try:
-                    with sqlite3.connect(DB_NAME) as conn:
-                        cursor = conn.cursor()
-                        cursor.execute("UPDATE departments SET name = ?, validation_grade = ? WHERE id = ?",
-                                       (data['name'], data['validation_grade'], dep_id))
-                        conn.commit()
-                    QMessageBox.information(self, "Succès", "Département mis à jour.")
-                    self.data_changed_signal.emit()
-                except sqlite3.IntegrityError:
-                    QMessageBox.warning(self, "Erreur", "Ce nom de département est déjà utilisé par un autre.")
+                self.submit_change(mutations.update_department, (dep_id, data['name'], data['validation_grade']),
+                                   "Département mis à jour.", events.DEPARTMENTS, dep_id,
+                                   duplicate_message="Ce nom de département est déjà utilisé par un autre.")
 
     def delete_department(self):
         selected_row = self.dep_table.currentRow()
@@ -793,32 +914,18 @@ class MainWindow(QMainWindow):
         reply = QMessageBox.question(self, "Confirmation", f"Supprimer '{dep_name}' ?\nCeci supprimera toutes les formations, matières, et notes associées.",
                                      QMessageBox.Yes | QMessageBox.No)
         if reply == QMessageBox.Yes:
-            try:
-                with sqlite3.connect(DB_NAME) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("PRAGMA foreign_keys = ON;")
-                    cursor.execute("DELETE FROM departments WHERE id = ?", (dep_id,))
-                    conn.commit()
-                QMessageBox.information(self, "Succès", "Département supprimé.")
-                self.data_changed_signal.emit()
-            except sqlite3.Error as e:
-                QMessageBox.critical(self, "Erreur DB", f"Erreur lors de la suppression : {e}")
+            self.submit_change(mutations.delete_department, (dep_id,), "Département supprimé.", events.DEPARTMENTS,
+                               dep_id, error_message="Erreur lors de la suppression")
 
     def add_program(self):
+        from Dialogs import ProgramDialog
         dialog = ProgramDialog(parent=self)
         if dialog.exec():
             data = dialog.get_data()
             if data['name'] and data['department_id']:
-                try:
-                    with sqlite3.connect(DB_NAME) as conn:
-                        cursor = conn.cursor()
-                        cursor.execute("INSERT INTO programs (name, duration_years, department_id) VALUES (?, ?, ?)",
-                                       (data['name'], data['duration'], data['department_id']))
-                        conn.commit()
-                    QMessageBox.information(self, "Succès", "Formation ajoutée.")
-                    self.data_changed_signal.emit()
-                except sqlite3.IntegrityError:
-                    QMessageBox.warning(self, "Erreur", "Ce nom de formation existe déjà.")
+                self.submit_change(mutations.add_program, (data['name'], data['duration'], data['department_id']),
+                                   "Formation ajoutée.", events.PROGRAMS,
+                                   duplicate_message="Ce nom de formation existe déjà.")
 
     def edit_program(self):
         selected_row = self.prog_table.currentRow()
@@ -827,21 +934,16 @@ class MainWindow(QMainWindow):
             return
 
         prog_data = self.prog_table.item(selected_row, 0).data(Qt.UserRole)
+        from Dialogs import ProgramDialog
         dialog = ProgramDialog(prog_data, self)
         
         if dialog.exec():
             new_data = dialog.get_data()
             if new_data['name'] and new_data['department_id']:
-                try:
-                    with sqlite3.connect(DB_NAME) as conn:
-                        cursor = conn.cursor()
-                        cursor.execute("UPDATE programs SET name=?, duration_years=?, department_id=? WHERE id=?",
-                                       (new_data['name'], new_data['duration'], new_data['department_id'], prog_data['id']))
-                        conn.commit()
-                    QMessageBox.information(self, "Succès", "Formation mise à jour.")
-                    self.data_changed_signal.emit()
-                except sqlite3.IntegrityError:
-                    QMessageBox.warning(self, "Erreur", "Ce nom de formation est déjà utilisé.")
+                self.submit_change(mutations.update_program,
+                                   (prog_data['id'], new_data['name'], new_data['duration'], new_data['department_id']),
+                                   "Formation mise à jour.", events.PROGRAMS, prog_data['id'],
+                                   duplicate_message="Ce nom de formation est déjà utilisé.")
 
     def delete_program(self):
         selected_row = self.prog_table.currentRow()
@@ -854,18 +956,11 @@ class MainWindow(QMainWindow):
         
         reply = QMessageBox.question(self, "Confirmation", f"Supprimer la formation '{prog_name}' ?")
         if reply == QMessageBox.Yes:
-            try:
-                with sqlite3.connect(DB_NAME) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("PRAGMA foreign_keys = ON;")
-                    cursor.execute("DELETE FROM programs WHERE id = ?", (prog_id,))
-                    conn.commit()
-                QMessageBox.information(self, "Succès", "Formation supprimée.")
-                self.data_changed_signal.emit()
-            except sqlite3.Error as e:
-                QMessageBox.critical(self, "Erreur DB", f"Erreur lors de la suppression : {e}")
+            self.submit_change(mutations.delete_program, (prog_id,), "Formation supprimée.", events.PROGRAMS, prog_id,
+                               error_message="Erreur lors de la suppression")
 
     def add_student(self):
+        from Dialogs import StudentDialog
         dialog = StudentDialog(parent=self)
         if dialog.exec():
             data = dialog.get_data()
@@ -873,112 +968,77 @@ class MainWindow(QMainWindow):
                 QMessageBox.warning(self, "Champs requis", "Tous les champs doivent être remplis.")
                 return
 
-            try:
-                with sqlite3.connect(DB_NAME) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("INSERT INTO students (matricule, last_name, first_name) VALUES (?, ?, ?)",
-                                   (data['matricule'], data['last_name'], data['first_name']))
-                    conn.commit()
-                QMessageBox.information(self, "Succès", f"Étudiant '{data['first_name']} {data['last_name']}' créé.")
-                self.data_changed_signal.emit()
-            except sqlite3.IntegrityError:
-                QMessageBox.warning(self, "Erreur", "Ce numéro matricule est déjà utilisé.")
+            self.submit_change(mutations.add_student, (data['matricule'], data['last_name'], data['first_name']),
+                               f"Étudiant '{data['first_name']} {data['last_name']}' créé.", events.STUDENTS,
+                               data['matricule'], duplicate_message="Ce numéro matricule est déjà utilisé.")
     
+    def selected_student(self):
+        """Renvoie la ligne (matricule, nom, prénom, ...) de l'étudiant sélectionné, ou None."""
+        index = self.stud_table.currentIndex()
+        return self.students_model.row_data(index.row()) if index.isValid() else None
+
     def edit_student(self):
-        selected_row = self.stud_table.currentRow()
-        if selected_row < 0:
+        student = self.selected_student()
+        if student is None:
             QMessageBox.warning(self, "Sélection requise", "Veuillez sélectionner un étudiant à modifier.")
             return
 
         student_data = {
-            'matricule': self.stud_table.item(selected_row, 0).text(),
-            'last_name': self.stud_table.item(selected_row, 1).text(),
-            'first_name': self.stud_table.item(selected_row, 2).text()
+            'matricule': student[0],
+            'last_name': student[1],
+            'first_name': student[2]
         }
         
+        from Dialogs import StudentDialog
         dialog = StudentDialog(student_data, self)
         if dialog.exec():
             new_data = dialog.get_data()
             if new_data['last_name'] and new_data['first_name']:
-                try:
-                    with sqlite3.connect(DB_NAME) as conn:
-                        cursor = conn.cursor()
-                        cursor.execute("UPDATE students SET last_name = ?, first_name = ? WHERE matricule = ?",
-                                       (new_data['last_name'], new_data['first_name'], new_data['matricule']))
-                        conn.commit()
-                    QMessageBox.information(self, "Succès", "Informations de l'étudiant mises à jour.")
-                    self.data_changed_signal.emit()
-                except sqlite3.Error as e:
-                    QMessageBox.warning(self, "Erreur", f"Impossible de mettre à jour l'étudiant: {e}")
+                self.submit_change(mutations.update_student,
+                                   (new_data['matricule'], new_data['last_name'], new_data['first_name']),
+                                   "Informations de l'étudiant mises à jour.", events.STUDENTS, new_data['matricule'],
+                                   error_message="Impossible de mettre à jour l'étudiant")
 
     def delete_student(self):
-        selected_row = self.stud_table.currentRow()
-        if selected_row < 0:
+        student = self.selected_student()
+        if student is None:
             QMessageBox.warning(self, "Sélection requise", "Veuillez sélectionner un étudiant.")
             return
         
-        matricule = self.stud_table.item(selected_row, 0).text()
-        name = f"{self.stud_table.item(selected_row, 1).text()} {self.stud_table.item(selected_row, 2).text()}"
+        matricule = student[0]
+        name = f"{student[1]} {student[2]}"
         
         reply = QMessageBox.question(self, "Confirmation", f"Supprimer l'étudiant '{name}' ({matricule}) ?\nCeci supprimera aussi son compte utilisateur et toutes ses notes.")
         if reply == QMessageBox.Yes:
-            try:
-                with sqlite3.connect(DB_NAME) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("PRAGMA foreign_keys = ON;")
-                    cursor.execute("DELETE FROM students WHERE matricule = ?", (matricule,))
-                    conn.commit()
-                QMessageBox.information(self, "Succès", "Étudiant et données associées supprimés.")
-                self.data_changed_signal.emit()
-            except sqlite3.Error as e:
-                QMessageBox.critical(self, "Erreur DB", f"Erreur lors de la suppression : {e}")
+            self.submit_change(mutations.delete_student, (matricule,), "Étudiant et données associées supprimés.",
+                               events.STUDENTS, matricule, error_message="Erreur lors de la suppression")
 
     def enroll_student(self):
-        selected_row = self.stud_table.currentRow()
-        if selected_row < 0:
+        student = self.selected_student()
+        if student is None:
             QMessageBox.warning(self, "Sélection requise", "Veuillez sélectionner un étudiant.")
             return
         
-        matricule = self.stud_table.item(selected_row, 0).text()
-        name = f"{self.stud_table.item(selected_row, 1).text()} {self.stud_table.item(selected_row, 2).text()}"
+        matricule = student[0]
+        name = f"{student[1]} {student[2]}"
         
+        from Dialogs import EnrollStudentDialog
         dialog = EnrollStudentDialog(matricule, self)
         if dialog.exec():
             data = dialog.get_data()
-            try:
-                with sqlite3.connect(DB_NAME) as conn:
-                    cursor = conn.cursor()
-                    
-                    cursor.execute("SELECT id FROM academic_years WHERE id = ?", (data['academic_year_id'],))
-                    if not cursor.fetchone():
-                        QMessageBox.warning(self, "Erreur", "L'année académique sélectionnée n'existe pas.")
-                        return
-                    
-                    cursor.execute("SELECT id FROM programs WHERE id = ?", (data['program_id'],))
-                    if not cursor.fetchone():
-                        QMessageBox.warning(self, "Erreur", "La formation sélectionnée n'existe pas.")
-                        return
-
-                    cursor.execute("""
-                        SELECT COUNT(*) 
-                        FROM students 
-                        WHERE matricule = ? AND academic_year_id = ?
-                    """, (matricule, data['academic_year_id']))
-                    
-                    if cursor.fetchone()[0] > 0:
-                        QMessageBox.warning(self, "Inscription existante", "Cet étudiant est déjà inscrit pour cette année académique.")
-                        return
-                    
-                    cursor.execute("""
-                        UPDATE students 
-                        SET program_id = ?, academic_year_id = ?, year_of_study = ?
-                        WHERE matricule = ?
-                    """, (data['program_id'], data['academic_year_id'], data['year_of_study'], matricule))
-                    conn.commit()
+
+            def on_enrolled(refusal):
+                if refusal:
+                    QMessageBox.warning(self, *refusal)
+                    return
                 QMessageBox.information(self, "Succès", f"Étudiant {name} inscrit.")
-                self.data_changed_signal.emit()
-            except sqlite3.Error as e:
-                QMessageBox.warning(self, "Erreur", f"Échec de l'inscription: {e}")
+                self.change_bus.publish(events.STUDENTS, matricule)
+
+            def on_error(error):
+                QMessageBox.warning(self, "Erreur", f"Échec de l'inscription: {error}")
+
+            WriteWatcher(submit_write(enroll, matricule, data['program_id'], data['academic_year_id'],
+                                      data['year_of_study']), on_enrolled, on_error, self)
 
     def add_course(self):
         program_data = self.course_prog_filter.currentData()
@@ -988,22 +1048,15 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Sélection requise", "Veuillez sélectionner une formation et une année.")
             return
         
+        from Dialogs import CourseDialog
         dialog = CourseDialog(parent=self)
         if dialog.exec():
             data = dialog.get_data()
             if data['name'] and data['credits'] > 0:
-                try:
-                    with sqlite3.connect(DB_NAME) as conn:
-                        cursor = conn.cursor()
-                        cursor.execute(
-                            "INSERT INTO courses (name, credits, semester, program_id, year_of_study, has_two_grades) VALUES (?, ?, ?, ?, ?, ?)",
-                            (data['name'], data['credits'], data['semester'], program_data['id'], year_of_study, data['has_two_grades'])
-                        )
-                        conn.commit()
-                    QMessageBox.information(self, "Succès", "Matière ajoutée.")
-                    self.data_changed_signal.emit()
-                except sqlite3.IntegrityError:
-                    QMessageBox.warning(self, "Erreur", "Cette matière existe déjà pour cette formation/année/semestre.")
+                self.submit_change(mutations.add_course, (data['name'], data['credits'], data['semester'],
+                                                          program_data['id'], year_of_study, data['has_two_grades']),
+                                   "Matière ajoutée.", events.COURSES,
+                                   duplicate_message="Cette matière existe déjà pour cette formation/année/semestre.")
 
     def edit_course(self):
         selected_row = self.courses_table.currentRow()
@@ -1012,21 +1065,16 @@ class MainWindow(QMainWindow):
             return
 
         course_data = self.courses_table.item(selected_row, 0).data(Qt.UserRole)
+        from Dialogs import CourseDialog
         dialog = CourseDialog(course_data, self)
         
         if dialog.exec():
             new_data = dialog.get_data()
             if new_data['name']:
-                try:
-                    with sqlite3.connect(DB_NAME) as conn:
-                        cursor = conn.cursor()
-                        cursor.execute("UPDATE courses SET name=?, credits=?, semester=?, has_two_grades=? WHERE id=?",
-                                       (new_data['name'], new_data['credits'], new_data['semester'], new_data['has_two_grades'], course_data['id']))
-                        conn.commit()
-                    QMessageBox.information(self, "Succès", "Matière mise à jour.")
-                    self.data_changed_signal.emit()
-                except sqlite3.IntegrityError:
-                    QMessageBox.warning(self, "Erreur", "Une matière avec ce nom existe déjà dans ce contexte.")
+                self.submit_change(mutations.update_course, (course_data['id'], new_data['name'], new_data['credits'],
+                                                             new_data['semester'], new_data['has_two_grades']),
+                                   "Matière mise à jour.", events.COURSES, course_data['id'],
+                                   duplicate_message="Une matière avec ce nom existe déjà dans ce contexte.")
 
     def delete_course(self):
         selected_row = self.courses_table.currentRow()
@@ -1039,78 +1087,221 @@ class MainWindow(QMainWindow):
         
         reply = QMessageBox.question(self, "Confirmation", f"Supprimer la matière '{course_name}' ?")
         if reply == QMessageBox.Yes:
-            try:
-                with sqlite3.connect(DB_NAME) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("PRAGMA foreign_keys = ON;")
-                    cursor.execute("DELETE FROM courses WHERE id = ?", (course_id,))
-                    conn.commit()
-                QMessageBox.information(self, "Succès", "Matière supprimée.")
-                self.data_changed_signal.emit()
-            except sqlite3.Error as e:
-                QMessageBox.critical(self, "Erreur DB", f"Erreur lors de la suppression : {e}")
+            self.submit_change(mutations.delete_course, (course_id,), "Matière supprimée.", events.COURSES, course_id,
+                               error_message="Erreur lors de la suppression")
 
-    def update_grade(self, item):
-        self.grades_table.blockSignals(True)
-        
-        row, col = item.row(), item.column()
+    def update_grade(self, row, col, text):
+        matricule = self.grades_model.row_data(row)[0]
+        course_id = self.grades_model.course_data['id']
         
-        matricule_item = self.grades_table.item(row, 0)
-        if not matricule_item: 
-            self.grades_table.blockSignals(False)
+        try:
+            new_value = parse_grade(text)
+        except ValueError:
+            QMessageBox.warning(self, "Valeur invalide", "La note doit être un nombre entre 0 et 20.")
             return
 
-        matricule = matricule_item.text()
-        course_id = matricule_item.data(Qt.UserRole)
-        
-        new_value = None
-        if item.text().strip():
-            try:
-                new_value = float(item.text().strip().replace(',', '.'))
-                if not (0 <= new_value <= 20): raise ValueError
-            except ValueError:
-                QMessageBox.warning(self, "Valeur invalide", "La note doit être un nombre entre 0 et 20.")
-                self.refresh_grades_for_selected_course()
-                self.grades_table.blockSignals(False)
-                return
-
         column_map = {2: "grade1", 3: "grade2", 4: "resit_grade"}
         field_to_update = column_map.get(col)
         if not field_to_update: 
-            self.grades_table.blockSignals(False)
+            return
+
+        academic_year_id = self.grades_model.academic_year_id
+        if not academic_year_id:
+            QMessageBox.warning(self, "Erreur", "Aucune année académique sélectionnée.")
+            return
+
+        if self.grades_batch_checkbox.isChecked():
+            self.grades_model.stage_grade(row, col, new_value)
+            self.update_grade_buttons()
+            return
+
+        def on_saved(_):
+            # La table a pu être rechargée entre-temps : ne toucher qu'à la même ligne.
+            model = self.grades_model
+            if (row < model.rowCount() and model.row_data(row)[0] == matricule
+                    and model.course_data and model.course_data['id'] == course_id
+                    and model.academic_year_id == academic_year_id):
+                model.set_grade(row, col, new_value)
+            self.change_bus.publish(events.GRADES, (matricule, course_id, academic_year_id))
+
+        def on_error(error):
+            QMessageBox.warning(self, "Erreur DB", f"Impossible de sauvegarder la note : {error}")
+
+        # Sans attendre : les saisies rapprochées sont regroupées par le thread d'écriture.
+        WriteWatcher(submit_write(save_grade, matricule, course_id, academic_year_id, field_to_update, new_value),
+                     on_saved, on_error, self)
+
+    def update_grade_buttons(self):
+        batch_mode = self.grades_batch_checkbox.isChecked() and not self.grades_saving
+        has_changes = self.grades_model.has_changes()
+        self.grades_undo_button.setEnabled(batch_mode and has_changes)
+        self.grades_discard_button.setEnabled(batch_mode and has_changes)
+        self.grades_save_button.setEnabled(batch_mode and has_changes)
+
+    def toggle_grades_batch_mode(self, checked):
+        if not checked:
+            self.confirm_pending_grades()
+        self.update_grade_buttons()
+
+    def undo_grade_edit(self):
+        self.grades_model.undo()
+        self.update_grade_buttons()
+
+    def discard_grade_edits(self):
+        self.grades_model.discard_changes()
+        self.update_grade_buttons()
+
+    def save_grade_edits(self):
+        """Enregistre en une seule transaction toutes les notes de la saisie groupée, sans bloquer l'interface.
+
+        La grille n'est plus modifiable jusqu'à la fin de l'enregistrement.
+        """
+        changes = self.grades_model.pending_changes()
+        course_id = self.grades_model.course_data['id'] if self.grades_model.course_data else None
+        academic_year_id = self.grades_model.academic_year_id
+        if not changes:
+            self.grades_model.mark_saved()
+            self.update_grade_buttons()
+            return
+
+        def finish():
+            self.grades_saving = False
+            self.grades_table.setEnabled(True)
+            self.update_grade_buttons()
+
+        def on_saved(_):
+            # Si la grille a été rechargée entre-temps, il n'y a plus rien en attente.
+            self.grades_model.mark_saved()
+            finish()
+            self.change_bus.publish(events.GRADES, [(matricule, course_id, academic_year_id) for matricule, *_ in changes])
+
+        def on_error(error):
+            finish()
+            QMessageBox.warning(self, "Erreur DB", f"Impossible d'enregistrer les notes : {error}")
+
+        self.grades_saving = True
+        self.grades_table.setEnabled(False)
+        self.update_grade_buttons()
+        WriteWatcher(submit_write(upsert_course_grades, course_id, academic_year_id, changes), on_saved, on_error, self)
+
+    def confirm_pending_grades(self):
+        """Propose d'enregistrer les notes en attente avant qu'elles ne soient rechargées."""
+        if not hasattr(self, 'grades_model') or self.grades_saving or not self.grades_model.has_changes():
+            return
+        reply = QMessageBox.question(self, "Notes non enregistrées",
+                                     "Des notes ont été modifiées sans être enregistrées.\nLes enregistrer maintenant ?",
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply == QMessageBox.Yes:
+            self.save_grade_edits()
+        else:
+            self.discard_grade_edits()
+
+    def open_cohort_grades(self):
+        """Grille des notes de la promotion pour toutes les matières affichées (formation, année, semestre)."""
+        program_data = self.course_prog_filter.currentData()
+        year_of_study = self.course_year_filter.currentData()
+        academic_year_id = self.grades_year_filter.currentData()
+        if not (program_data and year_of_study and academic_year_id):
+            QMessageBox.warning(self, "Sélection requise",
+                                "Veuillez choisir une formation, une année d'étude et une année académique.")
+            return
+        courses = [self.courses_table.item(row, 0).data(Qt.UserRole) for row in range(self.courses_table.rowCount())]
+        if not courses:
+            QMessageBox.warning(self, "Aucune matière", "Aucune matière pour ce semestre.")
+            return
+        self.confirm_pending_grades()
+
+        from Dialogs import CohortGradesDialog
+        dialog = CohortGradesDialog({
+            'program_id': program_data['id'],
+            'program_name': self.course_prog_filter.currentText(),
+            'year_of_study': year_of_study,
+            'semester': self.course_semester_filter.currentIndex() + 1,
+            'academic_year_id': academic_year_id,
+            'academic_year_name': self.grades_year_filter.currentText(),
+        }, courses, self)
+        dialog.exec()
+        if dialog.saved:
+            self.change_bus.publish(events.GRADES)
+
+    def import_grades_file(self):
+        selected_items = self.courses_table.selectedItems()
+        academic_year_id = self.grades_year_filter.currentData()
+        if not selected_items or not academic_year_id:
+            QMessageBox.warning(self, "Sélection requise", "Veuillez sélectionner une matière et une année académique.")
+            return
+        course_data = selected_items[0].data(Qt.UserRole)
+
+        path, _ = QFileDialog.getOpenFileName(self, f"Importer les notes de {course_data['name']}", "",
+                                              "Fichiers de notes (*.csv *.xlsx)")
+        if not path:
             return
 
         try:
-            with sqlite3.connect(DB_NAME) as conn:
-                cursor = conn.cursor()
-                
-                academic_year_id = self.grades_year_filter.currentData()
-                if not academic_year_id:
-                    QMessageBox.warning(self, "Erreur", "Aucune année académique sélectionnée.")
-                    return
-                    
-                cursor.execute("SELECT id FROM grades WHERE student_matricule = ? AND course_id = ? AND academic_year_id = ?", 
-                            (matricule, course_id, academic_year_id))
-                grade_exists = cursor.fetchone()
-                
-                if grade_exists:
-                    cursor.execute(f"UPDATE grades SET {field_to_update} = ? WHERE student_matricule = ? AND course_id = ? AND academic_year_id = ?", 
-                                (new_value, matricule, course_id, academic_year_id))
-                else:
-                    cursor.execute(f"""
-                        INSERT INTO grades 
-                        (student_matricule, course_id, academic_year_id, {field_to_update}) 
-                        VALUES (?, ?, ?, ?)
-                    """, (matricule, course_id, academic_year_id, new_value))
-                    
-                conn.commit()
-        except sqlite3.Error as e:
-            QMessageBox.warning(self, "Erreur DB", f"Impossible de sauvegarder la note : {e}")
-        finally:
-            self.refresh_grades_for_selected_course()
-            self.grades_table.blockSignals(False)
+            valid_rows, errors = load_grade_file(path, course_data, academic_year_id)
+        except (GradeFileError, sqlite3.Error) as e:
+            QMessageBox.warning(self, "Import impossible", str(e))
+            return
+
+        if errors:
+            details = "\n".join(f"Ligne {line}: {message}" for line, message in errors[:20])
+            if len(errors) > 20:
+                details += f"\n… et {len(errors) - 20} autre(s) erreur(s)."
+            if not valid_rows:
+                QMessageBox.warning(self, "Import impossible", f"Aucune ligne valide.\n\n{details}")
+                return
+            reply = QMessageBox.question(self, "Erreurs dans le fichier",
+                                         f"{len(errors)} ligne(s) rejetée(s) :\n\n{details}\n\n"
+                                         f"Importer les {len(valid_rows)} ligne(s) valides ?",
+                                         QMessageBox.Yes | QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                return
+
+        self.submit_change(upsert_imported_grades, (valid_rows,), f"{len(valid_rows)} note(s) importée(s).",
+                           events.GRADES, error_message="Impossible d'importer les notes")
+
+    def import_intake_file(self):
+        from intake import insert_intake, load_intake_file
+        from tablefiles import TableFileError
+        path, _ = QFileDialog.getOpenFileName(self, "Importer les inscriptions de rentrée", "",
+                                              "Fichiers d'étudiants (*.csv *.xlsx)")
+        if not path:
+            return
+
+        try:
+            report = load_intake_file(path)
+        except (TableFileError, sqlite3.Error) as e:
+            QMessageBox.warning(self, "Import impossible", str(e))
+            return
+
+        rejected = report.rejected
+        details = "\n".join(f"Ligne {line}: {message}" for line, message in rejected[:20])
+        if len(rejected) > 20:
+            details += f"\n… et {len(rejected) - 20} autre(s) ligne(s)."
+        if not report.enrollments:
+            QMessageBox.warning(self, "Import impossible", f"Aucune ligne valide.\n\n{details}")
+            return
+        question = f"{report.summary()}.\n\n"
+        if rejected:
+            question += f"Lignes refusées :\n\n{details}\n\n"
+        reply = QMessageBox.question(self, "Rentrée", question + f"Enregistrer les {len(report.enrollments)} inscription(s) ?",
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply != QMessageBox.Yes:
+            return
+
+        self.submit_change(insert_intake, (report.new_students, report.enrollments),
+                           f"{len(report.new_students)} étudiant(s) créé(s), "
+                           f"{len(report.enrollments)} inscription(s) enregistrée(s).", events.STUDENTS,
+                           duplicate_message="Des étudiants ou inscriptions ont été créés entre-temps "
+                                             "sur un autre poste ; rechargez le fichier.",
+                           error_message="Impossible d'enregistrer les inscriptions")
+
+    def show_diagnostics(self):
+        from Dialogs import DiagnosticsDialog
+        DiagnosticsDialog(self).exec()
 
     def change_own_password(self):
+        from Dialogs import ChangePasswordDialog
         dialog = ChangePasswordDialog(self)
         if dialog.exec():
             old, new, confirm = dialog.get_passwords()
@@ -1121,23 +1312,19 @@ class MainWindow(QMainWindow):
                 QMessageBox.warning(self, "Erreur", "Les nouveaux mots de passe ne correspondent pas.")
                 return
 
-            try:
-                with sqlite3.connect(DB_NAME) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute("SELECT password_hash FROM users WHERE id = ?", (self.user_info['id'],))
-                    current_hash = cursor.fetchone()[0]
-
-                    if current_hash != hash_password(old):
-                        QMessageBox.warning(self, "Erreur", "Ancien mot de passe incorrect.")
-                        return
-
-                    new_hash = hash_password(new)
-                    cursor.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_hash, self.user_info['id']))
-                    conn.commit()
-                QMessageBox.information(self, "Succès", "Votre mot de passe a été changé.")
-            except sqlite3.Error as e:
-                QMessageBox.warning(self, "Erreur DB", f"Impossible de changer le mot de passe : {e}")
-                
+            def on_changed(changed):
+                if changed:
+                    QMessageBox.information(self, "Succès", "Votre mot de passe a été changé.")
+                else:
+                    QMessageBox.warning(self, "Erreur", "Ancien mot de passe incorrect.")
+
+            def on_error(error):
+                QMessageBox.warning(self, "Erreur DB", f"Impossible de changer le mot de passe : {error}")
+
+            WriteWatcher(submit_write(mutations.change_password, self.user_info['id'], hash_password(old),
+                                      hash_password(new)), on_changed, on_error, self)
+
+
     def admin_reset_password(self):
         selected_row = self.users_table.currentRow()
         if selected_row < 0:
@@ -1158,19 +1345,21 @@ class MainWindow(QMainWindow):
         ok_btn.setObjectName("primary")
         layout.addRow(ok_btn)
         
+        def on_reset(_):
+            QMessageBox.information(self, "Succès", f"Mot de passe pour {username} réinitialisé.")
+            dialog.accept()
+
+        def on_error(error):
+            ok_btn.setEnabled(True)
+            QMessageBox.warning(self, "Erreur DB", f"Impossible de réinitialiser le mot de passe : {error}")
+
         def on_ok():
             new_pwd = pwd_input.text()
             if new_pwd:
-                try:
-                    with sqlite3.connect(DB_NAME) as conn:
-                        cursor = conn.cursor()
-                        cursor.execute("UPDATE users SET password_hash = ? WHERE id = ?", (hash_password(new_pwd), user_id))
-                        conn.commit()
-                    QMessageBox.information(self, "Succès", f"Mot de passe pour {username} réinitialisé.")
-                    dialog.accept()
-                except sqlite3.Error as e:
-                    QMessageBox.warning(self, "Erreur DB", f"Impossible de réinitialiser le mot de passe : {e}")
-        
+                ok_btn.setEnabled(False)
+                WriteWatcher(submit_write(mutations.reset_password, user_id, hash_password(new_pwd)),
+                             on_reset, on_error, self)
+
         ok_btn.clicked.connect(on_ok)
         dialog.exec()
 
@@ -1181,38 +1370,116 @@ class MainWindow(QMainWindow):
         self.error_label.clear()
         
     def view_student_bulletin(self):
-        selected_row = self.stud_table.currentRow()
-        if selected_row < 0:
+        student = self.selected_student()
+        if student is None:
             QMessageBox.warning(self, "Sélection requise", "Veuillez sélectionner un étudiant dans la liste.")
             return
 
-        matricule = self.stud_table.item(selected_row, 0).text()
+        matricule = student[0]
+        from Dialogs import BulletinDialog
         bulletin_dialog = BulletinDialog(student_matricule=matricule, parent=self)
         bulletin_dialog.exec()
         
-    @staticmethod
-    def calculate_final_grade_and_status(g1, g2, gr, has_two_grades, validation_grade):
-        final_grade = None
-        current_validation_grade = validation_grade if validation_grade is not None else 12.0
+    def export_data(self):
+        import exports
+        from tablefiles import TableFileError
+        from Dialogs import ExportDialog
+        dialog = ExportDialog(self)
+        if not dialog.exec():
+            return
+        data = dialog.get_data()
+        extension = data['extension']
+        path, _ = QFileDialog.getSaveFileName(self, f"Exporter : {data['dataset_name']}", data['dataset'] + extension,
+                                              f"{data['format_name']} (*{extension})")
+        if not path:
+            return
+        if not path.lower().endswith(extension):
+            path += extension
+
+        # Nombre de lignes inconnu à l'avance : barre de progression indéterminée.
+        progress = QProgressDialog("Export en cours…", "Annuler", 0, 0, self)
+        progress.setWindowTitle("Exporter des données")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        def on_progress(done):
+            progress.setLabelText(f"{done} ligne(s) exportée(s)…")
+            QApplication.processEvents()
+            return not progress.wasCanceled()
 
-        if has_two_grades:
-            if g1 is not None and g2 is not None:
-                final_grade = (g1 + g2) / 2
+        try:
+            count = exports.export(data['dataset'], path, data['program_id'], data['academic_year_id'], on_progress)
+        except (TableFileError, OSError, sqlite3.Error) as e:
+            progress.reset()
+            QMessageBox.warning(self, "Export impossible", str(e))
+            return
+        progress.reset()
+        if count is None:
+            QMessageBox.information(self, "Export", "Export interrompu.")
         else:
-            if g1 is not None:
-                final_grade = g1
-        
-        if final_grade is None:
-            return None, "Défaillant"
+            QMessageBox.information(self, "Export", f"{count} ligne(s) exportée(s) dans {path}.")
 
-        effective_grade = final_grade
-        if final_grade < 12 and gr is not None:
-            effective_grade = gr
+    def open_deliberation(self):
+        from Dialogs import DeliberationDialog
+        DeliberationDialog(self).exec()
 
-        if effective_grade >= current_validation_grade:
-            status = "Validée"
+    def open_rollover(self):
+        from Dialogs import RolloverDialog
+        dialog = RolloverDialog(self)
+        dialog.exec()
+        if dialog.enrolled:
+            self.change_bus.publish(events.STUDENTS)
+
+    def export_batch_bulletins(self):
+        from bulletins import export_bulletins, load_batch, merged_filename
+        from Dialogs import BatchBulletinDialog
+        dialog = BatchBulletinDialog(self)
+        if not dialog.exec():
+            return
+        data = dialog.get_data()
+        if not data['program_id'] or not data['academic_year_id']:
+            QMessageBox.warning(self, "Erreur", "Veuillez choisir une formation et une année académique.")
+            return
+        directory = QFileDialog.getExistingDirectory(self, "Dossier de destination des bulletins")
+        if not directory:
+            return
+
+        try:
+            bulletins = load_batch(data['program_id'], data['academic_year_id'], data['year_of_study'], data['semester'])
+        except sqlite3.Error as e:
+            QMessageBox.warning(self, "Erreur DB", f"Impossible de charger les notes de la promotion : {e}")
+            return
+        if not bulletins:
+            QMessageBox.information(self, "Bulletins", "Aucun étudiant inscrit dans cette promotion.")
+            return
+
+        progress = QProgressDialog("Génération des bulletins…", "Annuler", 0, len(bulletins), self)
+        progress.setWindowTitle("Bulletins PDF")
+        progress.setWindowModality(Qt.WindowModal)
+        progress.setMinimumDuration(0)
+
+        def on_progress(done, total):
+            progress.setValue(done)
+            return not progress.wasCanceled()
+
+        merged_name = merged_filename(data['program_name'], data['academic_year_name'], data['year_of_study'],
+                                      data['semester'])
+        try:
+            written = export_bulletins(bulletins, directory, merged=data['merged'], merged_name=merged_name,
+                                       on_progress=on_progress)
+        except OSError as e:
+            progress.reset()
+            QMessageBox.warning(self, "Erreur", f"Impossible d'écrire les bulletins : {e}")
+            return
+        cancelled = progress.wasCanceled()
+        progress.reset()
+
+        if cancelled:
+            QMessageBox.information(self, "Bulletins", f"Export interrompu : {len(written)} fichier(s) écrit(s).")
         else:
-            status = "Non validée"
-            
-        return effective_grade, status
+            QMessageBox.information(self, "Bulletins",
+                                    f"{len(bulletins)} bulletin(s) exporté(s) dans {len(written)} fichier(s).")
 
+    @staticmethod
+    def calculate_final_grade_and_status(g1, g2, gr, has_two_grades, validation_grade):
+        return calculate_final_grade_and_status(g1, g2, gr, has_two_grades, validation_grade)
@@ -0,0 +1 @@
+"""Benchmarks de la base gestion_scolaire : génération de données et mesure des requêtes de l'interface."""
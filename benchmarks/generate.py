@@ -0,0 +1,151 @@
+"""Génération de bases gestion_scolaire.db réalistes, de taille paramétrable.
+
+    python -m benchmarks.generate bench.db --students 20000
+
+Les étudiants entrent chaque année dans une formation et y progressent d'une année
+d'étude par année académique (avec quelques redoublements) ; chaque inscription a
+sa grille de notes complète. Le même germe produit toujours la même base.
+"""
+
+import argparse
+import inspect
+import os
+import random
+import sqlite3
+
+from functions import init_db
+from results import refresh_results
+
+LAST_NAMES = ["HOUNKPATIN", "AHOUANDJINOU", "DOSSOU", "KOUTON", "AGBO", "ZINSOU", "GBAGUIDI", "ADJOVI",
+              "MARTIN", "BERNARD", "DUBOIS", "LEFEBVRE", "MOREAU", "SOGLO", "TOSSOU", "HOUNGBO",
+              "ASSOGBA", "KPADONOU", "ELIOT", "HOUNLETE", "AKPOVI", "DEGBEY", "FAGLA", "GNONLONFOUN"]
+FIRST_NAMES = ["Koffi", "Afi", "Yao", "Ama", "Kossi", "Akossiwa", "Rudolf", "Samy", "Éloïse", "Hervé",
+               "Marcelline", "Sèna", "Ifèdé", "Jean", "Marie", "Gildas", "Fifamè", "Rodrigue", "Nadège",
+               "Codjo", "Mawuena", "Sylvain", "Bénédicte", "Arnaud"]
+
+# Part des redoublements et des notes manquantes.
+_REPEAT_RATE = 0.1
+_MISSING_RATE = 0.03
+
+
+def _grade(rnd):
+    if rnd.random() < _MISSING_RATE:
+        return None
+    return round(min(20.0, max(0.0, rnd.gauss(12, 3.5))) * 4) / 4
+
+
+def _academic_years(cursor, count):
+    """Renvoie les id des `count` années académiques les plus récentes, de la plus ancienne à la plus récente."""
+    cursor.execute("SELECT MIN(start_year), MAX(start_year) FROM academic_years")
+    first, last = cursor.fetchone()
+    for start in range(last + 1, first + count):
+        cursor.execute("INSERT INTO academic_years (start_year, end_year, name) VALUES (?, ?, ?)",
+                       (start, start + 1, f"{start}-{start + 1}"))
+    cursor.execute("SELECT id FROM academic_years ORDER BY start_year DESC LIMIT ?", (count,))
+    return [year_id for (year_id,) in reversed(cursor.fetchall())]
+
+
+def generate(path, departments=4, programs_per_department=3, years_of_study=3, courses_per_semester=6,
+             students=5000, academic_years=4, seed=0):
+    """Crée (en remplaçant un fichier existant) une base au schéma courant et la remplit.
+
+    Renvoie le nombre de lignes de chaque table.
+    """
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    init_db(path)
+
+    rnd = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys = ON")
+    cursor = conn.cursor()
+
+    years = _academic_years(cursor, academic_years)
+
+    program_ids = []
+    for d in range(1, departments + 1):
+        cursor.execute("INSERT INTO departments (name, validation_grade) VALUES (?, ?)",
+                       (f"Département {d}", rnd.choice([10.0, 12.0, 12.0])))
+        department_id = cursor.lastrowid
+        for p in range(1, programs_per_department + 1):
+            cursor.execute("INSERT INTO programs (name, duration_years, department_id) VALUES (?, ?, ?)",
+                           (f"Licence {d}.{p}", years_of_study, department_id))
+            program_ids.append(cursor.lastrowid)
+
+    courses = {}
+    for program_id in program_ids:
+        for year_of_study in range(1, years_of_study + 1):
+            rows = []
+            for semester in (1, 2):
+                for c in range(1, courses_per_semester + 1):
+                    has_two_grades = rnd.random() < 0.8
+                    cursor.execute("""
+                        INSERT INTO courses (name, credits, semester, program_id, year_of_study, has_two_grades)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, (f"UE {year_of_study}{semester}{c:02d}", rnd.randint(2, 6), semester, program_id,
+                          year_of_study, has_two_grades))
+                    rows.append((cursor.lastrowid, has_two_grades))
+            courses[program_id, year_of_study] = rows
+
+    student_rows, enrollment_rows, grade_rows = [], [], []
+    for i in range(students):
+        matricule = str(20000000 + i)
+        student_rows.append((matricule, rnd.choice(LAST_NAMES), rnd.choice(FIRST_NAMES)))
+        program_id = rnd.choice(program_ids)
+        year_of_study = 1
+        for year_id in years[rnd.randrange(len(years)):]:
+            enrollment_rows.append((matricule, year_id, program_id, year_of_study))
+            for course_id, has_two_grades in courses[program_id, year_of_study]:
+                grade1 = _grade(rnd)
+                grade2 = _grade(rnd) if has_two_grades else None
+                resit_grade = _grade(rnd) if grade1 is not None and grade1 < 12 and rnd.random() < 0.5 else None
+                grade_rows.append((matricule, course_id, year_id, grade1, grade2, resit_grade))
+            if year_of_study == years_of_study:
+                break
+            if rnd.random() >= _REPEAT_RATE:
+                year_of_study += 1
+
+    cursor.executemany("INSERT INTO students (matricule, last_name, first_name) VALUES (?, ?, ?)", student_rows)
+    cursor.executemany("""
+        INSERT INTO enrollments (matricule, academic_year_id, program_id, year_of_study) VALUES (?, ?, ?, ?)
+    """, enrollment_rows)
+    cursor.executemany("""
+        INSERT INTO grades (student_matricule, course_id, academic_year_id, grade1, grade2, resit_grade)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, grade_rows)
+    refresh_results(cursor)
+    conn.commit()
+
+    counts = {}
+    for table in ("departments", "programs", "courses", "academic_years", "students", "enrollments", "grades",
+                  "results"):
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        counts[table] = cursor.fetchone()[0]
+    conn.close()
+    return counts
+
+
+def add_arguments(parser):
+    """Options de taille de la base, avec les valeurs par défaut de generate."""
+    for name, parameter in inspect.signature(generate).parameters.items():
+        if name != "path":
+            parser.add_argument("--" + name.replace("_", "-"), type=int, default=parameter.default)
+
+
+def size_options(args):
+    """Extrait des arguments analysés les options à passer à generate."""
+    return {name: getattr(args, name) for name in inspect.signature(generate).parameters if name != "path"}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère une base de test pour les benchmarks.")
+    parser.add_argument("path", help="fichier SQLite à créer (remplacé s'il existe)")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    for table, count in generate(args.path, **size_options(args)).items():
+        print(f"{table:15} {count}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""Mesure, sans interface graphique, des requêtes exécutées par les écrans de l'application.
+
+    python -m benchmarks.run --students 20000 --output resultats.json
+    python -m benchmarks.run --db bench.db --baseline resultats.json
+
+Chaque scénario reprend les requêtes de queries.py dans l'ordre où le gestionnaire
+correspondant de Windows.py ou Dialogs.py les exécute. Les résultats (temps en
+millisecondes par exécution) sont écrits en JSON pour comparer deux versions.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import tempfile
+import time
+
+import deliberation
+import grade_engine
+import queries
+from benchmarks.generate import add_arguments, generate, size_options
+from database import open_connection
+from functions import fts_match_expression
+from enrollments import enroll
+from grades import save_grade
+
+# Même valeur que models.PAGE_SIZE (non importé : models dépend de Qt).
+PAGE_SIZE = 200
+
+
+def _page(cursor, select, conditions, params, sort_keys, count=None, after=None):
+    """Une page triée puis, comme KeysetPager.load, le nombre total de lignes (count = (requête, paramètres))."""
+    query, query_params = queries.keyset_page(select, conditions, params, sort_keys, after=after, limit=PAGE_SIZE)
+    cursor.execute(query, query_params)
+    rows = cursor.fetchall()
+    if count is not None:
+        cursor.execute(*count)
+        cursor.fetchone()
+    return rows
+
+
+def _where(conditions):
+    return " WHERE " + " AND ".join(conditions) if conditions else ""
+
+
+def _write(conn, work):
+    """Exécute work(cursor) comme le thread d'écriture : BEGIN IMMEDIATE, SAVEPOINT, COMMIT."""
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        cursor.execute("SAVEPOINT write")
+        work(cursor)
+        cursor.execute("RELEASE write")
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+class Scenarios:
+    """Scénarios chronométrés ; chaque méthode scenario_* exécute une opération complète."""
+
+    def __init__(self, conn, seed):
+        self.conn = conn
+        self.rnd = random.Random(seed)
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM programs")
+        self.programs = [program_id for (program_id,) in cursor.fetchall()]
+        cursor.execute("SELECT last_name FROM students GROUP BY last_name")
+        self.last_names = [name for (name,) in cursor.fetchall()]
+        cursor.execute("SELECT matricule, academic_year_id, program_id, year_of_study FROM enrollments")
+        self.enrollments = cursor.fetchall()
+        cursor.execute("SELECT id, program_id, year_of_study FROM courses")
+        self.courses = cursor.fetchall()
+        cursor.execute("SELECT id FROM academic_years")
+        self.years = [year_id for (year_id,) in cursor.fetchall()]
+        self.first_page = _page(cursor, queries.STUDENTS, [], [], queries.STUDENTS_SORT_KEYS[1])
+        self._new_student = 0
+
+    def scenario_refresh_students_tab(self):
+        self._students_page([], [])
+
+    def scenario_refresh_students_tab_program(self):
+        self._students_page([queries.STUDENTS_PROGRAM_FILTER], [self.rnd.choice(self.programs)])
+
+    def scenario_refresh_students_tab_search(self):
+        prefix = self.rnd.choice(self.last_names)[:self.rnd.randint(2, 4)]
+        self._students_page([queries.STUDENTS_SEARCH_FILTER], [fts_match_expression(prefix)])
+
+    def _students_page(self, conditions, params):
+        _page(self.conn.cursor(), queries.STUDENTS, conditions, params, queries.STUDENTS_SORT_KEYS[1],
+              (queries.students_count_query(conditions), params))
+
+    def scenario_refresh_students_tab_next_page(self):
+        after = self.first_page[-1] if self.first_page else None
+        _page(self.conn.cursor(), queries.STUDENTS, [], [], queries.STUDENTS_SORT_KEYS[1], after=after)
+
+    def scenario_refresh_grades_for_selected_course(self):
+        _, academic_year_id, program_id, year_of_study = self.rnd.choice(self.enrollments)
+        course_id = self.rnd.choice([c for c in self.courses if c[1:] == (program_id, year_of_study)])[0]
+        _page(self.conn.cursor(), queries.GRADES_FOR_COURSE, [queries.GRADES_FOR_COURSE_FILTER],
+              [course_id, program_id, academic_year_id], queries.GRADES_SORT_KEYS[1],
+              (queries.GRADES_COUNT + _where([queries.GRADES_FOR_COURSE_FILTER]), [program_id, academic_year_id]))
+
+    def scenario_bulletin_refresh(self):
+        matricule, academic_year_id, *_ = self.rnd.choice(self.enrollments)
+        cursor = self.conn.cursor()
+        cursor.execute(queries.STUDENT_ENROLLMENT_YEARS, (matricule,))
+        cursor.fetchall()
+        cursor.execute(queries.BULLETIN_STUDENT, (matricule, academic_year_id))
+        *_, year_of_study = cursor.fetchone()
+        cursor.execute(queries.BULLETIN_GRADES + queries.BULLETIN_ORDER, (matricule, academic_year_id, year_of_study))
+        grades_data = cursor.fetchall()
+        _, _, _, has_two_grades, grade1, grade2, resit_grade, validation_grade = list(zip(*grades_data)) or [()] * 8
+        grade_engine.compute_final_grades(grade1, grade2, resit_grade, has_two_grades, validation_grade)
+        cursor.execute(queries.STUDENT_RESULT, (matricule, academic_year_id, 0))
+        cursor.fetchone()
+
+    def scenario_deliberation(self):
+        _, academic_year_id, program_id, year_of_study = self.rnd.choice(self.enrollments)
+        cursor = self.conn.cursor()
+        cursor.execute(queries.DELIBERATION_GRADES, (program_id, academic_year_id, year_of_study))
+        deliberation.deliberate(cursor.fetchall())
+
+    def scenario_enroll_student(self):
+        # Un nouvel étudiant à chaque exécution : l'inscription n'est jamais refusée.
+        self._new_student += 1
+        matricule = f"BENCH{self._new_student:06d}"
+        self.conn.execute("INSERT INTO students (matricule, last_name, first_name) VALUES (?, ?, ?)",
+                          (matricule, "BENCH", "Inscription"))
+        program_id, academic_year_id = self.rnd.choice(self.programs), self.rnd.choice(self.years)
+
+        return lambda cursor: enroll(cursor, matricule, program_id, academic_year_id, 1)
+
+    def scenario_update_grade(self):
+        matricule, academic_year_id, program_id, year_of_study = self.rnd.choice(self.enrollments)
+        course_id = self.rnd.choice([c for c in self.courses if c[1:] == (program_id, year_of_study)])[0]
+        column = self.rnd.choice(["grade1", "grade2", "resit_grade"])
+        value = round(self.rnd.uniform(0, 20), 2)
+
+        return lambda cursor: save_grade(cursor, matricule, course_id, academic_year_id, column, value)
+
+
+# Nom du scénario dans le rapport -> méthode de Scenarios.
+SCENARIOS = {
+    "refresh_students_tab": "scenario_refresh_students_tab",
+    "refresh_students_tab (formation)": "scenario_refresh_students_tab_program",
+    "refresh_students_tab (recherche)": "scenario_refresh_students_tab_search",
+    "refresh_students_tab (page suivante)": "scenario_refresh_students_tab_next_page",
+    "refresh_grades_for_selected_course": "scenario_refresh_grades_for_selected_course",
+    "BulletinDialog.refresh_bulletin": "scenario_bulletin_refresh",
+    "DeliberationDialog.deliberate": "scenario_deliberation",
+    "enroll_student": "scenario_enroll_student",
+    "update_grade": "scenario_update_grade",
+}
+
+
+def _stats(durations):
+    ordered = sorted(durations)
+    return {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'median_ms': round(statistics.median(ordered) * 1000, 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3),
+    }
+
+
+def run_scenarios(path, repeat=50, seed=0, only=None):
+    """Exécute chaque scénario `repeat` fois sur la base `path` ; renvoie {nom: statistiques}."""
+    conn = open_connection(path)
+    try:
+        scenarios = Scenarios(conn, seed)
+        results = {}
+        for name, method in SCENARIOS.items():
+            if only and name not in only:
+                continue
+            durations = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                work = getattr(scenarios, method)()
+                if work is not None:
+                    # Les écritures sont chronométrées sans leur préparation (insertion de l'étudiant…).
+                    start = time.perf_counter()
+                    _write(conn, work)
+                durations.append(time.perf_counter() - start)
+            results[name] = _stats(durations)
+        return results
+    finally:
+        conn.close()
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(baseline, report):
+    """Lignes de comparaison des médianes avec un rapport précédent."""
+    lines = []
+    for name, stats in report['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            lines.append(f"{name:42} {stats['median_ms']:10.3f} ms   (nouveau)")
+            continue
+        ratio = stats['median_ms'] / before['median_ms'] if before['median_ms'] else float('inf')
+        lines.append(f"{name:42} {before['median_ms']:10.3f} -> {stats['median_ms']:10.3f} ms   x{ratio:.2f}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chronomètre les requêtes de l'interface sur une base générée.")
+    parser.add_argument("--db", help="base existante à mesurer, sur une copie (sinon une base est générée)")
+    parser.add_argument("--repeat", type=int, default=50, help="exécutions par scénario")
+    parser.add_argument("--only", action="append", help="nom d'un scénario à exécuter (répétable)")
+    parser.add_argument("--output", help="fichier JSON où écrire les résultats")
+    parser.add_argument("--baseline", help="rapport JSON précédent à comparer")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    report = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'numpy': grade_engine.numpy_available(),
+        'repeat': args.repeat,
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.db")
+        if args.db is None:
+            report['parameters'] = size_options(args)
+            start = time.perf_counter()
+            report['counts'] = generate(path, **size_options(args))
+            report['generation_s'] = round(time.perf_counter() - start, 3)
+        else:
+            # Les scénarios d'écriture travaillent sur une copie : la base indiquée n'est pas modifiée.
+            report['database'] = os.path.abspath(args.db)
+            with sqlite3.connect(args.db) as source, sqlite3.connect(path) as copy:
+                source.backup(copy)
+        report['results'] = run_scenarios(path, args.repeat, args.seed, args.only)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            lines = compare(json.load(f), report)
+    else:
+        lines = [f"{name:42} médiane {stats['median_ms']:10.3f} ms   p95 {stats['p95_ms']:10.3f} ms"
+                 for name, stats in report['results'].items()]
+    print("\n".join(lines))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
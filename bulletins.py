@@ -0,0 +1,215 @@
+"""Production des bulletins PDF d'une promotion entière.
+
+Les notes de toute la promotion sont lues en une requête et calculées par
+grade_engine, les moyennes viennent de la table results ; le rendu des pages
+est réparti sur un pool de processus.
+"""
+
+import multiprocessing
+import os
+import re
+
+from database import read_cursor
+from grade_engine import compute_final_grades
+from results import WHOLE_YEAR
+from pdf import PAGE_HEIGHT, PAGE_WIDTH, PageCanvas, text_width, write_pdf
+import queries
+
+PERIODS = {None: "Année complète", 1: "Semestre 1", 2: "Semestre 2"}
+
+# En dessous de ce nombre de bulletins, le rendu se fait dans le processus courant.
+POOL_THRESHOLD = 50
+POOL_CHUNK_SIZE = 25
+
+_MARGIN = 50
+_ROW_HEIGHT = 18
+_COLUMNS = [(_MARGIN, "Semestre"), (_MARGIN + 70, "Matière"), (_MARGIN + 300, "Note finale"),
+            (_MARGIN + 380, "Statut"), (_MARGIN + 460, "Crédits")]
+
+
+def load_batch(program_id, academic_year_id, year_of_study, semester=None):
+    """Renvoie les bulletins (dictionnaires) de tous les étudiants inscrits, dans l'ordre alphabétique."""
+    with read_cursor() as cursor:
+        cursor.execute("SELECT name FROM programs WHERE id = ?", (program_id,))
+        program_row = cursor.fetchone()
+        cursor.execute("SELECT name FROM academic_years WHERE id = ?", (academic_year_id,))
+        year_row = cursor.fetchone()
+        cursor.execute(queries.BATCH_BULLETIN_STUDENTS, (program_id, academic_year_id, year_of_study))
+        students = cursor.fetchall()
+
+        query = queries.BATCH_BULLETIN_GRADES
+        params = [program_id, academic_year_id, year_of_study]
+        if semester is not None:
+            query += queries.BULLETIN_SEMESTER_FILTER
+            params.append(semester)
+        cursor.execute(query + queries.BATCH_BULLETIN_ORDER, params)
+        grades_data = cursor.fetchall()
+
+        cursor.execute(queries.BATCH_BULLETIN_RESULTS,
+                       (program_id, academic_year_id, year_of_study, semester or WHOLE_YEAR))
+        summary = {matricule: values for matricule, *values in cursor.fetchall()}
+
+    *_, has_two_grades, grade1, grade2, resit_grade, validation_grade = list(zip(*grades_data)) or [()] * 9
+    finals, statuses = compute_final_grades(grade1, grade2, resit_grade, has_two_grades, validation_grade)
+
+    rows_by_student = {}
+    for (matricule, c_name, credits, c_semester, *_), final_grade, status in zip(grades_data, finals, statuses):
+        rows_by_student.setdefault(matricule, []).append((c_semester, c_name, final_grade, status, credits))
+
+    bulletins = []
+    for matricule, last_name, first_name in students:
+        average, total_credits, validated_credits = summary.get(matricule, (None, 0, 0))
+        bulletins.append({
+            'matricule': matricule,
+            'last_name': last_name,
+            'first_name': first_name,
+            'program': program_row[0] if program_row else "",
+            'academic_year': year_row[0] if year_row else "",
+            'year_of_study': year_of_study,
+            'period': PERIODS.get(semester, PERIODS[None]),
+            'rows': rows_by_student.get(matricule, []),
+            'average': average,
+            'total_credits': total_credits,
+            'validated_credits': validated_credits,
+        })
+    return bulletins
+
+
+def student_bulletin(matricule, academic_year_id, semester=None):
+    """Bulletin d'un seul étudiant pour une année (mêmes clés que load_batch), None s'il n'y était pas inscrit."""
+    with read_cursor() as cursor:
+        cursor.execute(queries.BULLETIN_STUDENT, (matricule, academic_year_id))
+        student = cursor.fetchone()
+        if not student:
+            return None
+        first_name, last_name, program_name, year_of_study = student
+        cursor.execute("SELECT name FROM academic_years WHERE id = ?", (academic_year_id,))
+        year_row = cursor.fetchone()
+
+        query = queries.BULLETIN_GRADES
+        params = [matricule, academic_year_id, year_of_study]
+        if semester is not None:
+            query += queries.BULLETIN_SEMESTER_FILTER
+            params.append(semester)
+        cursor.execute(query + queries.BULLETIN_ORDER, params)
+        grades_data = cursor.fetchall()
+
+        cursor.execute(queries.STUDENT_RESULT, (matricule, academic_year_id, semester or WHOLE_YEAR))
+        average, total_credits, validated_credits = cursor.fetchone() or (None, 0, 0)
+
+    _, _, _, has_two_grades, grade1, grade2, resit_grade, validation_grade = list(zip(*grades_data)) or [()] * 8
+    finals, statuses = compute_final_grades(grade1, grade2, resit_grade, has_two_grades, validation_grade)
+    return {
+        'matricule': matricule,
+        'last_name': last_name,
+        'first_name': first_name,
+        'program': program_name,
+        'academic_year': year_row[0] if year_row else "",
+        'year_of_study': year_of_study,
+        'period': PERIODS.get(semester, PERIODS[None]),
+        'rows': [(c_semester, c_name, final_grade, status, credits)
+                 for (c_name, credits, c_semester, *_), final_grade, status in zip(grades_data, finals, statuses)],
+        'average': average,
+        'total_credits': total_credits,
+        'validated_credits': validated_credits,
+    }
+
+
+def _page_header(canvas, bulletin, continued):
+    y = PAGE_HEIGHT - _MARGIN - 10
+    title = "Bulletin de notes" + (" (suite)" if continued else "")
+    canvas.text((PAGE_WIDTH - text_width(title, 18)) / 2, y, title, size=18, bold=True)
+    y -= 35
+    canvas.text(_MARGIN, y, f"{bulletin['last_name'].upper()} {bulletin['first_name']}", size=12, bold=True)
+    canvas.text(PAGE_WIDTH - _MARGIN - 150, y, f"Matricule : {bulletin['matricule']}", size=10)
+    y -= 18
+    canvas.text(_MARGIN, y, f"Formation : {bulletin['program']} - Année {bulletin['year_of_study']}", size=10)
+    y -= 15
+    canvas.text(_MARGIN, y, f"Année Académique : {bulletin['academic_year']}  |  Période : {bulletin['period']}",
+                size=10)
+    y -= 30
+    canvas.fill_rect(_MARGIN - 5, y - 5, PAGE_WIDTH - 2 * _MARGIN + 10, _ROW_HEIGHT)
+    for x, label in _COLUMNS:
+        canvas.text(x, y, label, size=10, bold=True)
+    return y - _ROW_HEIGHT
+
+
+def render_bulletin(bulletin):
+    """Renvoie les flux de contenu des pages d'un bulletin (exécuté dans les processus du pool)."""
+    pages = []
+    canvas = PageCanvas()
+    y = _page_header(canvas, bulletin, continued=False)
+    for semester, name, final_grade, status, credits in bulletin['rows']:
+        if y < _MARGIN + 60:
+            pages.append(canvas.content())
+            canvas = PageCanvas()
+            y = _page_header(canvas, bulletin, continued=True)
+        values = [f"Semestre {semester}", name[:45], "" if final_grade is None else f"{final_grade:.2f}",
+                  status, str(credits)]
+        for (x, _), value in zip(_COLUMNS, values):
+            canvas.text(x, y, value, size=10)
+        canvas.line(_MARGIN - 5, y - 5, PAGE_WIDTH - _MARGIN + 5, y - 5, width=0.3)
+        y -= _ROW_HEIGHT
+
+    y -= 20
+    if bulletin['total_credits'] > 0:
+        summary = (f"Moyenne: {bulletin['average']:.2f}/20  |  "
+                   f"Crédits Validés: {bulletin['validated_credits']}/{bulletin['total_credits']}")
+    else:
+        summary = "Aucune note à afficher pour cette période."
+    canvas.text(PAGE_WIDTH - _MARGIN - text_width(summary, 12), y, summary, size=12, bold=True)
+    pages.append(canvas.content())
+    return pages
+
+
+def safe_filename(name):
+    """Remplace les caractères non autorisés dans un nom de fichier."""
+    return re.sub(r"[^\w-]+", "_", name)
+
+
+def bulletin_filename(bulletin):
+    return safe_filename(f"bulletin_{bulletin['matricule']}_{bulletin['last_name']}_{bulletin['first_name']}") + ".pdf"
+
+
+def merged_filename(program_name, academic_year_name, year_of_study, semester=None):
+    """Nom du fichier unique d'une promotion."""
+    period = f"S{semester}" if semester else "annee"
+    return safe_filename(f"bulletins_{program_name}_{academic_year_name}_A{year_of_study}_{period}") + ".pdf"
+
+
+def _render_all(bulletins, processes):
+    """Itère sur (bulletin, pages) dans l'ordre ; fermer l'itérateur arrête le pool."""
+    if len(bulletins) < POOL_THRESHOLD or processes == 1:
+        for bulletin in bulletins:
+            yield bulletin, render_bulletin(bulletin)
+        return
+    with multiprocessing.Pool(processes) as pool:
+        yield from zip(bulletins, pool.imap(render_bulletin, bulletins, chunksize=POOL_CHUNK_SIZE))
+
+
+def export_bulletins(bulletins, directory, merged=False, merged_name="bulletins.pdf", processes=None,
+                     on_progress=None):
+    """Écrit les bulletins en PDF dans directory : un fichier par étudiant ou un fichier unique.
+
+    on_progress(faits, total) est appelé après chaque bulletin ; s'il renvoie False,
+    l'export s'arrête. Renvoie la liste des fichiers écrits.
+    """
+    written, merged_pages = [], []
+    rendered = _render_all(bulletins, processes)
+    try:
+        for done, (bulletin, pages) in enumerate(rendered, start=1):
+            if merged:
+                merged_pages.extend(pages)
+            else:
+                path = os.path.join(directory, bulletin_filename(bulletin))
+                write_pdf(path, pages)
+                written.append(path)
+            if on_progress is not None and on_progress(done, len(bulletins)) is False:
+                return written
+    finally:
+        rendered.close()
+    if merged and merged_pages:
+        path = os.path.join(directory, merged_name)
+        write_pdf(path, merged_pages)
+        written.append(path)
+    return written
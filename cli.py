@@ -0,0 +1,463 @@
+"""Administration de la base en ligne de commande, sans interface graphique.
+
+    python3 cli.py etudiants nouveaux.csv
+    python3 cli.py inscriptions inscriptions.xlsx
+    python3 cli.py rentree rentree.csv
+    python3 cli.py matieres maquette.csv
+    python3 cli.py notes-import notes.csv --matiere 12 --annee 2024-2025
+    python3 cli.py notes-export notes.csv --matiere 12 --annee 2024-2025
+    python3 cli.py bulletins sortie/ --formation "Licence TIC" --annee 2024-2025 --annee-etude 1
+    python3 cli.py deliberation pv.csv --formation "Licence TIC" --annee 2024-2025 --annee-etude 1
+    python3 cli.py export notes.xlsx --donnees notes --annee 2024-2025
+    python3 cli.py passage --formation "Licence TIC" --annee 2024-2025 --simulation
+    python3 cli.py resultats
+
+Les fichiers sont lus ligne à ligne et enregistrés par lots, un lot par transaction.
+Les lignes refusées sont listées sur la sortie d'erreur et le code de retour vaut 1.
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+
+from bulletins import PERIODS, export_bulletins, load_batch, merged_filename
+from database import close_all, read_cursor, write
+from deliberation import export_pv, load_deliberation
+from enrollments import enroll
+from exports import DATASETS, export
+from functions import init_db
+from grades import load_grade_file, save_imported_grades
+from intake import load_intake_file, save_intake
+from results import refresh_results
+from rollover import apply_rollover, next_academic_year, preview_rollover
+from tablefiles import TableFileError, cell_text, read_records
+import queries
+
+# Nombre de lignes enregistrées par transaction.
+BATCH_SIZE = 1000
+
+STUDENT_COLUMNS = {
+    'matricule': 'matricule', 'n° matricule': 'matricule',
+    'nom': 'last_name', 'last_name': 'last_name',
+    'prénom': 'first_name', 'prenom': 'first_name', 'first_name': 'first_name',
+}
+ENROLLMENT_COLUMNS = {
+    'matricule': 'matricule', 'n° matricule': 'matricule',
+    'formation': 'program', 'program': 'program',
+    'année académique': 'academic_year', 'annee academique': 'academic_year', 'academic_year': 'academic_year',
+    "année d'étude": 'year_of_study', "annee d'etude": 'year_of_study', 'year_of_study': 'year_of_study',
+}
+COURSE_COLUMNS = {
+    'nom': 'name', 'matière': 'name', 'matiere': 'name', 'name': 'name',
+    'crédits': 'credits', 'credits': 'credits',
+    'semestre': 'semester', 'semester': 'semester',
+    'formation': 'program', 'program': 'program',
+    "année d'étude": 'year_of_study', "annee d'etude": 'year_of_study', 'year_of_study': 'year_of_study',
+    'deux notes': 'has_two_grades', 'has_two_grades': 'has_two_grades',
+}
+
+STUDENT_INSERT = """
+    INSERT INTO students (matricule, last_name, first_name) VALUES (?, ?, ?)
+    ON CONFLICT (matricule) DO NOTHING
+"""
+COURSE_INSERT = """
+    INSERT INTO courses (name, credits, semester, program_id, year_of_study, has_two_grades)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (name, program_id, year_of_study, semester) DO NOTHING
+"""
+
+
+class Report:
+    """Compte les lignes enregistrées et garde les lignes refusées."""
+
+    def __init__(self):
+        self.saved = 0
+        self.rejected = []
+
+    def reject(self, line_number, message):
+        self.rejected.append((line_number, message))
+
+    def print(self, label):
+        for line_number, message in sorted(self.rejected):
+            print(f"ligne {line_number} : {message}", file=sys.stderr)
+        print(f"{self.saved} {label} enregistré(s), {len(self.rejected)} ligne(s) refusée(s).")
+        return 1 if self.rejected else 0
+
+
+def _batches(records, size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _ids_by_name(table):
+    with read_cursor() as cursor:
+        cursor.execute(f"SELECT name, id FROM {table}")
+        return dict(cursor.fetchall())
+
+
+def _integer(value, minimum, maximum):
+    """Entier dans [minimum, maximum] lu dans une cellule ; lève ValueError sinon."""
+    number = int(float(cell_text(value).replace(',', '.')))
+    if not minimum <= number <= maximum:
+        raise ValueError(value)
+    return number
+
+
+def import_students(path, batch_size=BATCH_SIZE):
+    """Crée les étudiants d'un fichier (Matricule, Nom, Prénom) ; un matricule existant est refusé."""
+    report = Report()
+    records = read_records(path, STUDENT_COLUMNS,
+                           {'matricule': "Matricule", 'last_name': "Nom", 'first_name': "Prénom"})
+    for batch in _batches(records, batch_size):
+        rows, lines, seen = [], [], set()
+        for line_number, values in batch:
+            matricule, last_name, first_name = (cell_text(values.get(key))
+                                                for key in ('matricule', 'last_name', 'first_name'))
+            if not (matricule and last_name and first_name):
+                report.reject(line_number, "Matricule, nom et prénom sont obligatoires.")
+            elif matricule in seen:
+                report.reject(line_number, f"Matricule {matricule} présent plusieurs fois.")
+            else:
+                seen.add(matricule)
+                rows.append((matricule, last_name, first_name))
+                lines.append(line_number)
+
+        def work(cursor):
+            created = []
+            for row in rows:
+                cursor.execute(STUDENT_INSERT, row)
+                created.append(cursor.rowcount == 1)
+            return created
+
+        for line_number, (matricule, *_), created in zip(lines, rows, write(work)):
+            if created:
+                report.saved += 1
+            else:
+                report.reject(line_number, f"Le matricule {matricule} existe déjà.")
+    return report
+
+
+def import_enrollments(path, batch_size=BATCH_SIZE):
+    """Inscrit des étudiants (Matricule, Formation, Année académique, Année d'étude) et met à jour leurs résultats."""
+    report = Report()
+    programs = _ids_by_name("programs")
+    years = _ids_by_name("academic_years")
+    records = read_records(path, ENROLLMENT_COLUMNS,
+                           {'matricule': "Matricule", 'program': "Formation", 'academic_year': "Année académique",
+                            'year_of_study': "Année d'étude"})
+    for batch in _batches(records, batch_size):
+        rows, lines = [], []
+        for line_number, values in batch:
+            program_id = programs.get(cell_text(values.get('program')))
+            academic_year_id = years.get(cell_text(values.get('academic_year')))
+            if program_id is None:
+                report.reject(line_number, f"Formation inconnue : {cell_text(values.get('program'))}.")
+                continue
+            if academic_year_id is None:
+                report.reject(line_number, f"Année académique inconnue : {cell_text(values.get('academic_year'))}.")
+                continue
+            try:
+                year_of_study = _integer(values.get('year_of_study'), 1, 10)
+            except ValueError:
+                report.reject(line_number, "L'année d'étude doit être un entier entre 1 et 10.")
+                continue
+            rows.append((cell_text(values.get('matricule')), academic_year_id, program_id, year_of_study))
+            lines.append(line_number)
+
+        def work(cursor):
+            outcomes = []
+            for matricule, academic_year_id, program_id, year_of_study in rows:
+                refusal = enroll(cursor, matricule, program_id, academic_year_id, year_of_study, refresh=False)
+                outcomes.append(refusal[1] if refusal else None)
+            refresh_results(cursor, [row[0] for row, outcome in zip(rows, outcomes) if outcome is None])
+            return outcomes
+
+        for line_number, refusal in zip(lines, write(work)):
+            if refusal:
+                report.reject(line_number, refusal)
+            else:
+                report.saved += 1
+    return report
+
+
+def import_intake(path, check_only=False):
+    """Crée et inscrit les étudiants d'un fichier de rentrée en une transaction (voir intake.py)."""
+    report = load_intake_file(path)
+    for line_number, message in report.rejected:
+        print(f"ligne {line_number} : {message}", file=sys.stderr)
+    if not check_only:
+        save_intake(report)
+    print(f"{report.summary()}{' (contrôle seul, rien enregistré)' if check_only else ''}.")
+    return 1 if report.rejected else 0
+
+
+def import_courses(path, batch_size=BATCH_SIZE):
+    """Crée les matières d'une maquette (Nom, Crédits, Semestre, Formation, Année d'étude, Deux notes)."""
+    report = Report()
+    programs = _ids_by_name("programs")
+    records = read_records(path, COURSE_COLUMNS,
+                           {'name': "Nom", 'credits': "Crédits", 'semester': "Semestre", 'program': "Formation",
+                            'year_of_study': "Année d'étude"})
+    for batch in _batches(records, batch_size):
+        rows, lines = [], []
+        for line_number, values in batch:
+            name = cell_text(values.get('name'))
+            program_id = programs.get(cell_text(values.get('program')))
+            if not name:
+                report.reject(line_number, "Le nom de la matière est obligatoire.")
+                continue
+            if program_id is None:
+                report.reject(line_number, f"Formation inconnue : {cell_text(values.get('program'))}.")
+                continue
+            try:
+                credits = _integer(values.get('credits'), 1, 60)
+                semester = _integer(values.get('semester'), 1, 2)
+                year_of_study = _integer(values.get('year_of_study'), 1, 10)
+            except ValueError:
+                report.reject(line_number, "Crédits, semestre (1 ou 2) et année d'étude doivent être des entiers.")
+                continue
+            has_two_grades = cell_text(values.get('has_two_grades')).lower() not in ("non", "0", "false", "no")
+            rows.append((name, credits, semester, program_id, year_of_study, has_two_grades))
+            lines.append(line_number)
+
+        def work(cursor):
+            created = []
+            for row in rows:
+                cursor.execute(COURSE_INSERT, row)
+                created.append(cursor.rowcount == 1)
+            return created
+
+        for line_number, row, created in zip(lines, rows, write(work)):
+            if created:
+                report.saved += 1
+            else:
+                report.reject(line_number, f"La matière {row[0]} existe déjà pour ce semestre.")
+    return report
+
+
+def _course(course_id):
+    with read_cursor() as cursor:
+        cursor.execute("""
+            SELECT c.id, c.name, c.program_id, c.has_two_grades
+            FROM courses c
+            WHERE c.id = ?
+        """, (course_id,))
+        row = cursor.fetchone()
+    if row is None:
+        raise LookupError(f"Matière {course_id} introuvable.")
+    return dict(zip(('id', 'name', 'program_id', 'has_two_grades'), row))
+
+
+def _academic_year_id(name):
+    academic_year_id = _ids_by_name("academic_years").get(name)
+    if academic_year_id is None:
+        raise LookupError(f"Année académique inconnue : {name}.")
+    return academic_year_id
+
+
+def import_grades(path, course_id, academic_year):
+    """Importe la fiche de notes d'une matière, comme « Importer des notes » dans l'onglet Notes."""
+    course = _course(course_id)
+    valid_rows, errors = load_grade_file(path, course, _academic_year_id(academic_year))
+    report = Report()
+    report.rejected = errors
+    report.saved = save_imported_grades(valid_rows) if valid_rows else 0
+    return report
+
+
+def export_grades(path, course_id, academic_year):
+    """Écrit les notes d'une matière au format accepté par notes-import ; renvoie le nombre de lignes."""
+    course = _course(course_id)
+    academic_year_id = _academic_year_id(academic_year)
+    # LIMIT -1 : toutes les lignes, dans l'ordre de l'onglet Notes.
+    query, params = queries.keyset_page(queries.GRADES_FOR_COURSE, [queries.GRADES_FOR_COURSE_FILTER],
+                                        [course_id, course['program_id'], academic_year_id],
+                                        queries.GRADES_SORT_KEYS[1], limit=-1)
+    count = 0
+    with read_cursor() as cursor, open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(["Matricule", "Nom", "Prénom", "Note 1", "Note 2", "Rattrapage"])
+        cursor.execute(query, params)
+        for row in cursor:
+            writer.writerow(["" if value is None else value for value in row])
+            count += 1
+    return count
+
+
+def _program_id(name):
+    program_id = _ids_by_name("programs").get(name)
+    if program_id is None:
+        raise LookupError(f"Formation inconnue : {name}.")
+    return program_id
+
+
+def export_deliberation(path, program, academic_year, year_of_study):
+    """Écrit le procès-verbal de délibération d'une promotion en CSV ; renvoie le procès-verbal."""
+    pv = load_deliberation(_program_id(program), _academic_year_id(academic_year), year_of_study)
+    export_pv(pv, path)
+    return pv
+
+
+def export_data(path, dataset, program=None, academic_year=None):
+    """Exporte un jeu de données (etudiants, notes, resultats) en CSV, XLSX ou JSONL ; renvoie le nombre de lignes."""
+    program_id = _program_id(program) if program else None
+    academic_year_id = _academic_year_id(academic_year) if academic_year else None
+    return export(dataset, path, program_id, academic_year_id)
+
+
+def rollover(program, academic_year, target_year=None, dry_run=False):
+    """Réinscrit une formation dans l'année suivante (voir rollover.py) ; renvoie l'aperçu et le nombre d'inscriptions."""
+    program_id = _program_id(program)
+    source_year_id = _academic_year_id(academic_year)
+    if target_year:
+        target_year_id = _academic_year_id(target_year)
+    else:
+        target_year_id = next_academic_year(source_year_id)
+        if target_year_id is None:
+            raise LookupError(f"Aucune année académique après {academic_year} : créez-la ou indiquez --vers.")
+    if target_year_id == source_year_id:
+        raise LookupError("L'année d'arrivée doit être différente de l'année de départ.")
+    preview = preview_rollover(program_id, source_year_id, target_year_id)
+    return preview, (0 if dry_run else apply_rollover(program_id, source_year_id, target_year_id))
+
+
+def generate_bulletins(directory, program, academic_year, year_of_study, semester=None, merged=False):
+    """Exporte les bulletins PDF d'une promotion ; renvoie la liste des fichiers écrits."""
+    bulletins = load_batch(_program_id(program), _academic_year_id(academic_year), year_of_study, semester)
+    if not bulletins:
+        return []
+    os.makedirs(directory, exist_ok=True)
+
+    def on_progress(done, total):
+        print(f"\r{done}/{total} bulletin(s)", end="", file=sys.stderr, flush=True)
+
+    written = export_bulletins(bulletins, directory, merged=merged,
+                               merged_name=merged_filename(program, academic_year, year_of_study, semester),
+                               on_progress=on_progress)
+    print(file=sys.stderr)
+    return written
+
+
+def _build_parser():
+    parser = argparse.ArgumentParser(description="Administration de la base de gestion scolaire.")
+    parser.add_argument("--lot", type=int, default=BATCH_SIZE, help="lignes enregistrées par transaction")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("etudiants", "créer des étudiants (Matricule, Nom, Prénom)"),
+                            ("inscriptions", "inscrire des étudiants (Matricule, Formation, Année académique, "
+                                             "Année d'étude)"),
+                            ("matieres", "créer des matières (Nom, Crédits, Semestre, Formation, Année d'étude, "
+                                         "Deux notes)")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("fichier", help="fichier CSV ou XLSX")
+
+    command = commands.add_parser("rentree", help="créer et inscrire les nouveaux étudiants (Matricule, Nom, "
+                                                  "Prénom, Formation, Année académique, Année d'étude)")
+    command.add_argument("fichier", help="fichier CSV ou XLSX")
+    command.add_argument("--controle", action="store_true", help="contrôler le fichier sans rien enregistrer")
+
+    for name, help_text in (("notes-import", "importer les notes d'une matière"),
+                            ("notes-export", "exporter les notes d'une matière en CSV")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("fichier")
+        command.add_argument("--matiere", type=int, required=True, help="identifiant de la matière")
+        command.add_argument("--annee", required=True, help="année académique, par exemple 2024-2025")
+
+    command = commands.add_parser("bulletins", help="exporter les bulletins PDF d'une promotion")
+    command.add_argument("dossier")
+    command.add_argument("--formation", required=True)
+    command.add_argument("--annee", required=True, help="année académique, par exemple 2024-2025")
+    command.add_argument("--annee-etude", type=int, required=True)
+    command.add_argument("--semestre", type=int, choices=[1, 2], help="par défaut : année complète")
+    command.add_argument("--fusionner", action="store_true", help="un seul fichier PDF pour toute la promotion")
+
+    command = commands.add_parser("deliberation", help="exporter le procès-verbal de délibération d'une promotion")
+    command.add_argument("fichier", help="fichier CSV à écrire")
+    command.add_argument("--formation", required=True)
+    command.add_argument("--annee", required=True, help="année académique, par exemple 2024-2025")
+    command.add_argument("--annee-etude", type=int, required=True)
+
+    command = commands.add_parser("export", help="exporter les étudiants, les notes ou les résultats")
+    command.add_argument("fichier", help="fichier .csv, .xlsx ou .jsonl")
+    command.add_argument("--donnees", choices=list(DATASETS), required=True)
+    command.add_argument("--formation", help="par défaut : toutes les formations")
+    command.add_argument("--annee", help="année académique, par défaut : toutes")
+
+    command = commands.add_parser("passage", help="réinscrire une formation dans l'année académique suivante")
+    command.add_argument("--formation", required=True)
+    command.add_argument("--annee", required=True, help="année académique de départ, par exemple 2024-2025")
+    command.add_argument("--vers", help="année académique d'arrivée, par défaut : la suivante")
+    command.add_argument("--simulation", action="store_true", help="afficher les décisions sans rien enregistrer")
+
+    commands.add_parser("resultats", help="recalculer les moyennes et crédits de tous les étudiants")
+    return parser
+
+
+def run(args):
+    if args.command == "etudiants":
+        return import_students(args.fichier, args.lot).print("étudiant(s)")
+    if args.command == "inscriptions":
+        return import_enrollments(args.fichier, args.lot).print("inscription(s)")
+    if args.command == "rentree":
+        return import_intake(args.fichier, args.controle)
+    if args.command == "matieres":
+        return import_courses(args.fichier, args.lot).print("matière(s)")
+    if args.command == "notes-import":
+        return import_grades(args.fichier, args.matiere, args.annee).print("note(s)")
+    if args.command == "notes-export":
+        print(f"{export_grades(args.fichier, args.matiere, args.annee)} ligne(s) exportée(s).")
+        return 0
+    if args.command == "bulletins":
+        written = generate_bulletins(args.dossier, args.formation, args.annee, args.annee_etude, args.semestre,
+                                     args.fusionner)
+        period = PERIODS.get(args.semestre, PERIODS[None])
+        print(f"{len(written)} fichier(s) écrit(s) ({period}).")
+        return 0
+    if args.command == "deliberation":
+        pv = export_deliberation(args.fichier, args.formation, args.annee, args.annee_etude)
+        counts = ", ".join(f"{label} : {count}" for label, count in pv['counts'].items())
+        print(f"{len(pv['students'])} étudiant(s) délibéré(s). {counts}")
+        return 0
+    if args.command == "export":
+        print(f"{export_data(args.fichier, args.donnees, args.formation, args.annee)} ligne(s) exportée(s).")
+        return 0
+    if args.command == "passage":
+        preview, enrolled = rollover(args.formation, args.annee, args.vers, args.simulation)
+        counts = ", ".join(f"{label} : {count}" for label, count in preview['counts'].items())
+        print(f"{len(preview['students'])} étudiant(s). {counts}")
+        if args.simulation:
+            print(f"{preview['to_enroll']} inscription(s) à créer (simulation, rien enregistré).")
+        else:
+            print(f"{enrolled} inscription(s) créée(s).")
+        return 0
+    if args.command == "resultats":
+        write(refresh_results)
+        print("Résultats recalculés.")
+        return 0
+
+
+def main(argv=None):
+    args = _build_parser().parse_args(argv)
+    try:
+        init_db()
+        return run(args)
+    except (TableFileError, LookupError, OSError) as e:
+        print(f"Erreur : {e}", file=sys.stderr)
+        return 2
+    except sqlite3.Error as e:
+        print(f"Erreur de base de données : {e}", file=sys.stderr)
+        return 2
+    finally:
+        close_all()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,286 @@
+import queue
+import sqlite3
+import sys
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import profiling
+import queries
+from functions import DB_NAME, init_db
+
+
+# Nombre de requêtes préparées conservées par connexion (cache du module sqlite3).
+STATEMENT_CACHE_SIZE = 256
+# Attente maximale (ms) d'un verrou tenu par un autre poste avant « database is locked ».
+BUSY_TIMEOUT_MS = 10000
+# Nombre maximal d'écritures en attente regroupées dans une même transaction.
+WRITE_BATCH_SIZE = 64
+
+_local = threading.local()
+_connections = []
+_connections_lock = threading.Lock()
+# Client du service HTTP (service_client.ServiceClient) quand la base est partagée par service.py.
+_service = None
+# Opérations d'écriture nommées (« module.fonction ») : les seules que service.py exécute pour un client.
+_operations = {}
+
+
+def use_service(url):
+    """Fait passer toutes les lectures et écritures par le service HTTP à l'adresse url (None : base locale)."""
+    global _service
+    from service_client import ServiceClient
+    _service = ServiceClient(url) if url else None
+
+
+def uses_service():
+    return _service is not None
+
+
+def operation(work):
+    """Déclare work(cursor, *args) comme opération d'écriture nommée.
+
+    À travers le service, write et submit_write n'envoient que le nom de l'opération et
+    ses arguments (sérialisables en JSON) : le service l'exécute lui-même, en une seule
+    tâche du thread d'écriture.
+    """
+    work.operation_name = f"{work.__module__}.{work.__name__}"
+    _operations[work.operation_name] = work
+    return work
+
+
+def operation_named(name):
+    """Opération déclarée sous ce nom, ou None."""
+    return _operations.get(name)
+
+
+def open_connection(path=DB_NAME):
+    """Ouvre une connexion configurée une fois pour toutes (celle d'un thread, ou des benchmarks)."""
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False,
+                           cached_statements=STATEMENT_CACHE_SIZE)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    # WAL : les lectures ne bloquent plus les écritures (et inversement) ;
+    # synchronous = NORMAL suffit en WAL pour ne jamais corrompre la base.
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA foreign_keys = ON;")
+    return conn
+
+
+def get_connection():
+    """Renvoie la connexion persistante du thread courant (une par thread)."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = open_connection()
+        # Compte les instructions exécutées par chaque requête mesurée (profiling.py).
+        conn.set_trace_callback(profiling.trace)
+        _local.conn = conn
+        with _connections_lock:
+            _connections.append(conn)
+    return conn
+
+
+def close_all():
+    """Arrête le thread d'écriture puis ferme toutes les connexions ouvertes par le pool."""
+    if _service is not None:
+        _service.close()
+    stop_writer()
+    with _connections_lock:
+        for conn in _connections:
+            conn.close()
+        _connections.clear()
+    _local.__dict__.clear()
+
+
+@contextmanager
+def read_cursor(site=None):
+    """Fournit un curseur de lecture sur la connexion partagée.
+
+    Ses requêtes sont mesurées au nom de site (par défaut, la fonction appelante).
+    """
+    cursor = _service.cursor() if _service is not None else get_connection().cursor()
+    cursor = profiling.ProfiledCursor(cursor, site or profiling.call_site())
+    try:
+        yield cursor
+    finally:
+        cursor.close()
+
+
+@contextmanager
+def transaction():
+    """Exécute un bloc d'écritures dans une transaction (commit ou rollback).
+
+    Une transaction imbriquée rejoint simplement la transaction en cours.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    if conn.in_transaction:
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+        return
+
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        yield cursor
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+class _Writer(threading.Thread):
+    """Thread unique qui exécute toutes les écritures.
+
+    Les écritures arrivées pendant une transaction sont regroupées dans la suivante ;
+    chacune a son propre SAVEPOINT, de sorte qu'un échec n'annule que l'écriture fautive.
+    """
+
+    def __init__(self):
+        super().__init__(name="sqlite-writer", daemon=True)
+        self.jobs = queue.Queue()
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            job = self.jobs.get()
+            if job is None:
+                break
+            batch = [job]
+            while len(batch) < WRITE_BATCH_SIZE:
+                try:
+                    job = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                batch.append(job)
+            self._run_batch([job for job in batch if job[0].set_running_or_notify_cancel()])
+
+    @staticmethod
+    def _run_batch(batch):
+        if not batch:
+            return
+        conn = get_connection()
+        cursor = conn.cursor()
+        outcomes = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for future, work, args in batch:
+                cursor.execute("SAVEPOINT write_job")
+                try:
+                    outcomes.append((future, work(cursor, *args), None))
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO write_job")
+                    outcomes.append((future, None, e))
+                cursor.execute("RELEASE write_job")
+            conn.commit()
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.rollback()
+            for future, _, _ in batch:
+                future.set_exception(e)
+            return
+        finally:
+            cursor.close()
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def submit_write(work, *args):
+    """Confie work(cursor, *args) au thread d'écriture ; renvoie un Future de son résultat.
+
+    Le résultat n'est disponible qu'une fois la transaction validée.
+    """
+    global _writer
+    if _service is not None:
+        return _service.submit_write(work, *args)
+    work = profiling.profiled(work, profiling.call_site())
+    future = Future()
+    with _writer_lock:
+        if _writer is None:
+            _writer = _Writer()
+            _writer.start()
+        _writer.jobs.put((future, work, args))
+    return future
+
+
+def write(work, *args):
+    """Exécute work(cursor, *args) dans le thread d'écriture et attend son résultat (ou son exception)."""
+    if _service is not None:
+        return _service.write(work, *args)
+    if threading.current_thread() is _writer:
+        with transaction() as cursor:
+            return profiling.profiled(work, profiling.call_site())(cursor, *args)
+    return submit_write(work, *args).result()
+
+
+def execute_write(sql, params=()):
+    """Exécute une seule requête d'écriture ; renvoie le nombre de lignes modifiées."""
+    return write(lambda cursor: cursor.execute(sql, params).rowcount)
+
+
+def stop_writer():
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.jobs.put(None)
+        writer.join()
+
+
+def _plan_problems(name, sql, steps):
+    """Étapes du plan qui lisent une table entière ou trient dans un B-tree temporaire."""
+    sorts = [step for step in steps if step.startswith("USE TEMP B-TREE")]
+    # Une page (LIMIT) lue dans l'ordre d'un index s'arrête après ses lignes, même si l'index n'est pas couvrant.
+    ordered_page = " LIMIT " in sql and not sorts
+    problems = [] if name in queries.PLAN_ACCEPTED_SORTS else sorts
+    for step in steps:
+        if not step.startswith("SCAN"):
+            continue
+        # Une table FTS5 interrogée par MATCH (« INDEX n:M… ») passe par son propre index ;
+        # « SCAN (subquery-n) » relit le résultat d'une sous-requête dont les étapes sont contrôlées.
+        if (" VIRTUAL TABLE INDEX " in step and ":M" in step) or step.startswith("SCAN (subquery-"):
+            continue
+        if " USING COVERING INDEX " in step or (" USING INDEX " in step and ordered_page):
+            continue
+        problems.append(step)
+    return problems
+
+
+def check_query_plans(conn=None):
+    """Vérifie par EXPLAIN QUERY PLAN que chaque requête de l'interface utilise un index.
+
+    Sont signalés les parcours complets d'une table, les parcours complets d'un index non
+    couvrant (hors page lue dans l'ordre de l'index) et les tris dans un B-tree temporaire
+    (sauf queries.PLAN_ACCEPTED_SORTS). Renvoie la liste des (nom, étapes du plan, étapes signalées).
+    """
+    conn = conn or get_connection()
+    report = []
+    for name, sql, params in queries.PLAN_CHECKS:
+        steps = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        report.append((name, steps, _plan_problems(name, sql, steps)))
+    return report
+
+
+if __name__ == "__main__":
+    init_db()
+    failures = 0
+    for name, steps, problems in check_query_plans():
+        print(f"[{'ÉCHEC' if problems else 'OK'}] {name}")
+        for step in steps:
+            print(f"  {'!!' if step in problems else '  '}  {step}")
+        failures += bool(problems)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,181 @@
+"""Délibération du jury pour une promotion (formation, année d'étude, année académique).
+
+Les notes de toute la promotion sont lues en une requête (queries.DELIBERATION_GRADES)
+et les notes finales calculées par grade_engine, avec les mêmes règles que
+calculate_final_grade_and_status. Un seul parcours des lignes donne ensuite, pour
+chaque étudiant, les moyennes pondérées par les crédits (par semestre et pour l'année),
+les crédits validés, le rang, la mention et la décision du jury.
+
+Contrairement au bulletin, toutes les matières de l'année d'étude entrent dans le
+calcul : une matière sans note est défaillante et ses crédits ne sont pas validés.
+"""
+
+import csv
+from operator import itemgetter
+
+from database import read_cursor
+from grade_engine import VALIDATED, compute_final_grades
+import queries
+
+ADMITTED = "Admis"
+GRADUATED = "Diplômé"
+CONDITIONAL = "Admis avec dettes"
+REPEAT = "Ajourné"
+ABSENT = "Défaillant"
+
+# Part des crédits de l'année à valider pour passer avec des dettes (jamais en dernière année).
+CONDITIONAL_CREDIT_RATIO = 0.75
+
+# Mentions des étudiants admis : (moyenne minimale, mention), de la plus haute à la plus basse.
+MENTIONS = [(16, "Très bien"), (14, "Bien"), (12, "Assez bien"), (10, "Passable")]
+
+PV_HEADER = ["Rang", "Matricule", "Nom", "Prénom"]
+PV_FOOTER = ["Moyenne", "Crédits validés", "Crédits", "Mention", "Décision"]
+
+
+def mention(average):
+    for minimum, label in MENTIONS:
+        if average >= minimum:
+            return label
+    return ""
+
+
+def decision(total_credits, validated_credits, graded, final_year):
+    """Décision du jury à partir des crédits de l'année."""
+    if not graded:
+        return ABSENT
+    if validated_credits >= total_credits:
+        return GRADUATED if final_year else ADMITTED
+    if not final_year and validated_credits >= CONDITIONAL_CREDIT_RATIO * total_credits:
+        return CONDITIONAL
+    return REPEAT
+
+
+def deliberate(rows, final_year=False):
+    """Calcule le procès-verbal à partir des lignes de DELIBERATION_GRADES (triées par matricule).
+
+    Renvoie (semestres, lignes) ; chaque ligne est un dictionnaire, dans l'ordre du classement.
+    """
+    if not rows:
+        return [], []
+    finals, statuses = compute_final_grades(*(list(map(itemgetter(column), rows)) for column in (6, 7, 8, 5, 9)))
+
+    # Un seul parcours : les lignes d'un étudiant se suivent, ses totaux sont gardés en variables locales.
+    students, semesters = [], set()
+    current = None
+    for (matricule, last_name, first_name, semester, credits, *_), final, status in zip(rows, finals, statuses):
+        if matricule != current:
+            if current is not None:
+                students.append(_student_line(student, points, total_credits, validated_credits, by_semester,
+                                              final_year))
+            current = matricule
+            student = (matricule, last_name, first_name)
+            points, total_credits, validated_credits, by_semester = 0.0, 0, 0, {}
+        # Même cumul que grade_engine.summarize : une matière sans note compte dans les crédits.
+        semester_totals = by_semester.get(semester)
+        if semester_totals is None:
+            semester_totals = by_semester[semester] = [0.0, 0, False]
+            semesters.add(semester)
+        semester_totals[1] += credits
+        total_credits += credits
+        if final is not None:
+            points += final * credits
+            semester_totals[0] += final * credits
+            semester_totals[2] = True
+        if status == VALIDATED:
+            validated_credits += credits
+    students.append(_student_line(student, points, total_credits, validated_credits, by_semester, final_year))
+
+    _rank(students)
+    return sorted(semesters), students
+
+
+def _student_line(student, points, total_credits, validated_credits, by_semester, final_year):
+    matricule, last_name, first_name = student
+    graded = any(graded for _, _, graded in by_semester.values())
+    average = points / total_credits if graded and total_credits > 0 else None
+    decision_ = decision(total_credits, validated_credits, graded, final_year)
+    return {
+        'matricule': matricule,
+        'last_name': last_name,
+        'first_name': first_name,
+        'semester_averages': {semester: semester_points / credits if graded and credits > 0 else None
+                              for semester, (semester_points, credits, graded) in by_semester.items()},
+        'average': average,
+        'total_credits': total_credits,
+        'validated_credits': validated_credits,
+        'mention': mention(average) if decision_ in (ADMITTED, GRADUATED) else "",
+        'decision': decision_,
+    }
+
+
+def _rank(students):
+    """Classe par moyenne décroissante ; les ex aequo (moyenne arrondie au centième) partagent le rang."""
+    students.sort(key=lambda student: (student['average'] is None, -round(student['average'] or 0, 2),
+                                       student['last_name'], student['first_name'], student['matricule']))
+    previous, rank = None, 0
+    for position, student in enumerate(students, start=1):
+        if student['average'] is None:
+            student['rank'] = None
+            continue
+        rounded = round(student['average'], 2)
+        if rounded != previous:
+            rank, previous = position, rounded
+        student['rank'] = rank
+
+
+def load_deliberation(program_id, academic_year_id, year_of_study):
+    """Procès-verbal d'une promotion : dictionnaire (formation, année, semestres, lignes, effectifs)."""
+    with read_cursor() as cursor:
+        cursor.execute("SELECT name, duration_years FROM programs WHERE id = ?", (program_id,))
+        program_row = cursor.fetchone()
+        cursor.execute("SELECT name FROM academic_years WHERE id = ?", (academic_year_id,))
+        year_row = cursor.fetchone()
+        cursor.execute(queries.DELIBERATION_GRADES, (program_id, academic_year_id, year_of_study))
+        rows = cursor.fetchall()
+
+    final_year = program_row is not None and year_of_study >= program_row[1]
+    semesters, students = deliberate(rows, final_year)
+    counts = {}
+    for student in students:
+        counts[student['decision']] = counts.get(student['decision'], 0) + 1
+    return {
+        'program': program_row[0] if program_row else "",
+        'academic_year': year_row[0] if year_row else "",
+        'year_of_study': year_of_study,
+        'final_year': final_year,
+        'semesters': semesters,
+        'students': students,
+        'counts': counts,
+    }
+
+
+def _format_average(value):
+    return "" if value is None else f"{value:.2f}"
+
+
+def pv_header(pv):
+    return PV_HEADER + [f"Moy. S{semester}" for semester in pv['semesters']] + PV_FOOTER
+
+
+def pv_row(pv, student):
+    """Valeurs d'une ligne du procès-verbal, dans l'ordre de pv_header."""
+    return ([student['rank'] or "", student['matricule'], student['last_name'], student['first_name']]
+            + [_format_average(student['semester_averages'].get(semester)) for semester in pv['semesters']]
+            + [_format_average(student['average']), student['validated_credits'], student['total_credits'],
+               student['mention'], student['decision']])
+
+
+def export_pv(pv, path):
+    """Écrit le procès-verbal en CSV (séparateur « ; », lisible par Excel) ; renvoie le nombre d'étudiants."""
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow([f"Procès-verbal de délibération - {pv['program']} - Année {pv['year_of_study']} - "
+                         f"{pv['academic_year']}"])
+        writer.writerow(pv_header(pv))
+        for student in pv['students']:
+            writer.writerow(pv_row(pv, student))
+        writer.writerow([])
+        for label, count in pv['counts'].items():
+            writer.writerow([label, count])
+    return len(pv['students'])
@@ -0,0 +1,34 @@
+"""Inscription d'un étudiant à une formation pour une année académique (table enrollments)."""
+
+from database import operation
+from results import refresh_results
+import queries
+
+
+@operation
+def enroll(cursor, matricule, program_id, academic_year_id, year_of_study, refresh=True):
+    """Inscrit l'étudiant dans la transaction du curseur et recalcule ses résultats.
+
+    Renvoie (titre, message) si l'inscription est refusée, None sinon. Avec refresh=False,
+    le recalcul des résultats est laissé à l'appelant (inscriptions par lots).
+    """
+    cursor.execute("SELECT 1 FROM students WHERE matricule = ?", (matricule,))
+    if not cursor.fetchone():
+        return "Erreur", f"Matricule {matricule or '(vide)'} inconnu."
+
+    cursor.execute("SELECT id FROM academic_years WHERE id = ?", (academic_year_id,))
+    if not cursor.fetchone():
+        return "Erreur", "L'année académique sélectionnée n'existe pas."
+
+    cursor.execute("SELECT id FROM programs WHERE id = ?", (program_id,))
+    if not cursor.fetchone():
+        return "Erreur", "La formation sélectionnée n'existe pas."
+
+    cursor.execute(queries.ENROLLMENT_EXISTS, (matricule, academic_year_id))
+    if cursor.fetchone():
+        return "Inscription existante", "Cet étudiant est déjà inscrit pour cette année académique."
+
+    cursor.execute(queries.ENROLLMENT_INSERT, (matricule, academic_year_id, program_id, year_of_study))
+    if refresh:
+        refresh_results(cursor, [matricule])
+    return None
@@ -0,0 +1,22 @@
+from PySide6.QtCore import QObject, Signal
+
+# Entités publiées sur le bus (noms des tables concernées).
+ACADEMIC_YEARS = "academic_years"
+DEPARTMENTS = "departments"
+PROGRAMS = "programs"
+STUDENTS = "students"
+COURSES = "courses"
+GRADES = "grades"
+USERS = "users"
+
+
+class ChangeBus(QObject):
+    """Bus de notifications : chaque modification publie l'entité et la clé touchées.
+
+    Une clé None signifie que plusieurs lignes (ou une ligne inconnue) ont changé.
+    """
+
+    changed = Signal(str, object)
+
+    def publish(self, entity, key=None):
+        self.changed.emit(entity, key)
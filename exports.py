@@ -0,0 +1,151 @@
+"""Exports en flux des étudiants, de l'historique des notes et des résultats (CSV, XLSX, JSON lines).
+
+Le curseur est lu par paquets de CHUNK_SIZE lignes (fetchmany) écrits aussitôt :
+la mémoire utilisée ne dépend pas du nombre de lignes exportées. Les requêtes
+suivent l'ordre d'un index (matricule, puis année académique), sans tri global.
+
+    python3 cli.py export notes.csv --donnees notes --annee 2024-2025
+
+À travers le service (GESTION_SCOLAIRE_API), le résultat d'une requête arrive en une fois.
+"""
+
+from operator import itemgetter
+
+from database import read_cursor
+from grade_engine import compute_final_grades
+from results import WHOLE_YEAR
+from tablefiles import write_records
+import queries
+
+CHUNK_SIZE = 5000
+
+STUDENT_COLUMNS = [
+    ("matricule", "Matricule"), ("last_name", "Nom"), ("first_name", "Prénom"),
+    ("program", "Formation"), ("academic_year", "Année académique"), ("year_of_study", "Année d'étude"),
+]
+
+GRADE_COLUMNS = [
+    ("matricule", "Matricule"), ("last_name", "Nom"), ("first_name", "Prénom"),
+    ("academic_year", "Année académique"), ("program", "Formation"), ("year_of_study", "Année d'étude"),
+    ("semester", "Semestre"), ("course", "Matière"), ("credits", "Crédits"),
+    ("grade1", "Note 1"), ("grade2", "Note 2"), ("resit_grade", "Rattrapage"),
+    ("final_grade", "Note finale"), ("status", "Statut"),
+]
+# CROSS JOIN fixe l'ordre des tables : les inscriptions sont parcourues dans l'ordre de leur
+# clé primaire et seules les notes d'une même inscription sont triées entre elles.
+GRADES_EXPORT = """
+    SELECT e.matricule, s.last_name, s.first_name, ay.name, p.name, e.year_of_study,
+           c.semester, c.name, c.credits, g.grade1, g.grade2, g.resit_grade, c.has_two_grades, d.validation_grade
+    FROM enrollments e
+    JOIN students s ON s.matricule = e.matricule
+    JOIN academic_years ay ON ay.id = e.academic_year_id
+    JOIN programs p ON p.id = e.program_id
+    JOIN departments d ON d.id = p.department_id
+    CROSS JOIN grades g ON g.student_matricule = e.matricule AND g.academic_year_id = e.academic_year_id
+    JOIN courses c ON c.id = g.course_id
+"""
+GRADES_EXPORT_ORDER = " ORDER BY e.matricule, e.academic_year_id, c.semester, c.name"
+
+RESULT_COLUMNS = [
+    ("matricule", "Matricule"), ("last_name", "Nom"), ("first_name", "Prénom"),
+    ("academic_year", "Année académique"), ("program", "Formation"), ("year_of_study", "Année d'étude"),
+    ("period", "Période"), ("average", "Moyenne"), ("total_credits", "Crédits"),
+    ("validated_credits", "Crédits validés"),
+]
+RESULTS_EXPORT = """
+    SELECT r.matricule, s.last_name, s.first_name, ay.name, p.name, e.year_of_study,
+           r.semester, r.average, r.total_credits, r.validated_credits
+    FROM enrollments e
+    JOIN students s ON s.matricule = e.matricule
+    JOIN academic_years ay ON ay.id = e.academic_year_id
+    JOIN programs p ON p.id = e.program_id
+    CROSS JOIN results r ON r.matricule = e.matricule AND r.academic_year_id = e.academic_year_id
+"""
+RESULTS_EXPORT_ORDER = " ORDER BY e.matricule, e.academic_year_id, r.semester"
+
+
+class ExportCancelled(Exception):
+    """L'export a été interrompu par on_progress."""
+
+
+def _enrollment_filters(program_id, academic_year_id):
+    conditions, params = [], []
+    if program_id is not None:
+        conditions.append("e.program_id = ?")
+        params.append(program_id)
+    if academic_year_id is not None:
+        conditions.append("e.academic_year_id = ?")
+        params.append(academic_year_id)
+    return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+
+def _students_query(program_id, academic_year_id):
+    # Les étudiants avec leur dernière inscription, comme l'onglet Étudiants.
+    conditions, params = [], []
+    if program_id is not None:
+        conditions.append(queries.STUDENTS_PROGRAM_FILTER)
+        params.append(program_id)
+    if academic_year_id is not None:
+        conditions.append("s.matricule IN (SELECT matricule FROM enrollments WHERE academic_year_id = ?)")
+        params.append(academic_year_id)
+    return queries.keyset_page(queries.STUDENTS, conditions, params, queries.STUDENTS_SORT_KEYS[0], limit=-1)
+
+
+def _grades_query(program_id, academic_year_id):
+    where, params = _enrollment_filters(program_id, academic_year_id)
+    return GRADES_EXPORT + where + GRADES_EXPORT_ORDER, params
+
+
+def _results_query(program_id, academic_year_id):
+    where, params = _enrollment_filters(program_id, academic_year_id)
+    return RESULTS_EXPORT + where + RESULTS_EXPORT_ORDER, params
+
+
+def _grade_rows(rows):
+    """Ajoute la note finale et le statut, calculés pour tout le paquet par grade_engine."""
+    finals, statuses = compute_final_grades(*(list(map(itemgetter(column), rows)) for column in (9, 10, 11, 12, 13)))
+    return [row[:12] + (None if final is None else round(final, 2), status)
+            for row, final, status in zip(rows, finals, statuses)]
+
+
+def _result_rows(rows):
+    return [row[:6] + ("Année complète" if row[6] == WHOLE_YEAR else f"Semestre {row[6]}",
+                       None if row[7] is None else round(row[7], 2)) + row[8:]
+            for row in rows]
+
+
+# Nom -> (libellé, colonnes, construction de la requête, transformation d'un paquet de lignes).
+DATASETS = {
+    'etudiants': ("Étudiants", STUDENT_COLUMNS, _students_query, None),
+    'notes': ("Notes", GRADE_COLUMNS, _grades_query, _grade_rows),
+    'resultats': ("Résultats", RESULT_COLUMNS, _results_query, _result_rows),
+}
+
+
+def _stream(cursor, transform, on_progress):
+    done = 0
+    while True:
+        rows = cursor.fetchmany(CHUNK_SIZE)
+        if not rows:
+            return
+        yield from (transform(rows) if transform is not None else rows)
+        done += len(rows)
+        if on_progress is not None and on_progress(done) is False:
+            raise ExportCancelled()
+
+
+def export(dataset, path, program_id=None, academic_year_id=None, on_progress=None):
+    """Exporte un jeu de données de DATASETS dans path (format selon l'extension), filtré au besoin.
+
+    on_progress(lignes écrites) est appelé après chaque paquet ; s'il renvoie False,
+    l'export s'arrête et le fichier incomplet est supprimé. Renvoie le nombre de lignes
+    écrites, ou None si l'export a été interrompu.
+    """
+    _, columns, build_query, transform = DATASETS[dataset]
+    sql, params = build_query(program_id, academic_year_id)
+    with read_cursor() as cursor:
+        cursor.execute(sql, params)
+        try:
+            return write_records(path, columns, _stream(cursor, transform, on_progress))
+        except ExportCancelled:
+            return None
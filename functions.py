@@ -1,11 +1,194 @@
 import sqlite3
 import hashlib
+import re
 
 
 
 DB_NAME = "gestion_scolaire.db"
 
 
+# Périmètre des résultats tant que l'année d'étude est dans students (avant la migration 5).
+_RESULTS_SOURCE_BEFORE_ENROLLMENTS = """
+    SELECT g.student_matricule, g.academic_year_id, c.semester, c.credits, c.has_two_grades,
+           g.grade1, g.grade2, g.resit_grade, d.validation_grade
+    FROM grades g
+    JOIN students s ON s.matricule = g.student_matricule
+    JOIN courses c ON g.course_id = c.id AND c.year_of_study = s.year_of_study
+    JOIN programs p ON c.program_id = p.id
+    JOIN departments d ON p.department_id = d.id
+"""
+
+
+def _backfill_results(cursor):
+    """Remplit results avec le schéma en place (migration 2 : sans enrollments ; migration 5 : avec)."""
+    from results import RESULTS_SOURCE, refresh_results
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'enrollments'")
+    refresh_results(cursor, source=RESULTS_SOURCE if cursor.fetchone() else _RESULTS_SOURCE_BEFORE_ENROLLMENTS)
+
+
+# Synchronisation de students_fts avec students (recréés avec la table à la migration 5).
+_STUDENTS_FTS_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS students_fts_insert AFTER INSERT ON students BEGIN
+        INSERT INTO students_fts (rowid, matricule, last_name, first_name)
+        VALUES (new.rowid, new.matricule, new.last_name, new.first_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS students_fts_delete AFTER DELETE ON students BEGIN
+        INSERT INTO students_fts (students_fts, rowid, matricule, last_name, first_name)
+        VALUES ('delete', old.rowid, old.matricule, old.last_name, old.first_name);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS students_fts_update AFTER UPDATE OF matricule, last_name, first_name ON students BEGIN
+        INSERT INTO students_fts (students_fts, rowid, matricule, last_name, first_name)
+        VALUES ('delete', old.rowid, old.matricule, old.last_name, old.first_name);
+        INSERT INTO students_fts (rowid, matricule, last_name, first_name)
+        VALUES (new.rowid, new.matricule, new.last_name, new.first_name);
+    END""",
+]
+
+
+# Migrations du schéma : l'élément i fait passer PRAGMA user_version de i à i + 1.
+# Une étape est une requête SQL ou une fonction appelée avec le curseur.
+MIGRATIONS = [
+    # 1 : index secondaires sur les filtres des onglets Étudiants, Matières & Notes et du bulletin
+    # (les index de students disparaissent avec la table à la migration 5 ; remplacés aux migrations 5 et 6)
+    [
+        "CREATE INDEX IF NOT EXISTS idx_students_program_year ON students (program_id, academic_year_id, last_name, first_name, matricule)",
+        "CREATE INDEX IF NOT EXISTS idx_students_academic_year ON students (academic_year_id)",
+        "CREATE INDEX IF NOT EXISTS idx_students_name ON students (last_name, first_name)",
+        "CREATE INDEX IF NOT EXISTS idx_courses_program_year_semester ON courses (program_id, year_of_study, semester, name)",
+        "CREATE INDEX IF NOT EXISTS idx_grades_course ON grades (course_id, academic_year_id)",
+        "CREATE INDEX IF NOT EXISTS idx_programs_department ON programs (department_id)",
+    ],
+    # 2 : résultats précalculés par étudiant, année académique et semestre (0 = année complète)
+    [
+        """CREATE TABLE IF NOT EXISTS results (
+            matricule TEXT NOT NULL,
+            academic_year_id INTEGER NOT NULL,
+            semester INTEGER NOT NULL,
+            average REAL,
+            total_credits INTEGER NOT NULL,
+            validated_credits INTEGER NOT NULL,
+            PRIMARY KEY (matricule, academic_year_id, semester),
+            FOREIGN KEY (matricule) REFERENCES students (matricule) ON DELETE CASCADE,
+            FOREIGN KEY (academic_year_id) REFERENCES academic_years (id) ON DELETE CASCADE
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_results_year_semester ON results (academic_year_id, semester, average)",
+        _backfill_results,
+    ],
+    # 3 : index plein texte des étudiants (préfixes, sans accents ni casse), synchronisé par triggers
+    [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+            matricule, last_name, first_name,
+            content='students', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )""",
+        *_STUDENTS_FTS_TRIGGERS,
+        "INSERT INTO students_fts (students_fts) VALUES ('rebuild')",
+    ],
+    # 4 : un index par tri proposé (avec et sans filtre de formation) pour la pagination par clé
+    # (supprimés avec students à la migration 5 ; tris et filtre de formation servis par les index des migrations 5 et 6)
+    [
+        "DROP INDEX IF EXISTS idx_students_name",
+        "CREATE INDEX IF NOT EXISTS idx_students_name ON students (last_name, first_name, matricule)",
+        "CREATE INDEX IF NOT EXISTS idx_students_first_name ON students (first_name, last_name, matricule)",
+        "CREATE INDEX IF NOT EXISTS idx_students_program_name ON students (program_id, last_name, first_name, matricule)",
+        "CREATE INDEX IF NOT EXISTS idx_students_program_first_name ON students (program_id, first_name, last_name, matricule)",
+        "CREATE INDEX IF NOT EXISTS idx_students_program_matricule ON students (program_id, matricule)",
+        "CREATE INDEX IF NOT EXISTS idx_students_program_year_matricule ON students (program_id, academic_year_id, matricule)",
+    ],
+    # 5 : historique des inscriptions ; students ne garde que l'identité de l'étudiant
+    [
+        """CREATE TABLE IF NOT EXISTS enrollments (
+            matricule TEXT NOT NULL,
+            academic_year_id INTEGER NOT NULL,
+            program_id INTEGER NOT NULL,
+            year_of_study INTEGER NOT NULL,
+            PRIMARY KEY (matricule, academic_year_id),
+            FOREIGN KEY (matricule) REFERENCES students (matricule) ON DELETE CASCADE,
+            FOREIGN KEY (academic_year_id) REFERENCES academic_years (id) ON DELETE CASCADE,
+            FOREIGN KEY (program_id) REFERENCES programs (id) ON DELETE CASCADE
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_enrollments_cohort ON enrollments (program_id, academic_year_id, year_of_study, matricule)",
+        "CREATE INDEX IF NOT EXISTS idx_enrollments_academic_year ON enrollments (academic_year_id)",
+        """INSERT INTO enrollments (matricule, academic_year_id, program_id, year_of_study)
+            SELECT matricule, academic_year_id, program_id, year_of_study FROM students
+            WHERE program_id IS NOT NULL AND academic_year_id IS NOT NULL AND year_of_study IS NOT NULL""",
+        # Inscriptions écrasées par une réinscription : retrouvées d'après les matières notées
+        # (formation de l'année d'étude la plus haute).
+        """INSERT OR IGNORE INTO enrollments (matricule, academic_year_id, program_id, year_of_study)
+            SELECT g.student_matricule, g.academic_year_id, c.program_id, MAX(c.year_of_study)
+            FROM grades g
+            JOIN courses c ON c.id = g.course_id
+            JOIN students s ON s.matricule = g.student_matricule
+            GROUP BY g.student_matricule, g.academic_year_id""",
+        # Reconstruction de students sans program_id, academic_year_id et year_of_study ;
+        # les rowid sont conservés pour l'index plein texte.
+        """CREATE TABLE students_new (
+            matricule TEXT PRIMARY KEY,
+            last_name TEXT NOT NULL,
+            first_name TEXT NOT NULL
+        )""",
+        """INSERT INTO students_new (rowid, matricule, last_name, first_name)
+            SELECT rowid, matricule, last_name, first_name FROM students""",
+        "DROP TABLE students",
+        "ALTER TABLE students_new RENAME TO students",
+        "CREATE INDEX IF NOT EXISTS idx_students_name ON students (last_name, first_name, matricule)",
+        "CREATE INDEX IF NOT EXISTS idx_students_first_name ON students (first_name, last_name, matricule)",
+        *_STUDENTS_FTS_TRIGGERS,
+        _backfill_results,
+    ],
+    # 6 : index des tris et filtres de l'onglet Étudiants et de la saisie des notes, à la place de ceux
+    # de students perdus à la migration 5 (tri par matricule ; filtre de formation ; notes d'une matière)
+    [
+        "CREATE INDEX IF NOT EXISTS idx_students_matricule ON students (matricule, last_name, first_name)",
+        "CREATE INDEX IF NOT EXISTS idx_enrollments_student_program ON enrollments (matricule, program_id)",
+        "CREATE INDEX IF NOT EXISTS idx_enrollments_program_year ON enrollments (program_id, academic_year_id, matricule)",
+    ],
+]
+
+# Objets créés par les migrations, dans leur état après la dernière : une base neuve les
+# reçoit directement (init_db), sans rejouer les migrations écrites pour l'ancien schéma.
+_MIGRATED_SCHEMA = [
+    "CREATE INDEX IF NOT EXISTS idx_courses_program_year_semester ON courses (program_id, year_of_study, semester, name)",
+    "CREATE INDEX IF NOT EXISTS idx_grades_course ON grades (course_id, academic_year_id)",
+    "CREATE INDEX IF NOT EXISTS idx_programs_department ON programs (department_id)",
+    """CREATE TABLE IF NOT EXISTS results (
+        matricule TEXT NOT NULL,
+        academic_year_id INTEGER NOT NULL,
+        semester INTEGER NOT NULL,
+        average REAL,
+        total_credits INTEGER NOT NULL,
+        validated_credits INTEGER NOT NULL,
+        PRIMARY KEY (matricule, academic_year_id, semester),
+        FOREIGN KEY (matricule) REFERENCES students (matricule) ON DELETE CASCADE,
+        FOREIGN KEY (academic_year_id) REFERENCES academic_years (id) ON DELETE CASCADE
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_results_year_semester ON results (academic_year_id, semester, average)",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+        matricule, last_name, first_name,
+        content='students', content_rowid='rowid',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    *_STUDENTS_FTS_TRIGGERS,
+    """CREATE TABLE IF NOT EXISTS enrollments (
+        matricule TEXT NOT NULL,
+        academic_year_id INTEGER NOT NULL,
+        program_id INTEGER NOT NULL,
+        year_of_study INTEGER NOT NULL,
+        PRIMARY KEY (matricule, academic_year_id),
+        FOREIGN KEY (matricule) REFERENCES students (matricule) ON DELETE CASCADE,
+        FOREIGN KEY (academic_year_id) REFERENCES academic_years (id) ON DELETE CASCADE,
+        FOREIGN KEY (program_id) REFERENCES programs (id) ON DELETE CASCADE
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_enrollments_cohort ON enrollments (program_id, academic_year_id, year_of_study, matricule)",
+    "CREATE INDEX IF NOT EXISTS idx_enrollments_academic_year ON enrollments (academic_year_id)",
+    "CREATE INDEX IF NOT EXISTS idx_students_name ON students (last_name, first_name, matricule)",
+    "CREATE INDEX IF NOT EXISTS idx_students_first_name ON students (first_name, last_name, matricule)",
+    "CREATE INDEX IF NOT EXISTS idx_students_matricule ON students (matricule, last_name, first_name)",
+    "CREATE INDEX IF NOT EXISTS idx_enrollments_student_program ON enrollments (matricule, program_id)",
+    "CREATE INDEX IF NOT EXISTS idx_enrollments_program_year ON enrollments (program_id, academic_year_id, matricule)",
+]
+
+
 def load_stylesheet():
     return """
         QMainWindow, QDialog {
@@ -100,7 +283,7 @@ def load_stylesheet():
         }
 
         /* Style des tableaux */
-        QTableWidget {
+        QTableView {
             background: white;
             border: 0px solid #dee2e6;
             border-radius: 8px;
@@ -111,7 +294,7 @@ def load_stylesheet():
             selection-color: #000;
             color: #212529; 
         }
-        QTableWidget::item {
+        QTableView::item {
             padding: 0px;
         }
         QHeaderView::section {
@@ -161,15 +344,23 @@ def load_stylesheet():
         }
     """
 
-def init_db():
-    """Initialise la base de données et crée/met à jour les tables."""
+def init_db(db_name=DB_NAME):
+    """Initialise la base de données et crée/met à jour les tables.
+
+    Une base neuve reçoit directement le schéma final ; une base existante est mise à
+    jour par les migrations. Une erreur (création ou migration) est propagée : l'application ne démarre pas sur
+    une base dans un état intermédiaire.
+    """
     conn = None
     try:
-        conn = sqlite3.connect(DB_NAME)
+        conn = sqlite3.connect(db_name)
         cursor = conn.cursor()
 
         cursor.execute("PRAGMA foreign_keys = ON;")
 
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master")
+        new_database = cursor.fetchone()[0] == 0
+
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS academic_years (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -197,16 +388,12 @@ def init_db():
         )
         ''')
 
+        # Les inscriptions (formation, année académique, année d'étude) sont dans enrollments.
         cursor.execute('''
         CREATE TABLE IF NOT EXISTS students (
             matricule TEXT PRIMARY KEY,
             last_name TEXT NOT NULL,
-            first_name TEXT NOT NULL,
-            program_id INTEGER,
-            academic_year_id INTEGER,
-            year_of_study INTEGER,
-            FOREIGN KEY (program_id) REFERENCES programs (id) ON DELETE SET NULL,
-            FOREIGN KEY (academic_year_id) REFERENCES academic_years (id) ON DELETE SET NULL
+            first_name TEXT NOT NULL
         )
         ''')
 
@@ -251,6 +438,11 @@ def init_db():
         )
         ''')
 
+        if new_database:
+            for statement in _MIGRATED_SCHEMA:
+                cursor.execute(statement)
+            cursor.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+
         cursor.execute("SELECT COUNT(*) FROM academic_years")
         if cursor.fetchone()[0] == 0:
             current_year = 2023
@@ -267,14 +459,81 @@ def init_db():
                 ('secretaire1', hash_password('secpass'), 'secretaire', None)
             ]
             cursor.executemany("INSERT INTO users (username, password_hash, role, student_id) VALUES (?, ?, ?, ?)", default_users)
-            
+
+        migrate_db(cursor)
         conn.commit()
-    except sqlite3.Error as e:
-        print(f"Erreur de base de données: {e}")
     finally:
         if conn:
             conn.close()
 
+def migrate_db(cursor):
+    """Applique les migrations manquantes d'après PRAGMA user_version, en une transaction.
+
+    Les clés étrangères sont désactivées pendant la migration, pour pouvoir reconstruire
+    une table sans déclencher les suppressions en cascade, puis contrôlées avant validation.
+    En cas d'erreur, la transaction est annulée à la fermeture de la connexion.
+    """
+    cursor.execute("PRAGMA user_version")
+    version = cursor.fetchone()[0]
+    if version >= len(MIGRATIONS):
+        return
+    conn = cursor.connection
+    conn.commit()
+    cursor.execute("PRAGMA foreign_keys = OFF")
+    try:
+        cursor.execute("BEGIN")
+        for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            for statement in statements:
+                if callable(statement):
+                    statement(cursor)
+                else:
+                    cursor.execute(statement)
+            cursor.execute(f"PRAGMA user_version = {number}")
+        cursor.execute("PRAGMA foreign_key_check")
+        violation = cursor.fetchone()
+        if violation:
+            raise sqlite3.IntegrityError(f"Clé étrangère invalide après migration : {violation}")
+        conn.commit()
+    finally:
+        cursor.execute("PRAGMA foreign_keys = ON")
+
 def hash_password(password):
     """Hache un mot de passe pour le stockage."""
     return hashlib.sha256(password.encode()).hexdigest()
+
+def fts_match_expression(text):
+    """Transforme une saisie libre en requête FTS5 : chaque mot devient un préfixe obligatoire.
+
+    Renvoie None si la saisie ne contient aucun mot.
+    """
+    words = re.findall(r"\w+", text or "")
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def calculate_final_grade_and_status(g1, g2, gr, has_two_grades, validation_grade):
+    """Calcule la note finale d'une matière (rattrapage compris) et son statut."""
+    final_grade = None
+    current_validation_grade = validation_grade if validation_grade is not None else 12.0
+
+    if has_two_grades:
+        if g1 is not None and g2 is not None:
+            final_grade = (g1 + g2) / 2
+    else:
+        if g1 is not None:
+            final_grade = g1
+
+    if final_grade is None:
+        return None, "Défaillant"
+
+    effective_grade = final_grade
+    if final_grade < 12 and gr is not None:
+        effective_grade = gr
+
+    if effective_grade >= current_validation_grade:
+        status = "Validée"
+    else:
+        status = "Non validée"
+
+    return effective_grade, status
@@ -0,0 +1,132 @@
+"""Calcul des notes finales par lots (promotion, formation ou année entière).
+
+Les colonnes sont des séquences de même longueur ; les notes absentes valent None.
+Les résultats sont identiques à ceux de functions.calculate_final_grade_and_status,
+ligne par ligne. NumPy est utilisé s'il est installé, sinon le calcul se fait en Python pur ;
+il n'est importé qu'au premier calcul pour ne pas ralentir le démarrage de l'interface.
+"""
+
+from functions import calculate_final_grade_and_status
+
+np = None
+_numpy_checked = False
+
+VALIDATED = "Validée"
+NOT_VALIDATED = "Non validée"
+MISSING = "Défaillant"
+
+# Seuil en dessous duquel la note de rattrapage remplace la note de la matière.
+RESIT_THRESHOLD = 12
+DEFAULT_VALIDATION_GRADE = 12.0
+
+_STATUSES = (MISSING, NOT_VALIDATED, VALIDATED)
+
+
+def numpy_available():
+    """Importe NumPy au premier appel ; renvoie False s'il n'est pas installé."""
+    global np, _numpy_checked
+    if not _numpy_checked:
+        _numpy_checked = True
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        np = numpy
+    return np is not None
+
+
+def _use_numpy(requested):
+    """use_numpy=None ou True : NumPy s'il est installé (sinon Python pur) ; False : Python pur."""
+    return (requested is None or bool(requested)) and numpy_available()
+
+
+def _as_float_array(values):
+    return np.array([np.nan if value is None else value for value in values], dtype=float)
+
+
+def _compute_numpy(grade1, grade2, resit_grade, has_two_grades, validation_grade):
+    g1 = _as_float_array(grade1)
+    g2 = _as_float_array(grade2)
+    gr = _as_float_array(resit_grade)
+    two = np.array([bool(value) for value in has_two_grades], dtype=bool)
+    threshold = np.array([DEFAULT_VALIDATION_GRADE if value is None else value for value in validation_grade],
+                         dtype=float)
+
+    final = np.where(two, (g1 + g2) / 2, g1)
+    missing = np.isnan(final)
+    effective = np.where((final < RESIT_THRESHOLD) & ~np.isnan(gr), gr, final)
+    status_codes = np.where(missing, 0, np.where(effective >= threshold, 2, 1))
+
+    finals = [None if is_missing else value for value, is_missing in zip(effective.tolist(), missing.tolist())]
+    statuses = [_STATUSES[code] for code in status_codes.tolist()]
+    return finals, statuses
+
+
+def _compute_python(grade1, grade2, resit_grade, has_two_grades, validation_grade):
+    finals, statuses = [], []
+    for row in zip(grade1, grade2, resit_grade, has_two_grades, validation_grade):
+        final, status = calculate_final_grade_and_status(*row)
+        finals.append(final)
+        statuses.append(status)
+    return finals, statuses
+
+
+def compute_final_grades(grade1, grade2, resit_grade, has_two_grades, validation_grade, use_numpy=None):
+    """Renvoie (notes finales, statuts) pour toutes les lignes données en colonnes."""
+    if _use_numpy(use_numpy) and len(grade1):
+        return _compute_numpy(grade1, grade2, resit_grade, has_two_grades, validation_grade)
+    return _compute_python(grade1, grade2, resit_grade, has_two_grades, validation_grade)
+
+
+def summarize(keys, credits, finals, statuses, use_numpy=None):
+    """Regroupe les matières par clé (étudiant, semestre…).
+
+    Renvoie {clé: (moyenne pondérée par les crédits ou None, crédits, crédits validés)}.
+    Une matière sans note compte dans les crédits mais pas dans les points,
+    comme sur le bulletin.
+    """
+    use_numpy = _use_numpy(use_numpy)
+    codes, groups = [], {}
+    for key in keys:
+        codes.append(groups.setdefault(key, len(groups)))
+
+    if use_numpy and codes:
+        codes_array = np.array(codes, dtype=np.intp)
+        credits_array = np.array(credits, dtype=float)
+        points = np.array([0.0 if final is None else final for final in finals], dtype=float) * credits_array
+        validated = np.array([status == VALIDATED for status in statuses], dtype=bool)
+        # bincount additionne dans l'ordre des lignes : mêmes arrondis que la boucle Python.
+        total_points = np.bincount(codes_array, weights=points, minlength=len(groups)).tolist()
+        total_credits = np.bincount(codes_array, weights=credits_array, minlength=len(groups)).tolist()
+        validated_credits = np.bincount(codes_array, weights=np.where(validated, credits_array, 0.0),
+                                        minlength=len(groups)).tolist()
+    else:
+        total_points = [0] * len(groups)
+        total_credits = [0] * len(groups)
+        validated_credits = [0] * len(groups)
+        for code, credit, final, status in zip(codes, credits, finals, statuses):
+            total_credits[code] += credit
+            if final is not None:
+                total_points[code] += final * credit
+            if status == VALIDATED:
+                validated_credits[code] += credit
+
+    result = {}
+    for key, code in groups.items():
+        credit_sum = int(total_credits[code])
+        average = total_points[code] / total_credits[code] if credit_sum > 0 else None
+        result[key] = (average, credit_sum, int(validated_credits[code]))
+    return result
+
+
+def compute_cohort(rows, use_numpy=None):
+    """Calcule une cohorte à partir de lignes (clé, crédits, deux notes, note 1, note 2, rattrapage, note de validation).
+
+    Renvoie (notes finales, statuts, synthèse par clé).
+    """
+    if not rows:
+        return [], [], {}
+    keys, credits, has_two_grades, grade1, grade2, resit_grade, validation_grade = zip(*rows)
+    finals, statuses = compute_final_grades(grade1, grade2, resit_grade, has_two_grades, validation_grade,
+                                            use_numpy)
+    return finals, statuses, summarize(keys, credits, finals, statuses, use_numpy)
@@ -0,0 +1,158 @@
+from database import operation, read_cursor, write
+from results import refresh_results
+from tablefiles import TableFileError, cell_text, read_records
+import queries
+
+GRADE_COLUMNS = ("grade1", "grade2", "resit_grade")
+
+# En-têtes acceptés (en minuscules) pour chaque colonne d'un fichier de notes.
+COLUMN_ALIASES = {
+    'matricule': 'matricule',
+    'n° matricule': 'matricule',
+    'note 1': 'grade1',
+    'note1': 'grade1',
+    'grade1': 'grade1',
+    'note 2': 'grade2',
+    'note2': 'grade2',
+    'grade2': 'grade2',
+    'rattrapage': 'resit_grade',
+    'resit_grade': 'resit_grade',
+}
+
+# Une cellule vide dans un fichier importé laisse la note existante inchangée.
+GRADES_IMPORT_UPSERT = """
+    INSERT INTO grades (student_matricule, course_id, academic_year_id, grade1, grade2, resit_grade)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (student_matricule, course_id, academic_year_id) DO UPDATE SET
+        grade1 = COALESCE(excluded.grade1, grades.grade1),
+        grade2 = COALESCE(excluded.grade2, grades.grade2),
+        resit_grade = COALESCE(excluded.resit_grade, grades.resit_grade)
+"""
+
+# Enregistrement de notes saisies : les trois valeurs sont écrites telles quelles.
+GRADES_UPSERT = """
+    INSERT INTO grades (student_matricule, course_id, academic_year_id, grade1, grade2, resit_grade)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT (student_matricule, course_id, academic_year_id) DO UPDATE SET
+        grade1 = excluded.grade1,
+        grade2 = excluded.grade2,
+        resit_grade = excluded.resit_grade
+"""
+
+
+class GradeFileError(TableFileError):
+    """Fichier de notes illisible ou sans colonne matricule."""
+
+
+def parse_grade(text):
+    """Convertit une saisie en note (None si vide) ; lève ValueError hors de [0, 20]."""
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        value = float(text)
+    else:
+        text = str(text).strip()
+        if not text:
+            return None
+        value = float(text.replace(',', '.'))
+    if not (0 <= value <= 20):
+        raise ValueError(text)
+    return value
+
+
+def read_grade_file(path):
+    """Lit un fichier CSV ou XLSX de notes et renvoie les lignes (n° de ligne, {colonne: valeur})."""
+    try:
+        return list(read_records(path, COLUMN_ALIASES, {'matricule': "Matricule"}))
+    except TableFileError as e:
+        raise GradeFileError(str(e))
+
+
+def validate_grade_rows(rows, course, academic_year_id, known_matricules):
+    """Valide les lignes lues ; renvoie (paramètres prêts pour l'upsert, erreurs [(ligne, message)])."""
+    valid, errors, seen = [], [], set()
+    for line_number, values in rows:
+        matricule = cell_text(values.get('matricule', ''))
+        if matricule not in known_matricules:
+            errors.append((line_number, f"Matricule {matricule or '(vide)'} non inscrit dans cette formation pour cette année."))
+            continue
+        if matricule in seen:
+            errors.append((line_number, f"Matricule {matricule} présent plusieurs fois."))
+            continue
+        try:
+            grade1 = parse_grade(values.get('grade1'))
+            grade2 = parse_grade(values.get('grade2'))
+            resit_grade = parse_grade(values.get('resit_grade'))
+        except ValueError:
+            errors.append((line_number, "Les notes doivent être des nombres entre 0 et 20."))
+            continue
+        if grade2 is not None and not course['has_two_grades']:
+            errors.append((line_number, "Cette matière n'a qu'une seule note."))
+            continue
+        seen.add(matricule)
+        valid.append((matricule, course['id'], academic_year_id, grade1, grade2, resit_grade))
+    return valid, errors
+
+
+def load_grade_file(path, course, academic_year_id):
+    """Lit et valide un fichier de notes pour une matière et une année académique."""
+    rows = read_grade_file(path)
+    with read_cursor() as cursor:
+        cursor.execute("SELECT matricule FROM enrollments WHERE program_id = ? AND academic_year_id = ?",
+                       (course['program_id'], academic_year_id))
+        known_matricules = {matricule for (matricule,) in cursor}
+    return validate_grade_rows(rows, course, academic_year_id, known_matricules)
+
+
+@operation
+def upsert_imported_grades(cursor, valid_rows):
+    cursor.executemany(GRADES_IMPORT_UPSERT, valid_rows)
+    refresh_results(cursor, [row[0] for row in valid_rows])
+
+
+def save_imported_grades(valid_rows):
+    """Enregistre toutes les notes validées en une seule transaction."""
+    write(upsert_imported_grades, valid_rows)
+    return len(valid_rows)
+
+
+@operation
+def save_grade(cursor, matricule, course_id, academic_year_id, column, value):
+    """Enregistre une seule note (grade1, grade2 ou resit_grade) dans la transaction du curseur."""
+    if column not in GRADE_COLUMNS:
+        raise ValueError(f"Colonne inconnue : {column}.")
+    cursor.execute(queries.GRADE_CELL_UPSERT.format(column=column), (matricule, course_id, academic_year_id, value))
+    refresh_results(cursor, [matricule])
+
+
+@operation
+def upsert_course_grades(cursor, course_id, academic_year_id, changes):
+    cursor.executemany(GRADES_UPSERT, [(matricule, course_id, academic_year_id, g1, g2, gr)
+                                       for matricule, g1, g2, gr in changes])
+    refresh_results(cursor, [change[0] for change in changes])
+
+
+def save_grades(course_id, academic_year_id, changes):
+    """Enregistre en une transaction les notes [(matricule, note 1, note 2, rattrapage)] d'une matière."""
+    write(upsert_course_grades, course_id, academic_year_id, changes)
+    return len(changes)
+
+
+def load_cohort_grades(program_id, academic_year_id, year_of_study, course_ids):
+    """Notes d'une promotion en une requête : (matricule, nom, prénom, puis 3 notes par matière)."""
+    with read_cursor() as cursor:
+        cursor.execute(queries.cohort_grades_query(course_ids), (program_id, academic_year_id, year_of_study))
+        return cursor.fetchall()
+
+
+@operation
+def upsert_cohort_grades(cursor, academic_year_id, changes):
+    cursor.executemany(GRADES_UPSERT, [(matricule, course_id, academic_year_id, g1, g2, gr)
+                                       for matricule, course_id, g1, g2, gr in changes])
+    refresh_results(cursor, list(dict.fromkeys(change[0] for change in changes)))
+
+
+def save_cohort_grades(academic_year_id, changes):
+    """Enregistre en une transaction les notes [(matricule, matière, note 1, note 2, rattrapage)] d'une promotion."""
+    write(upsert_cohort_grades, academic_year_id, changes)
+    return len(changes)
@@ -0,0 +1,156 @@
+"""Inscriptions de rentrée en masse : création des nouveaux étudiants et de leurs inscriptions.
+
+Le fichier (Matricule, Nom, Prénom, Formation, Année académique, Année d'étude) est lu
+ligne à ligne et chaque ligne est contrôlée contre des ensembles chargés une fois
+(matricules existants, inscriptions des années concernées, formations, années) au lieu
+des quatre requêtes par étudiant d'enroll. Les lignes retenues sont ensuite enregistrées
+par executemany dans une seule transaction.
+
+    python3 cli.py rentree rentree.csv
+
+Un matricule déjà connu est simplement inscrit si le nom et le prénom concordent
+(ou sont laissés vides) ; sinon la ligne est refusée comme conflit.
+"""
+
+from database import operation, read_cursor, write
+from results import refresh_results
+from tablefiles import cell_text, read_records
+import queries
+
+INTAKE_COLUMNS = {
+    'matricule': 'matricule', 'n° matricule': 'matricule',
+    'nom': 'last_name', 'last_name': 'last_name',
+    'prénom': 'first_name', 'prenom': 'first_name', 'first_name': 'first_name',
+    'formation': 'program', 'program': 'program',
+    'année académique': 'academic_year', 'annee academique': 'academic_year', 'academic_year': 'academic_year',
+    "année d'étude": 'year_of_study', "annee d'etude": 'year_of_study', 'year_of_study': 'year_of_study',
+}
+INTAKE_REQUIRED = {
+    'matricule': "Matricule", 'program': "Formation", 'academic_year': "Année académique",
+    'year_of_study': "Année d'étude",
+}
+
+STUDENT_INSERT = "INSERT INTO students (matricule, last_name, first_name) VALUES (?, ?, ?)"
+
+
+class IntakeReport:
+    """Résultat du contrôle d'un fichier de rentrée ; les refus sont des listes [(ligne, message)]."""
+
+    def __init__(self):
+        self.new_students = []
+        self.enrollments = []
+        self.duplicates = []
+        self.conflicts = []
+        self.errors = []
+
+    @property
+    def rejected(self):
+        return sorted(self.duplicates + self.conflicts + self.errors)
+
+    def summary(self):
+        return (f"{len(self.new_students)} nouvel(aux) étudiant(s), {len(self.enrollments)} inscription(s), "
+                f"{len(self.duplicates)} doublon(s), {len(self.conflicts)} conflit(s), "
+                f"{len(self.errors)} ligne(s) invalide(s)")
+
+
+def _same_name(known, last_name, first_name):
+    known_last, known_first = known
+    return ((not last_name or last_name.casefold() == known_last.casefold())
+            and (not first_name or first_name.casefold() == known_first.casefold()))
+
+
+def _year_of_study(value):
+    try:
+        number = int(float(cell_text(value).replace(',', '.')))
+    except ValueError:
+        return None
+    return number if 1 <= number <= 10 else None
+
+
+def validate_intake(records, students, programs, years, enrolled_in):
+    """Contrôle les lignes (n° de ligne, {colonne: valeur}) d'un fichier de rentrée.
+
+    students associe les matricules existants à (nom, prénom) ; programs et years
+    associent un nom à son id ; enrolled_in(academic_year_id) renvoie l'ensemble des
+    matricules déjà inscrits cette année-là.
+    """
+    report = IntakeReport()
+    seen = {}
+    for line_number, values in records:
+        matricule, last_name, first_name, program, academic_year = (
+            cell_text(values.get(key)) for key in ('matricule', 'last_name', 'first_name', 'program', 'academic_year'))
+        if not matricule:
+            report.errors.append((line_number, "Le matricule est obligatoire."))
+            continue
+        if matricule in seen:
+            report.duplicates.append((line_number, f"Matricule {matricule} déjà présent ligne {seen[matricule]}."))
+            continue
+        seen[matricule] = line_number
+        program_id = programs.get(program)
+        if program_id is None:
+            report.errors.append((line_number, f"Formation inconnue : {program}."))
+            continue
+        academic_year_id = years.get(academic_year)
+        if academic_year_id is None:
+            report.errors.append((line_number, f"Année académique inconnue : {academic_year}."))
+            continue
+        year_of_study = _year_of_study(values.get('year_of_study'))
+        if year_of_study is None:
+            report.errors.append((line_number, "L'année d'étude doit être un entier entre 1 et 10."))
+            continue
+
+        known = students.get(matricule)
+        if known is None:
+            if not (last_name and first_name):
+                report.errors.append((line_number, f"Nom et prénom obligatoires pour le nouvel étudiant {matricule}."))
+                continue
+            report.new_students.append((matricule, last_name, first_name))
+        elif not _same_name(known, last_name, first_name):
+            report.conflicts.append((line_number, f"Le matricule {matricule} appartient déjà à "
+                                                  f"{known[0]} {known[1]}."))
+            continue
+        elif matricule in enrolled_in(academic_year_id):
+            report.conflicts.append((line_number, f"{matricule} est déjà inscrit pour l'année {academic_year}."))
+            continue
+        report.enrollments.append((matricule, academic_year_id, program_id, year_of_study))
+    return report
+
+
+def load_intake_file(path):
+    """Lit et contrôle un fichier de rentrée ; lève TableFileError si le fichier est illisible."""
+    records = read_records(path, INTAKE_COLUMNS, INTAKE_REQUIRED)
+    with read_cursor() as cursor:
+        cursor.execute("SELECT matricule, last_name, first_name FROM students")
+        students = {matricule: (last_name, first_name) for matricule, last_name, first_name in cursor}
+        cursor.execute("SELECT name, id FROM programs")
+        programs = dict(cursor.fetchall())
+        cursor.execute("SELECT name, id FROM academic_years")
+        years = dict(cursor.fetchall())
+        enrolled = {}
+
+        def enrolled_in(academic_year_id):
+            if academic_year_id not in enrolled:
+                cursor.execute("SELECT matricule FROM enrollments WHERE academic_year_id = ?", (academic_year_id,))
+                enrolled[academic_year_id] = {matricule for (matricule,) in cursor}
+            return enrolled[academic_year_id]
+
+        return validate_intake(records, students, programs, years, enrolled_in)
+
+
+@operation
+def insert_intake(cursor, new_students, enrollments):
+    cursor.executemany(STUDENT_INSERT, new_students)
+    cursor.executemany(queries.ENROLLMENT_INSERT, enrollments)
+    # Les nouveaux étudiants n'ont pas encore de notes : seuls les anciens ont des résultats à recalculer.
+    created = {student[0] for student in new_students}
+    refresh_results(cursor, [row[0] for row in enrollments if row[0] not in created])
+
+
+def save_intake(report):
+    """Crée les étudiants et les inscriptions retenus en une transaction ; renvoie le nombre d'inscriptions.
+
+    Si un autre poste a créé entre-temps l'un des matricules, sqlite3.IntegrityError
+    est levée et rien n'est enregistré.
+    """
+    write(insert_intake, report.new_students, report.enrollments)
+    return len(report.enrollments)
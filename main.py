@@ -1,23 +1,37 @@
-from Dialogs import *
-from functions import *
-from Windows import *
+import startup  # en premier : l'heure de lancement est notée avant l'import de Qt
+from database import close_all, use_service
+import multiprocessing
+import os
 import sys
-from PySide6.QtWidgets import QApplication
 
 DB_NAME = "gestion_scolaire.db"
 
 
-
+def login_screen_ready():
+    startup.mark('login_screen')
+    startup.report("lancement -> écran de connexion", None, 'login_screen')
 
 
 def main():
+    # Qt est importé ici et non au niveau du module : les processus de rendu des bulletins
+    # (multiprocessing, méthode spawn) réimportent ce module sans charger Qt.
+    from PySide6.QtCore import QTimer
+    from PySide6.QtGui import QFont
+    from PySide6.QtWidgets import QApplication
+
     app = QApplication(sys.argv)
     font = QFont("Segoe UI", 10)
     app.setFont(font)
+    app.aboutToQuit.connect(close_all)
+    # Base partagée : adresse du service lancé par service.py (sinon, fichier local).
+    use_service(os.environ.get("GESTION_SCOLAIRE_API"))
 
+    from Windows import MainWindow
     window = MainWindow()
     window.show()
+    QTimer.singleShot(0, login_screen_ready)
     sys.exit(app.exec())
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
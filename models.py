@@ -0,0 +1,448 @@
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex, Signal
+from PySide6.QtGui import QColor
+
+from functions import calculate_final_grade_and_status
+import queries
+
+# Nombre de lignes ajoutées à la vue à chaque fetchMore.
+PAGE_SIZE = 200
+
+
+class LazyQueryModel(QAbstractTableModel):
+    """Modèle de table en lecture seule dont les lignes sont exposées à la vue page par page.
+
+    Les lignes arrivent par paquets (append_rows, depuis un QueryLoader) et sont
+    gardées sous forme de tuples ; la vue ne les découvre qu'au fil du défilement
+    via canFetchMore/fetchMore, sans aucun objet créé par cellule.
+
+    Avec un pager (workers.KeysetPager), fetchMore demande la page suivante à la
+    base au lieu de puiser dans les lignes déjà reçues, et les colonnes de
+    sort_keys peuvent être triées côté serveur (set_sort).
+    """
+
+    def __init__(self, headers, parent=None, sort_keys=None, sort_column=None):
+        super().__init__(parent)
+        self.headers = headers
+        self._rows = []
+        self._pending = []
+        self._pending_pos = 0
+        self.pager = None
+        self.sort_keys = sort_keys or {}
+        self.sort_column = sort_column
+        self.sort_order = Qt.AscendingOrder
+
+    def set_pager(self, pager):
+        self.pager = pager
+        pager.rows_ready.connect(self.append_rows)
+
+    def set_sort(self, column, order):
+        """Change le tri demandé ; renvoie False si la colonne n'est pas triable."""
+        if column not in self.sort_keys:
+            return False
+        self.sort_column = column
+        self.sort_order = order
+        return True
+
+    def sort_query_keys(self):
+        """Renvoie (clés de tri SQL, ordre décroissant ?) pour le tri courant."""
+        return self.sort_keys[self.sort_column], self.sort_order == Qt.DescendingOrder
+
+    def append_rows(self, rows):
+        """Ajoute des lignes reçues ; la première page (ou chaque page du pager) est affichée immédiatement."""
+        self._pending.extend(rows)
+        if len(self._rows) < PAGE_SIZE or self.pager is not None:
+            self.fetchMore()
+
+    def set_rows(self, rows, headers=None):
+        """Remplace le contenu par des lignes déjà calculées, et les colonnes si headers est donné."""
+        self.beginResetModel()
+        if headers is not None:
+            self.headers = headers
+        self._rows = list(rows)
+        self._pending = []
+        self._pending_pos = 0
+        self.endResetModel()
+
+    def clear(self):
+        self.set_rows([])
+
+    def row_data(self, row):
+        """Renvoie la ligne brute (tuple de la requête) à l'indice donné."""
+        return self._rows[row]
+
+    def find_row(self, key):
+        """Renvoie la ligne dont la première colonne vaut key, ou None (lignes en attente comprises)."""
+        for row_data in self._rows:
+            if row_data[0] == key:
+                return row_data
+        for position in range(self._pending_pos, len(self._pending)):
+            if self._pending[position][0] == key:
+                return self._pending[position]
+        return None
+
+    def replace_row(self, key, new_row):
+        """Remplace la ligne de clé key ; renvoie False si elle n'est pas chargée."""
+        for position, row_data in enumerate(self._rows):
+            if row_data[0] == key:
+                self._rows[position] = new_row
+                self.dataChanged.emit(self.index(position, 0), self.index(position, self.columnCount() - 1))
+                return True
+        for position in range(self._pending_pos, len(self._pending)):
+            if self._pending[position][0] == key:
+                self._pending[position] = new_row
+                return True
+        return False
+
+    def remove_row(self, key):
+        for position, row_data in enumerate(self._rows):
+            if row_data[0] == key:
+                self.beginRemoveRows(QModelIndex(), position, position)
+                del self._rows[position]
+                self.endRemoveRows()
+                return
+        for position in range(self._pending_pos, len(self._pending)):
+            if self._pending[position][0] == key:
+                del self._pending[position]
+                return
+
+    def display_value(self, row_data, column):
+        value = row_data[column]
+        return "" if value is None else str(value)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.DisplayRole:
+            return self.display_value(self._rows[index.row()], index.column())
+        if role == Qt.UserRole:
+            return self._rows[index.row()]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return False
+        if self._pending_pos < len(self._pending):
+            return True
+        return self.pager is not None and self.pager.can_fetch_more()
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        page = self._pending[self._pending_pos:self._pending_pos + PAGE_SIZE]
+        if not page:
+            if self.pager is not None:
+                self.pager.fetch_more()
+            return
+        self._pending_pos += len(page)
+        if self._pending_pos == len(self._pending):
+            self._pending = []
+            self._pending_pos = 0
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self._rows.extend(page)
+        self.endInsertRows()
+
+
+class StudentsTableModel(LazyQueryModel):
+    """Liste des étudiants (matricule, nom, prénom, formation, année académique, année d'étude)."""
+
+    def __init__(self, parent=None):
+        super().__init__(["N° Matricule", "Nom", "Prénom", "Formation", "Année Académique", "Année d'Étude"], parent,
+                         sort_keys=queries.STUDENTS_SORT_KEYS, sort_column=1)
+
+    def display_value(self, row_data, column):
+        value = row_data[column]
+        if column == 3:
+            return value or "Non inscrit"
+        if column in (4, 5):
+            return str(value) if value else "-"
+        return value
+
+
+class GradesTableModel(LazyQueryModel):
+    """Notes des étudiants pour une matière ; les colonnes de notes sont éditables.
+
+    Une modification émet grade_edited(ligne, colonne, texte) ; c'est au
+    contrôleur de valider et d'enregistrer la note puis d'appeler set_grade,
+    ou stage_grade pour la garder en mémoire jusqu'à l'enregistrement groupé.
+    """
+
+    grade_edited = Signal(int, int, str)
+
+    GRADE_COLUMNS = {2: 3, 3: 4, 4: 5}  # colonne affichée -> position dans la ligne
+
+    def __init__(self, parent=None):
+        super().__init__(["Matricule", "Étudiant", "Note 1", "Note 2", "Rattrapage", "Moyenne/Finale", "Statut"], parent,
+                         sort_keys=queries.GRADES_SORT_KEYS, sort_column=1)
+        self.course_data = None
+        self.validation_grade = None
+        self.academic_year_id = None
+        self._original = {}  # ligne modifiée -> ligne telle que chargée
+        self._undo = []      # (ligne, colonne, ancienne valeur)
+
+    def set_rows(self, rows):
+        self._original = {}
+        self._undo = []
+        super().set_rows(rows)
+
+    def set_course(self, course_data, validation_grade, academic_year_id):
+        self.course_data = course_data
+        self.validation_grade = validation_grade
+        self.academic_year_id = academic_year_id
+
+    def final_grade_and_status(self, row_data):
+        _, _, _, g1, g2, gr = row_data
+        return calculate_final_grade_and_status(g1, g2, gr, self.course_data['has_two_grades'], self.validation_grade)
+
+    def display_value(self, row_data, column):
+        if column == 0:
+            return row_data[0]
+        if column == 1:
+            return f"{row_data[1].upper()} {row_data[2]}"
+        if column in self.GRADE_COLUMNS:
+            value = row_data[self.GRADE_COLUMNS[column]]
+            return str(value) if value is not None else ""
+        final_grade, status = self.final_grade_and_status(row_data)
+        if column == 5:
+            return f"{final_grade:.2f}" if final_grade is not None else "-"
+        return status
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and role == Qt.EditRole:
+            return self.display_value(self._rows[index.row()], index.column())
+        if (index.isValid() and role == Qt.BackgroundRole and index.column() == 3
+                and not self.course_data['has_two_grades']):
+            return QColor('lightgray')
+        if (index.isValid() and role == Qt.BackgroundRole and index.row() in self._original
+                and index.column() in self.GRADE_COLUMNS):
+            position = self.GRADE_COLUMNS[index.column()]
+            if self._rows[index.row()][position] != self._original[index.row()][position]:
+                return QColor('#fff3cd')
+        return super().data(index, role)
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if not index.isValid():
+            return flags
+        column = index.column()
+        if column in (2, 4) or (column == 3 and self.course_data['has_two_grades']):
+            return flags | Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole or index.column() not in self.GRADE_COLUMNS:
+            return False
+        self.grade_edited.emit(index.row(), index.column(), str(value))
+        return True
+
+    def set_grade(self, row, column, value):
+        """Met à jour une note affichée et recalcule la moyenne et le statut de la ligne."""
+        row_data = list(self._rows[row])
+        row_data[self.GRADE_COLUMNS[column]] = value
+        self._rows[row] = tuple(row_data)
+        self.dataChanged.emit(self.index(row, column), self.index(row, 6))
+
+    def stage_grade(self, row, column, value):
+        """Modifie une note en mémoire seulement (saisie groupée), annulable par undo."""
+        old_value = self._rows[row][self.GRADE_COLUMNS[column]]
+        if old_value == value:
+            return
+        self._original.setdefault(row, self._rows[row])
+        self._undo.append((row, column, old_value))
+        self.set_grade(row, column, value)
+
+    def undo(self):
+        """Annule la dernière note modifiée en mémoire."""
+        if not self._undo:
+            return
+        row, column, old_value = self._undo.pop()
+        self.set_grade(row, column, old_value)
+        if self._rows[row] == self._original.get(row):
+            del self._original[row]
+
+    def discard_changes(self):
+        """Rétablit toutes les notes telles qu'elles ont été chargées."""
+        for row, original in self._original.items():
+            self._rows[row] = original
+            self.dataChanged.emit(self.index(row, 2), self.index(row, 6))
+        self._original = {}
+        self._undo = []
+
+    def has_changes(self):
+        return bool(self._original)
+
+    def pending_changes(self):
+        """Renvoie les lignes modifiées : (matricule, note 1, note 2, rattrapage)."""
+        return [(self._rows[row][0],) + tuple(self._rows[row][3:6])
+                for row in sorted(self._original) if self._rows[row] != self._original[row]]
+
+    def mark_saved(self):
+        """Les modifications en mémoire viennent d'être enregistrées."""
+        rows = list(self._original)
+        self._original = {}
+        self._undo = []
+        for row in rows:
+            self.dataChanged.emit(self.index(row, 2), self.index(row, 4))
+
+
+class CohortGradesModel(LazyQueryModel):
+    """Notes d'une promotion : une ligne par étudiant, les notes de chaque matière en colonnes.
+
+    Les lignes sont celles de queries.cohort_grades_query (matricule, nom, prénom, puis
+    note 1, note 2 et rattrapage de chaque matière). Comme dans GradesTableModel, une
+    modification émet grade_edited ; le contrôleur la garde en mémoire avec stage_grade
+    jusqu'à l'enregistrement de pending_changes en une transaction.
+    """
+
+    grade_edited = Signal(int, int, str)
+
+    FIELDS = ("Note 1", "Note 2", "Ratt.")
+
+    def __init__(self, parent=None):
+        super().__init__(["Matricule", "Étudiant"], parent)
+        self.courses = []
+        self.grade_columns = {}  # colonne affichée -> (indice de la matière, position dans la ligne)
+        self._original = {}
+        self._undo = []
+
+    def set_cohort(self, courses, rows):
+        """Affiche les lignes chargées pour les matières courses (dicts id, name, has_two_grades, validation_grade)."""
+        headers, grade_columns = ["Matricule", "Étudiant"], {}
+        for course_index, course in enumerate(courses):
+            for field, label in enumerate(self.FIELDS):
+                if field == 1 and not course['has_two_grades']:
+                    continue
+                grade_columns[len(headers)] = (course_index, 3 + 3 * course_index + field)
+                headers.append(f"{course['name']}\n{label}")
+        # Colonnes et lignes changent dans la même réinitialisation du modèle.
+        self.beginResetModel()
+        self.courses = courses
+        self.grade_columns = grade_columns
+        self.headers = headers
+        self._original = {}
+        self._undo = []
+        self._rows = list(rows)
+        self._pending = []
+        self._pending_pos = 0
+        self.endResetModel()
+
+    def course_grades(self, row_data, course_index):
+        """(note 1, note 2, rattrapage) d'une matière dans une ligne."""
+        return row_data[3 + 3 * course_index:6 + 3 * course_index]
+
+    def display_value(self, row_data, column):
+        if column == 0:
+            return row_data[0]
+        if column == 1:
+            return f"{row_data[1].upper()} {row_data[2]}"
+        value = row_data[self.grade_columns[column][1]]
+        return str(value) if value is not None else ""
+
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid() and index.column() in self.grade_columns:
+            course_index, position = self.grade_columns[index.column()]
+            row_data = self._rows[index.row()]
+            if role == Qt.EditRole:
+                return self.display_value(row_data, index.column())
+            if role == Qt.ToolTipRole:
+                course = self.courses[course_index]
+                final_grade, status = calculate_final_grade_and_status(
+                    *self.course_grades(row_data, course_index), course['has_two_grades'], course['validation_grade'])
+                grade_text = f"{final_grade:.2f} - " if final_grade is not None else ""
+                return f"{course['name']} : {grade_text}{status}"
+            if (role == Qt.BackgroundRole and index.row() in self._original
+                    and row_data[position] != self._original[index.row()][position]):
+                return QColor('#fff3cd')
+        return super().data(index, role)
+
+    def flags(self, index):
+        flags = super().flags(index)
+        if index.isValid() and index.column() in self.grade_columns:
+            return flags | Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole or index.column() not in self.grade_columns:
+            return False
+        self.grade_edited.emit(index.row(), index.column(), str(value))
+        return True
+
+    def _set_grade(self, row, column, value):
+        row_data = list(self._rows[row])
+        row_data[self.grade_columns[column][1]] = value
+        self._rows[row] = tuple(row_data)
+        self.dataChanged.emit(self.index(row, column), self.index(row, column))
+
+    def stage_grade(self, row, column, value):
+        """Modifie une note en mémoire, annulable par undo."""
+        old_value = self._rows[row][self.grade_columns[column][1]]
+        if old_value == value:
+            return
+        self._original.setdefault(row, self._rows[row])
+        self._undo.append((row, column, old_value))
+        self._set_grade(row, column, value)
+
+    def undo(self):
+        """Annule la dernière note modifiée en mémoire."""
+        if not self._undo:
+            return
+        row, column, old_value = self._undo.pop()
+        self._set_grade(row, column, old_value)
+        if self._rows[row] == self._original.get(row):
+            del self._original[row]
+
+    def discard_changes(self):
+        """Rétablit toutes les notes telles qu'elles ont été chargées."""
+        for row, original in self._original.items():
+            self._rows[row] = original
+            self.dataChanged.emit(self.index(row, 2), self.index(row, self.columnCount() - 1))
+        self._original = {}
+        self._undo = []
+
+    def has_changes(self):
+        return bool(self._original)
+
+    def pending_changes(self):
+        """Renvoie les notes modifiées : (matricule, matière, note 1, note 2, rattrapage)."""
+        changes = []
+        for row in sorted(self._original):
+            row_data, original = self._rows[row], self._original[row]
+            for course_index, course in enumerate(self.courses):
+                grades = self.course_grades(row_data, course_index)
+                if grades != self.course_grades(original, course_index):
+                    changes.append((row_data[0], course['id']) + tuple(grades))
+        return changes
+
+    def mark_saved(self):
+        """Les modifications en mémoire viennent d'être enregistrées."""
+        rows = list(self._original)
+        self._original = {}
+        self._undo = []
+        for row in rows:
+            self.dataChanged.emit(self.index(row, 2), self.index(row, self.columnCount() - 1))
+
+
+class BulletinTableModel(LazyQueryModel):
+    """Lignes du bulletin : (semestre, matière, note finale, observation, crédits)."""
+
+    def __init__(self, parent=None):
+        super().__init__(["Semestre", "Unités d'Enseignement", "Note Finale", "Observation", "Crédits"], parent)
+
+    def display_value(self, row_data, column):
+        value = row_data[column]
+        if column == 0:
+            return f"Semestre {value}"
+        if column == 2:
+            return f"{value:.2f}" if value is not None else "-"
+        return str(value)
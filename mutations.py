@@ -0,0 +1,118 @@
+"""Écritures des onglets de référence, des étudiants et des comptes : une opération nommée par action.
+
+Chaque fonction reçoit le curseur de la transaction puis des arguments simples ;
+elles s'exécutent avec database.write ou submit_write, en local comme à travers le
+service (qui les exécute lui-même, voir database.operation).
+"""
+
+from database import operation
+from results import refresh_results, students_of_course, students_of_department, students_of_program
+
+
+@operation
+def add_academic_year(cursor, name, start_year, end_year):
+    cursor.execute("INSERT INTO academic_years (name, start_year, end_year) VALUES (?, ?, ?)",
+                   (name, start_year, end_year))
+
+
+@operation
+def update_academic_year(cursor, academic_year_id, name, start_year, end_year):
+    cursor.execute("UPDATE academic_years SET name = ?, start_year = ?, end_year = ? WHERE id = ?",
+                   (name, start_year, end_year, academic_year_id))
+
+
+@operation
+def delete_academic_year(cursor, academic_year_id):
+    cursor.execute("DELETE FROM academic_years WHERE id = ?", (academic_year_id,))
+
+
+@operation
+def add_department(cursor, name, validation_grade):
+    cursor.execute("INSERT INTO departments (name, validation_grade) VALUES (?, ?)", (name, validation_grade))
+
+
+@operation
+def update_department(cursor, department_id, name, validation_grade):
+    cursor.execute("UPDATE departments SET name = ?, validation_grade = ? WHERE id = ?",
+                   (name, validation_grade, department_id))
+    refresh_results(cursor, students_of_department(cursor, department_id))
+
+
+@operation
+def delete_department(cursor, department_id):
+    affected = students_of_department(cursor, department_id)
+    cursor.execute("DELETE FROM departments WHERE id = ?", (department_id,))
+    refresh_results(cursor, affected)
+
+
+@operation
+def add_program(cursor, name, duration_years, department_id):
+    cursor.execute("INSERT INTO programs (name, duration_years, department_id) VALUES (?, ?, ?)",
+                   (name, duration_years, department_id))
+
+
+@operation
+def update_program(cursor, program_id, name, duration_years, department_id):
+    cursor.execute("UPDATE programs SET name = ?, duration_years = ?, department_id = ? WHERE id = ?",
+                   (name, duration_years, department_id, program_id))
+    refresh_results(cursor, students_of_program(cursor, program_id))
+
+
+@operation
+def delete_program(cursor, program_id):
+    affected = students_of_program(cursor, program_id)
+    cursor.execute("DELETE FROM programs WHERE id = ?", (program_id,))
+    refresh_results(cursor, affected)
+
+
+@operation
+def add_student(cursor, matricule, last_name, first_name):
+    cursor.execute("INSERT INTO students (matricule, last_name, first_name) VALUES (?, ?, ?)",
+                   (matricule, last_name, first_name))
+
+
+@operation
+def update_student(cursor, matricule, last_name, first_name):
+    cursor.execute("UPDATE students SET last_name = ?, first_name = ? WHERE matricule = ?",
+                   (last_name, first_name, matricule))
+
+
+@operation
+def delete_student(cursor, matricule):
+    cursor.execute("DELETE FROM students WHERE matricule = ?", (matricule,))
+
+
+@operation
+def add_course(cursor, name, credits, semester, program_id, year_of_study, has_two_grades):
+    cursor.execute("INSERT INTO courses (name, credits, semester, program_id, year_of_study, has_two_grades) "
+                   "VALUES (?, ?, ?, ?, ?, ?)", (name, credits, semester, program_id, year_of_study, has_two_grades))
+
+
+@operation
+def update_course(cursor, course_id, name, credits, semester, has_two_grades):
+    cursor.execute("UPDATE courses SET name = ?, credits = ?, semester = ?, has_two_grades = ? WHERE id = ?",
+                   (name, credits, semester, has_two_grades, course_id))
+    refresh_results(cursor, students_of_course(cursor, course_id))
+
+
+@operation
+def delete_course(cursor, course_id):
+    affected = students_of_course(cursor, course_id)
+    cursor.execute("DELETE FROM courses WHERE id = ?", (course_id,))
+    refresh_results(cursor, affected)
+
+
+@operation
+def change_password(cursor, user_id, old_hash, new_hash):
+    """Renvoie False si l'ancien mot de passe est incorrect (les empreintes sont calculées par l'appelant)."""
+    cursor.execute("SELECT password_hash FROM users WHERE id = ?", (user_id,))
+    row = cursor.fetchone()
+    if row is None or row[0] != old_hash:
+        return False
+    cursor.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_hash, user_id))
+    return True
+
+
+@operation
+def reset_password(cursor, user_id, new_hash):
+    cursor.execute("UPDATE users SET password_hash = ? WHERE id = ?", (new_hash, user_id))
@@ -0,0 +1,76 @@
+"""Écriture de documents PDF simples (texte, traits, fonds gris) sans dépendance externe.
+
+Les pages sont décrites par leur flux de contenu, ce qui permet de les produire
+dans des processus séparés puis de les assembler en un ou plusieurs fichiers.
+"""
+
+# Format A4 en points.
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+
+_FONTS = {False: b"F1", True: b"F2"}
+
+
+def _escape(text):
+    data = str(text).encode('cp1252', errors='replace')
+    return data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def text_width(text, size):
+    """Largeur approximative d'un texte en Helvetica (pour centrer ou aligner à droite)."""
+    return len(str(text)) * size * 0.5
+
+
+class PageCanvas:
+    """Flux de contenu d'une page ; l'origine est en bas à gauche."""
+
+    def __init__(self):
+        self._ops = []
+
+    def text(self, x, y, text, size=10, bold=False):
+        self._ops.append(b"BT /%s %d Tf %.2f %.2f Td (%s) Tj ET" % (_FONTS[bold], size, x, y, _escape(text)))
+
+    def line(self, x1, y1, x2, y2, width=0.5):
+        self._ops.append(b"%.2f w %.2f %.2f m %.2f %.2f l S" % (width, x1, y1, x2, y2))
+
+    def fill_rect(self, x, y, width, height, gray=0.9):
+        self._ops.append(b"q %.2f g %.2f %.2f %.2f %.2f re f Q" % (gray, x, y, width, height))
+
+    def content(self):
+        return b"\n".join(self._ops)
+
+
+def build_pdf(pages):
+    """Assemble les flux de contenu des pages en un document PDF (bytes)."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # arbre des pages, complété une fois les pages numérotées
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>",
+    ]
+    page_refs = []
+    for content in pages:
+        page_number = len(objects) + 1
+        page_refs.append(b"%d 0 R" % page_number)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+                       b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+                       % (PAGE_WIDTH, PAGE_HEIGHT, page_number + 1))
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(page_refs), len(page_refs))
+
+    output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        output += b"%010d 00000 n \n" % offset
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(output)
+
+
+def write_pdf(path, pages):
+    with open(path, 'wb') as f:
+        f.write(build_pdf(pages))
@@ -0,0 +1,243 @@
+"""Mesure de chaque requête SQL : texte, forme des paramètres, lignes, durée et appelant.
+
+Les curseurs fournis par database.py sont enveloppés dans ProfiledCursor. La durée
+d'une requête additionne l'exécution et la lecture de ses lignes ; le rappel de trace
+de sqlite3 compte les instructions réellement exécutées (déclencheurs compris).
+Les requêtes plus lentes que SLOW_QUERY_MS sont écrites dans un journal tournant ;
+summary() fournit les médianes et 95e centiles par appelant (fenêtre Diagnostics).
+
+    GESTION_SCOLAIRE_SLOW_MS=50 python3 main.py
+
+Les valeurs des paramètres (noms, notes…) ne sont jamais enregistrées, seulement leur type.
+"""
+
+import logging
+import logging.handlers
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+
+# Seuil (ms) au-delà duquel une requête est écrite dans le journal des requêtes lentes.
+SLOW_QUERY_MS = float(os.environ.get("GESTION_SCOLAIRE_SLOW_MS") or 100)
+SLOW_QUERY_LOG = "requetes_lentes.log"
+SLOW_QUERY_LOG_SIZE = 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 3
+# Durées conservées par appelant pour le calcul des centiles.
+SAMPLES_PER_SITE = 1000
+
+# Modules traversés par une requête sans en être l'appelant.
+_PLUMBING = {"profiling.py", "database.py", "workers.py", "reference.py", "service_client.py",
+             "contextlib.py", "threading.py"}
+
+_local = threading.local()
+_lock = threading.Lock()
+_sites = {}
+_slow_log = None
+
+
+def call_site(default="?"):
+    """Nom qualifié de la première fonction de l'application qui a demandé la requête."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if os.path.basename(code.co_filename) not in _PLUMBING:
+            return getattr(code, "co_qualname", code.co_name)
+        frame = frame.f_back
+    return default
+
+
+def param_shape(params):
+    """Types des paramètres, répétitions regroupées : « (str, int×2) »."""
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{name}: {type(value).__name__}" for name, value in params.items()) + "}"
+    runs = []
+    for value in params:
+        name = type(value).__name__
+        if runs and runs[-1][0] == name:
+            runs[-1][1] += 1
+        else:
+            runs.append([name, 1])
+    return "(" + ", ".join(name if count == 1 else f"{name}×{count}" for name, count in runs) + ")"
+
+
+def _compact(sql):
+    return re.sub(r"\s+", " ", sql).strip()
+
+
+def trace(statement):
+    """Rappel de trace des connexions (sqlite3 set_trace_callback)."""
+    measure = getattr(_local, "measure", None)
+    if measure is not None:
+        measure.statements += 1
+
+
+class _Measure:
+    __slots__ = ("site", "sql", "shape", "seconds", "rows", "statements")
+
+    def __init__(self, site, sql, shape):
+        self.site = site
+        self.sql = sql
+        self.shape = shape
+        self.seconds = 0.0
+        self.rows = 0
+        self.statements = 0
+
+
+class ProfiledCursor:
+    """Curseur chronométré ; les autres attributs (rowcount, connection…) sont ceux du curseur enveloppé."""
+
+    def __init__(self, cursor, site):
+        self._cursor = cursor
+        self.site = site
+        self._measure = None
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _run(self, method, *args):
+        measure = self._measure
+        if measure is None:
+            return method(*args)
+        _local.measure = measure
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            measure.seconds += time.perf_counter() - start
+            _local.measure = None
+
+    def execute(self, sql, params=()):
+        self.finish()
+        self._measure = _Measure(self.site, sql, param_shape(params))
+        self._run(self._cursor.execute, sql, params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self.finish()
+        seq_of_params = list(seq_of_params)
+        shape = f"{len(seq_of_params)} × {param_shape(seq_of_params[0])}" if seq_of_params else "0 ×"
+        self._measure = _Measure(self.site, sql, shape)
+        self._run(self._cursor.executemany, sql, seq_of_params)
+        return self
+
+    def _count(self, rows):
+        if self._measure is not None:
+            self._measure.rows += rows
+
+    def fetchone(self):
+        row = self._run(self._cursor.fetchone)
+        self._count(row is not None)
+        return row
+
+    def fetchmany(self, size=1):
+        rows = self._run(self._cursor.fetchmany, size)
+        self._count(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = self._run(self._cursor.fetchall)
+        self._count(len(rows))
+        return rows
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(500)
+            if not rows:
+                return
+            yield from rows
+
+    def finish(self):
+        """Enregistre la requête en cours (appelé avant la suivante et à la fermeture)."""
+        measure, self._measure = self._measure, None
+        if measure is not None:
+            if not measure.rows:
+                measure.rows = max(self._cursor.rowcount, 0)
+            record(measure)
+
+    def close(self):
+        self.finish()
+        self._cursor.close()
+
+
+def profiled(work, site):
+    """Enveloppe work(cursor, *args) pour que ses requêtes soient mesurées au nom de site."""
+    def run(cursor, *args):
+        cursor = ProfiledCursor(cursor, site)
+        try:
+            return work(cursor, *args)
+        finally:
+            cursor.finish()
+
+    return run
+
+
+class _SiteStats:
+    __slots__ = ("count", "rows", "durations", "max_ms", "slowest_sql")
+
+    def __init__(self):
+        self.count = 0
+        self.rows = 0
+        self.durations = deque(maxlen=SAMPLES_PER_SITE)
+        self.max_ms = 0.0
+        self.slowest_sql = ""
+
+
+def record(measure):
+    milliseconds = measure.seconds * 1000
+    with _lock:
+        stats = _sites.get(measure.site)
+        if stats is None:
+            stats = _sites[measure.site] = _SiteStats()
+        stats.count += 1
+        stats.rows += measure.rows
+        stats.durations.append(milliseconds)
+        if milliseconds >= stats.max_ms:
+            stats.max_ms = milliseconds
+            stats.slowest_sql = measure.sql
+    if milliseconds >= SLOW_QUERY_MS:
+        _log_slow(measure, milliseconds)
+
+
+def _log_slow(measure, milliseconds):
+    global _slow_log
+    with _lock:
+        if _slow_log is None:
+            handler = logging.handlers.RotatingFileHandler(SLOW_QUERY_LOG, maxBytes=SLOW_QUERY_LOG_SIZE,
+                                                           backupCount=SLOW_QUERY_LOG_BACKUPS,
+                                                           encoding="utf-8", delay=True)
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            _slow_log = logging.getLogger("gestion_scolaire.requetes_lentes")
+            _slow_log.propagate = False
+            _slow_log.addHandler(handler)
+            _slow_log.setLevel(logging.INFO)
+    _slow_log.info("%.1f ms | %s | %d ligne(s) | %d instruction(s) | %s | %s", milliseconds, measure.site,
+                   measure.rows, measure.statements, measure.shape, _compact(measure.sql))
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def summary():
+    """Statistiques par appelant, la plus lente (p95) d'abord."""
+    with _lock:
+        items = [(site, stats.count, stats.rows, sorted(stats.durations), stats.max_ms, stats.slowest_sql)
+                 for site, stats in _sites.items()]
+    report = [{
+        'site': site,
+        'count': count,
+        'rows': rows / count,
+        'p50_ms': _percentile(durations, 0.5),
+        'p95_ms': _percentile(durations, 0.95),
+        'max_ms': max_ms,
+        'slowest_sql': _compact(slowest_sql),
+    } for site, count, rows, durations, max_ms, slowest_sql in items]
+    return sorted(report, key=lambda line: line['p95_ms'], reverse=True)
+
+
+def reset():
+    with _lock:
+        _sites.clear()
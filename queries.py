@@ -0,0 +1,265 @@
+"""Requêtes SQL des écrans les plus sollicités.
+
+Elles sont regroupées ici pour que l'interface et la vérification des plans
+d'exécution (database.check_query_plans) utilisent exactement le même texte.
+"""
+
+# Chaque étudiant avec sa dernière inscription (année académique la plus récente) ;
+# MAX(lay.start_year) choisit la ligne dont academic_year_id est lu, sans tri par étudiant.
+STUDENTS = """
+    SELECT s.matricule, s.last_name, s.first_name, p.name, ay.name, e.year_of_study
+    FROM students s
+    LEFT JOIN enrollments e ON e.matricule = s.matricule AND e.academic_year_id = (
+        SELECT academic_year_id FROM (
+            SELECT le.academic_year_id, MAX(lay.start_year)
+            FROM enrollments le
+            JOIN academic_years lay ON le.academic_year_id = lay.id
+            WHERE le.matricule = s.matricule
+        )
+    )
+    LEFT JOIN programs p ON e.program_id = p.id
+    LEFT JOIN academic_years ay ON e.academic_year_id = ay.id
+"""
+# Filtres d'une page : les étudiants sont parcourus dans l'ordre de l'index du tri et chaque
+# ligne est testée (inscrit au moins une année dans la formation ; trouvé par la recherche).
+# Le + de +s.rowid empêche SQLite de partir des résultats de la recherche, qu'il faudrait trier.
+STUDENTS_PROGRAM_FILTER = "EXISTS (SELECT 1 FROM enrollments f WHERE f.matricule = s.matricule AND f.program_id = ?)"
+STUDENTS_SEARCH_FILTER = "+s.rowid IN (SELECT rowid FROM students_fts WHERE students_fts MATCH ?)"
+STUDENTS_COUNT = "SELECT COUNT(*) FROM students s"
+# Le comptage n'a pas d'ordre à respecter : il part des inscrits de la formation et des résultats de la recherche.
+STUDENTS_COUNT_FILTERS = {
+    STUDENTS_PROGRAM_FILTER: "s.matricule IN (SELECT matricule FROM enrollments WHERE program_id = ?)",
+    STUDENTS_SEARCH_FILTER: "s.rowid IN (SELECT rowid FROM students_fts WHERE students_fts MATCH ?)",
+}
+
+# Tri côté serveur : colonne affichée -> clés de tri (expression SQL, position dans la ligne).
+# La dernière clé (matricule) est unique, ce qui permet la pagination par clé ;
+# chaque tri est servi par un index de students (migrations 5 et 6), avec ou sans filtre.
+STUDENTS_SORT_KEYS = {
+    0: [("s.matricule", 0)],
+    1: [("s.last_name", 1), ("s.first_name", 2), ("s.matricule", 0)],
+    2: [("s.first_name", 2), ("s.last_name", 1), ("s.matricule", 0)],
+}
+
+COURSES_FOR_PROGRAM = """
+    SELECT c.id, c.name, c.credits, c.semester, c.has_two_grades, d.validation_grade
+    FROM courses c
+    JOIN programs p ON c.program_id = p.id
+    JOIN departments d ON p.department_id = d.id
+    WHERE c.program_id = ? AND c.year_of_study = ? AND c.semester = ?
+    ORDER BY c.name
+"""
+
+# CROSS JOIN : les étudiants sont lus dans l'ordre de l'index du tri, leur inscription est
+# cherchée dans idx_enrollments_program_year ; la page s'arrête sans trier la promotion.
+GRADES_FOR_COURSE = """
+    SELECT s.matricule, s.last_name, s.first_name, g.grade1, g.grade2, g.resit_grade
+    FROM students s
+    CROSS JOIN enrollments e ON e.matricule = s.matricule
+    LEFT JOIN grades g ON g.student_matricule = e.matricule AND g.course_id = ?
+                      AND g.academic_year_id = e.academic_year_id
+"""
+GRADES_FOR_COURSE_FILTER = "e.program_id = ? AND e.academic_year_id = ?"
+GRADES_COUNT = "SELECT COUNT(*) FROM enrollments e"
+GRADES_SORT_KEYS = {
+    0: [("s.matricule", 0)],
+    1: [("s.last_name", 1), ("s.first_name", 2), ("s.matricule", 0)],
+}
+
+# Saisie par promotion : une ligne par étudiant de la promotion et, pour chaque matière,
+# trois colonnes (note 1, note 2, rattrapage) ; voir cohort_grades_query.
+COHORT_GRADES = """
+    SELECT s.matricule, s.last_name, s.first_name{columns}
+    FROM enrollments e
+    JOIN students s ON s.matricule = e.matricule
+    LEFT JOIN grades g ON g.student_matricule = e.matricule AND g.academic_year_id = e.academic_year_id
+                      AND g.course_id IN ({courses})
+    WHERE e.program_id = ? AND e.academic_year_id = ? AND e.year_of_study = ?
+    GROUP BY e.matricule
+    ORDER BY s.last_name, s.first_name, s.matricule
+"""
+
+STUDENT_ACADEMIC_YEARS = """
+    SELECT DISTINCT ay.id, ay.name
+    FROM academic_years ay
+    JOIN enrollments e ON e.academic_year_id = ay.id
+    WHERE e.matricule = ?
+    ORDER BY ay.start_year DESC
+"""
+
+# Années d'inscription seules : les noms viennent des données de référence (reference.py).
+STUDENT_ENROLLMENT_YEARS = "SELECT academic_year_id FROM enrollments WHERE matricule = ?"
+
+BULLETIN_STUDENT = """
+    SELECT s.first_name, s.last_name, p.name, e.year_of_study
+    FROM students s
+    JOIN enrollments e ON e.matricule = s.matricule
+    LEFT JOIN programs p ON e.program_id = p.id
+    WHERE s.matricule = ? AND e.academic_year_id = ?
+"""
+
+BULLETIN_GRADES = """
+    SELECT c.name, c.credits, c.semester, c.has_two_grades, g.grade1, g.grade2, g.resit_grade, d.validation_grade
+    FROM grades g
+    JOIN courses c ON g.course_id = c.id
+    JOIN programs p ON c.program_id = p.id
+    JOIN departments d ON p.department_id = d.id
+    WHERE g.student_matricule = ? AND g.academic_year_id = ? AND c.year_of_study = ?
+"""
+BULLETIN_SEMESTER_FILTER = " AND c.semester = ?"
+BULLETIN_ORDER = " ORDER BY c.semester, c.name"
+
+# Résultats précalculés (table results) ; le semestre 0 correspond à l'année complète.
+STUDENT_RESULT = """
+    SELECT average, total_credits, validated_credits
+    FROM results
+    WHERE matricule = ? AND academic_year_id = ? AND semester = ?
+"""
+
+# Inscription d'un étudiant pour une année académique (enroll_student).
+ENROLLMENT_EXISTS = "SELECT 1 FROM enrollments WHERE matricule = ? AND academic_year_id = ?"
+ENROLLMENT_INSERT = """
+    INSERT INTO enrollments (matricule, academic_year_id, program_id, year_of_study)
+    VALUES (?, ?, ?, ?)
+"""
+
+# Saisie d'une note dans la grille (update_grade) ; {column} : grade1, grade2 ou resit_grade.
+GRADE_CELL_UPSERT = """
+    INSERT INTO grades (student_matricule, course_id, academic_year_id, {column})
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT (student_matricule, course_id, academic_year_id)
+    DO UPDATE SET {column} = excluded.{column}
+"""
+
+# Bulletins d'une promotion entière (programme, année académique, année d'étude).
+BATCH_BULLETIN_STUDENTS = """
+    SELECT s.matricule, s.last_name, s.first_name
+    FROM enrollments e
+    JOIN students s ON s.matricule = e.matricule
+    WHERE e.program_id = ? AND e.academic_year_id = ? AND e.year_of_study = ?
+    ORDER BY s.last_name, s.first_name, s.matricule
+"""
+
+BATCH_BULLETIN_GRADES = """
+    SELECT s.matricule, c.name, c.credits, c.semester, c.has_two_grades, g.grade1, g.grade2, g.resit_grade,
+           d.validation_grade
+    FROM enrollments e
+    JOIN students s ON s.matricule = e.matricule
+    JOIN grades g ON g.student_matricule = e.matricule AND g.academic_year_id = e.academic_year_id
+    JOIN courses c ON g.course_id = c.id
+    JOIN programs p ON c.program_id = p.id
+    JOIN departments d ON p.department_id = d.id
+    WHERE e.program_id = ? AND e.academic_year_id = ? AND e.year_of_study = ? AND c.year_of_study = e.year_of_study
+"""
+BATCH_BULLETIN_ORDER = " ORDER BY s.last_name, s.first_name, s.matricule, c.semester, c.name"
+
+BATCH_BULLETIN_RESULTS = """
+    SELECT r.matricule, r.average, r.total_credits, r.validated_credits
+    FROM enrollments e
+    JOIN results r ON r.matricule = e.matricule AND r.academic_year_id = e.academic_year_id
+    WHERE e.program_id = ? AND e.academic_year_id = ? AND e.year_of_study = ? AND r.semester = ?
+"""
+
+
+# Délibération d'une promotion : toutes les matières de l'année d'étude pour chaque
+# inscrit, notées ou non (une matière sans note compte comme défaillante).
+DELIBERATION_GRADES = """
+    SELECT e.matricule, s.last_name, s.first_name, c.semester, c.credits, c.has_two_grades,
+           g.grade1, g.grade2, g.resit_grade, d.validation_grade
+    FROM enrollments e
+    JOIN students s ON s.matricule = e.matricule
+    JOIN courses c ON c.program_id = e.program_id AND c.year_of_study = e.year_of_study
+    JOIN programs p ON p.id = e.program_id
+    JOIN departments d ON d.id = p.department_id
+    LEFT JOIN grades g ON g.student_matricule = e.matricule AND g.course_id = c.id
+                      AND g.academic_year_id = e.academic_year_id
+    WHERE e.program_id = ? AND e.academic_year_id = ? AND e.year_of_study = ?
+    ORDER BY e.matricule, c.semester, c.name
+"""
+
+
+def keyset_page(select, conditions, params, sort_keys, descending=False, after=None, limit=200):
+    """Construit la requête d'une page triée : les `limit` lignes qui suivent la ligne `after`.
+
+    after est la dernière ligne de la page précédente (None pour la première page) ;
+    la condition de reprise compare les clés de tri comme une seule valeur composée.
+    Renvoie (requête, paramètres).
+    """
+    conditions, params = list(conditions), list(params)
+    if after is not None:
+        columns = ", ".join(expression for expression, _ in sort_keys)
+        placeholders = ", ".join("?" * len(sort_keys))
+        conditions.append(f"({columns}) {'<' if descending else '>'} ({placeholders})")
+        params += [after[position] for _, position in sort_keys]
+    query = select
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    direction = " DESC" if descending else ""
+    query += " ORDER BY " + ", ".join(expression + direction for expression, _ in sort_keys)
+    query += f" LIMIT {int(limit)}"
+    return query, params
+
+
+def students_count_query(conditions):
+    """Requête du nombre d'étudiants pour les filtres d'une page de l'onglet Étudiants."""
+    conditions = [STUDENTS_COUNT_FILTERS.get(condition, condition) for condition in conditions]
+    return STUDENTS_COUNT + (" WHERE " + " AND ".join(conditions) if conditions else "")
+
+
+def cohort_grades_query(course_ids):
+    """Requête pivot des notes d'une promotion pour les matières course_ids, dans cet ordre.
+
+    Paramètres : (formation, année académique, année d'étude).
+    """
+    course_ids = [int(course_id) for course_id in course_ids]
+    columns = "".join(f",\n           MAX(CASE WHEN g.course_id = {course_id} THEN g.{column} END)"
+                      for course_id in course_ids for column in ("grade1", "grade2", "resit_grade"))
+    return COHORT_GRADES.format(columns=columns, courses=", ".join(map(str, course_ids)) or "NULL")
+
+
+def _page_checks(name, select, base_conditions, base_params, sort_keys):
+    """Première page et page suivante, pour chaque tri et chaque sens."""
+    checks = []
+    for column, keys in sort_keys.items():
+        sample_row = ("0",) * 10
+        for descending in (False, True):
+            for after in (None, sample_row):
+                query, params = keyset_page(select, base_conditions, base_params, keys, descending, after)
+                label = f"{name} (tri {column}{' desc' if descending else ''}{', suite' if after else ''})"
+                checks.append((label, query, tuple(params)))
+    return checks
+
+
+# Tris acceptés par check_query_plans : ils portent sur les lignes d'un seul étudiant ou
+# d'une promotion lue en entier, jamais sur une table.
+PLAN_ACCEPTED_SORTS = {
+    "CohortGradesDialog.load",
+    "deliberate",
+    "BulletinDialog.refresh_bulletin",
+    "export_bulletins (étudiants)",
+    "export_bulletins",
+}
+
+# Requêtes contrôlées par check_query_plans, avec des paramètres d'exemple.
+PLAN_CHECKS = [
+    *_page_checks("refresh_students_tab", STUDENTS, [], [], STUDENTS_SORT_KEYS),
+    *_page_checks("refresh_students_tab (formation)", STUDENTS, [STUDENTS_PROGRAM_FILTER], [1], STUDENTS_SORT_KEYS),
+    ("refresh_students_tab (recherche)",
+     keyset_page(STUDENTS, [STUDENTS_SEARCH_FILTER], ['"a"*'], STUDENTS_SORT_KEYS[1])[0], ('"a"*',)),
+    ("refresh_students_tab (nombre)", students_count_query([STUDENTS_PROGRAM_FILTER]), (1,)),
+    ("refresh_courses_list", COURSES_FOR_PROGRAM, (1, 1, 1)),
+    *_page_checks("refresh_grades_for_selected_course", GRADES_FOR_COURSE, [GRADES_FOR_COURSE_FILTER], [1, 1, 1],
+                  GRADES_SORT_KEYS),
+    ("CohortGradesDialog.load", cohort_grades_query([1, 2]), (1, 1, 1)),
+    ("BulletinDialog.load_academic_years", STUDENT_ENROLLMENT_YEARS, ("0",)),
+    ("deliberate", DELIBERATION_GRADES, (1, 1, 1)),
+    ("BulletinDialog.refresh_bulletin (étudiant)", BULLETIN_STUDENT, ("0", 1)),
+    ("BulletinDialog.refresh_bulletin",
+     BULLETIN_GRADES + BULLETIN_SEMESTER_FILTER + BULLETIN_ORDER, ("0", 1, 1, 1)),
+    ("BulletinDialog.refresh_bulletin (résultat)", STUDENT_RESULT, ("0", 1, 0)),
+    ("enroll_student", ENROLLMENT_EXISTS, ("0", 1)),
+    ("export_bulletins (étudiants)", BATCH_BULLETIN_STUDENTS, (1, 1, 1)),
+    ("export_bulletins (résultats)", BATCH_BULLETIN_RESULTS, (1, 1, 1, 0)),
+    ("export_bulletins",
+     BATCH_BULLETIN_GRADES + BULLETIN_SEMESTER_FILTER + BATCH_BULLETIN_ORDER, (1, 1, 1, 1)),
+]
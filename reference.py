@@ -0,0 +1,67 @@
+"""Données de référence gardées en mémoire : formations, années académiques, départements.
+
+Les listes déroulantes et les boîtes de dialogue les lisent ici plutôt que dans la base.
+Chaque table est chargée au premier accès, puis rechargée seulement après invalidate(),
+appelé par la fenêtre principale quand le bus de modifications signale un ajout, une
+modification ou une suppression.
+"""
+
+import threading
+
+from database import read_cursor
+import events
+
+_QUERIES = {
+    events.PROGRAMS: "SELECT id, name, duration_years, department_id FROM programs ORDER BY name",
+    events.ACADEMIC_YEARS: "SELECT id, name, start_year, end_year FROM academic_years ORDER BY start_year DESC",
+    events.DEPARTMENTS: "SELECT id, name, validation_grade FROM departments ORDER BY name",
+}
+# Supprimer un département supprime ses formations (ON DELETE CASCADE).
+_DEPENDENTS = {events.DEPARTMENTS: [events.PROGRAMS]}
+
+_cache = {}
+# Incrémenté par invalidate() : des lignes lues avant une invalidation ne sont pas remises en cache.
+_generations = dict.fromkeys(_QUERIES, 0)
+_lock = threading.Lock()
+
+
+def _rows(entity):
+    with _lock:
+        rows = _cache.get(entity)
+        generation = _generations[entity]
+    if rows is None:
+        with read_cursor() as cursor:
+            cursor.execute(_QUERIES[entity])
+            rows = cursor.fetchall()
+        with _lock:
+            if _generations[entity] == generation:
+                _cache[entity] = rows
+    return rows
+
+
+def programs():
+    """[(id, nom, durée en années, id du département)] par nom."""
+    return _rows(events.PROGRAMS)
+
+
+def academic_years():
+    """[(id, nom, année de début, année de fin)], la plus récente d'abord."""
+    return _rows(events.ACADEMIC_YEARS)
+
+
+def departments():
+    """[(id, nom, note de validation)] par nom."""
+    return _rows(events.DEPARTMENTS)
+
+
+def invalidate(entity=None):
+    """Oublie une table (et celles qui en dépendent) ; entity=None oublie tout.
+
+    Une entité qui n'est pas une donnée de référence est ignorée.
+    """
+    names = list(_QUERIES) if entity is None else [entity] + _DEPENDENTS.get(entity, [])
+    with _lock:
+        for name in names:
+            if name in _generations:
+                _generations[name] += 1
+                _cache.pop(name, None)
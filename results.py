@@ -0,0 +1,91 @@
+"""Table `results` : moyenne et crédits précalculés par étudiant, année académique et semestre.
+
+Le semestre 0 (WHOLE_YEAR) porte le résultat de l'année complète. Les lignes sont
+recalculées dans la transaction qui modifie les notes, ou tout ce qui entre dans
+leur calcul (crédits, note de validation du département, inscription).
+La suppression d'un étudiant ou d'une année académique les efface en cascade.
+"""
+
+from grade_engine import compute_final_grades, summarize
+
+WHOLE_YEAR = 0
+
+# Même périmètre que le bulletin : les matières de l'année d'étude de l'inscription,
+# dans l'ordre du bulletin pour que les sommes soient identiques.
+RESULTS_SOURCE = """
+    SELECT g.student_matricule, g.academic_year_id, c.semester, c.credits, c.has_two_grades,
+           g.grade1, g.grade2, g.resit_grade, d.validation_grade
+    FROM grades g
+    JOIN enrollments e ON e.matricule = g.student_matricule AND e.academic_year_id = g.academic_year_id
+    JOIN courses c ON g.course_id = c.id AND c.year_of_study = e.year_of_study
+    JOIN programs p ON c.program_id = p.id
+    JOIN departments d ON p.department_id = d.id
+"""
+RESULTS_ORDER = " ORDER BY g.student_matricule, g.academic_year_id, c.semester, c.name"
+
+RESULTS_INSERT = """
+    INSERT INTO results (matricule, academic_year_id, semester, average, total_credits, validated_credits)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# Nombre de matricules par requête « IN (...) ».
+_CHUNK_SIZE = 500
+
+
+def _compute_results(rows):
+    if not rows:
+        return []
+    matricules, years, semesters, credits, has_two_grades, grade1, grade2, resit_grade, validation_grade = zip(*rows)
+    finals, statuses = compute_final_grades(grade1, grade2, resit_grade, has_two_grades, validation_grade)
+    by_semester = summarize(zip(matricules, years, semesters), credits, finals, statuses)
+    by_year = summarize(zip(matricules, years), credits, finals, statuses)
+    result = [(matricule, year, semester, *values) for (matricule, year, semester), values in by_semester.items()]
+    result += [(matricule, year, WHOLE_YEAR, *values) for (matricule, year), values in by_year.items()]
+    return result
+
+
+def refresh_results(cursor, matricules=None, source=RESULTS_SOURCE):
+    """Recalcule les résultats des étudiants donnés (de tous les étudiants si None).
+
+    source remplace RESULTS_SOURCE pour un recalcul complet (migrations de l'ancien schéma).
+    """
+    if matricules is None:
+        cursor.execute("DELETE FROM results")
+        cursor.execute(source + RESULTS_ORDER)
+        cursor.executemany(RESULTS_INSERT, _compute_results(cursor.fetchall()))
+        return
+
+    matricules = sorted(set(matricules))
+    for start in range(0, len(matricules), _CHUNK_SIZE):
+        chunk = matricules[start:start + _CHUNK_SIZE]
+        placeholders = ", ".join("?" * len(chunk))
+        cursor.execute(f"DELETE FROM results WHERE matricule IN ({placeholders})", chunk)
+        cursor.execute(RESULTS_SOURCE + f" WHERE g.student_matricule IN ({placeholders})" + RESULTS_ORDER, chunk)
+        cursor.executemany(RESULTS_INSERT, _compute_results(cursor.fetchall()))
+
+
+def students_of_course(cursor, course_id):
+    """Matricules ayant une note dans la matière (à relever avant de la modifier ou supprimer)."""
+    cursor.execute("SELECT DISTINCT student_matricule FROM grades WHERE course_id = ?", (course_id,))
+    return [matricule for (matricule,) in cursor.fetchall()]
+
+
+def students_of_program(cursor, program_id):
+    cursor.execute("""
+        SELECT DISTINCT g.student_matricule
+        FROM courses c
+        JOIN grades g ON g.course_id = c.id
+        WHERE c.program_id = ?
+    """, (program_id,))
+    return [matricule for (matricule,) in cursor.fetchall()]
+
+
+def students_of_department(cursor, department_id):
+    cursor.execute("""
+        SELECT DISTINCT g.student_matricule
+        FROM programs p
+        JOIN courses c ON c.program_id = p.id
+        JOIN grades g ON g.course_id = c.id
+        WHERE p.department_id = ?
+    """, (department_id,))
+    return [matricule for (matricule,) in cursor.fetchall()]
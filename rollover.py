@@ -0,0 +1,142 @@
+"""Passage d'année : réinscription de toute une formation dans l'année académique suivante.
+
+Chaque inscrit de la formation pour l'année de départ reçoit la décision du jury
+(mêmes règles que deliberation.decision) calculée en SQL à partir de la table results
+et des crédits des matières de son année d'étude :
+
+* admis, ou admis avec dettes : inscrit en année d'étude suivante ;
+* ajourné : réinscrit dans la même année d'étude ;
+* diplômé ou défaillant (aucune note finale dans les matières de l'année) : pas de nouvelle inscription.
+
+Les étudiants déjà inscrits pour l'année d'arrivée sont laissés tels quels. L'aperçu
+(preview_rollover) et l'enregistrement (apply_rollover) partagent la même requête ;
+l'enregistrement est un seul INSERT … SELECT, dans une transaction.
+
+    python3 cli.py passage --formation "Licence TIC" --annee 2024-2025 --simulation
+"""
+
+from database import operation, read_cursor, write
+from deliberation import ABSENT, ADMITTED, CONDITIONAL, CONDITIONAL_CREDIT_RATIO, GRADUATED, REPEAT
+from results import WHOLE_YEAR, refresh_results
+import reference
+
+
+def _literal(text):
+    return "'" + text.replace("'", "''") + "'"
+
+
+# Paramètres : (formation, année d'arrivée, WHOLE_YEAR, formation, année de départ, CONDITIONAL_CREDIT_RATIO).
+ROLLOVER_COHORT = """
+    WITH year_credits AS (
+        SELECT year_of_study, SUM(credits) AS credits
+        FROM courses WHERE program_id = ? GROUP BY year_of_study
+    ), cohort AS (
+        SELECT e.matricule, e.year_of_study, r.average,
+               COALESCE(r.validated_credits, 0) AS validated_credits, COALESCE(y.credits, 0) AS total_credits,
+               e.year_of_study >= p.duration_years AS final_year, n.matricule IS NOT NULL AS already_enrolled,
+               -- Comme deliberation : au moins une matière de l'année avec une note finale.
+               EXISTS (
+                   SELECT 1 FROM grades g JOIN courses c ON c.id = g.course_id
+                   WHERE g.student_matricule = e.matricule AND g.academic_year_id = e.academic_year_id
+                     AND c.program_id = e.program_id AND c.year_of_study = e.year_of_study
+                     AND g.grade1 IS NOT NULL AND (NOT c.has_two_grades OR g.grade2 IS NOT NULL)
+               ) AS graded
+        FROM enrollments e
+        JOIN programs p ON p.id = e.program_id
+        LEFT JOIN year_credits y ON y.year_of_study = e.year_of_study
+        LEFT JOIN enrollments n ON n.matricule = e.matricule AND n.academic_year_id = ?
+        LEFT JOIN results r ON r.matricule = e.matricule AND r.academic_year_id = e.academic_year_id
+                           AND r.semester = ?
+        WHERE e.program_id = ? AND e.academic_year_id = ?
+    ), decisions AS (
+        SELECT *, CASE
+                      WHEN NOT graded THEN {absent}
+                      WHEN validated_credits >= total_credits THEN
+                          CASE WHEN final_year THEN {graduated} ELSE {admitted} END
+                      WHEN NOT final_year AND validated_credits >= ? * total_credits THEN {conditional}
+                      ELSE {repeat}
+                  END AS decision
+        FROM cohort
+    ), moves AS (
+        SELECT *, CASE
+                      WHEN already_enrolled THEN NULL
+                      WHEN decision IN ({admitted}, {conditional}) THEN year_of_study + 1
+                      WHEN decision = {repeat} THEN year_of_study
+                  END AS next_year_of_study
+        FROM decisions
+    )
+""".format(absent=_literal(ABSENT), graduated=_literal(GRADUATED), admitted=_literal(ADMITTED),
+           conditional=_literal(CONDITIONAL), repeat=_literal(REPEAT))
+
+ROLLOVER_PREVIEW = ROLLOVER_COHORT + """
+    SELECT m.matricule, s.last_name, s.first_name, m.year_of_study, CASE WHEN m.graded THEN m.average END,
+           m.validated_credits, m.total_credits, m.decision, m.already_enrolled, m.next_year_of_study
+    FROM moves m
+    JOIN students s ON s.matricule = m.matricule
+    ORDER BY m.year_of_study, s.last_name, s.first_name, m.matricule
+"""
+
+# Paramètres : ceux de ROLLOVER_COHORT, puis (année d'arrivée, formation).
+ROLLOVER_INSERT = ROLLOVER_COHORT + """
+    INSERT INTO enrollments (matricule, academic_year_id, program_id, year_of_study)
+    SELECT matricule, ?, ?, next_year_of_study FROM moves WHERE next_year_of_study IS NOT NULL
+"""
+
+# Étudiants de la formation déjà notés pour l'année d'arrivée : leurs résultats dépendent de l'inscription.
+GRADED_IN_TARGET_YEAR = """
+    SELECT DISTINCT g.student_matricule
+    FROM enrollments n
+    JOIN grades g ON g.student_matricule = n.matricule AND g.academic_year_id = n.academic_year_id
+    WHERE n.academic_year_id = ? AND n.program_id = ?
+"""
+
+
+def _params(program_id, source_year_id, target_year_id):
+    return (program_id, target_year_id, WHOLE_YEAR, program_id, source_year_id, CONDITIONAL_CREDIT_RATIO)
+
+
+def next_academic_year(academic_year_id):
+    """Id de l'année académique qui commence un an après academic_year_id, ou None."""
+    years = reference.academic_years()
+    start = next((start_year for year_id, _, start_year, _ in years if year_id == academic_year_id), None)
+    return next((year_id for year_id, _, start_year, _ in years if start is not None and start_year == start + 1),
+                None)
+
+
+def preview_rollover(program_id, source_year_id, target_year_id):
+    """Aperçu du passage, sans rien enregistrer.
+
+    Renvoie {'students': [(matricule, nom, prénom, année d'étude, moyenne, crédits validés,
+    crédits, décision, déjà inscrit, nouvelle année d'étude ou None)], 'counts': {décision: nombre},
+    'to_enroll': nombre de nouvelles inscriptions}.
+    """
+    with read_cursor() as cursor:
+        cursor.execute(ROLLOVER_PREVIEW, _params(program_id, source_year_id, target_year_id))
+        students = cursor.fetchall()
+    counts = {}
+    for student in students:
+        counts[student[7]] = counts.get(student[7], 0) + 1
+    return {
+        'students': students,
+        'counts': counts,
+        'to_enroll': sum(1 for student in students if student[9] is not None),
+    }
+
+
+@operation
+def insert_rollover(cursor, program_id, source_year_id, target_year_id):
+    """Crée les inscriptions du passage dans la transaction du curseur ; renvoie leur nombre."""
+    cursor.execute(ROLLOVER_INSERT, _params(program_id, source_year_id, target_year_id) + (target_year_id, program_id))
+    # rowcount n'est pas renseigné pour une instruction commençant par WITH.
+    cursor.execute("SELECT changes()")
+    enrolled = cursor.fetchone()[0]
+    cursor.execute(GRADED_IN_TARGET_YEAR, (target_year_id, program_id))
+    refresh_results(cursor, [matricule for (matricule,) in cursor.fetchall()])
+    return enrolled
+
+
+def apply_rollover(program_id, source_year_id, target_year_id):
+    """Enregistre le passage en une transaction ; renvoie le nombre d'inscriptions créées."""
+    if source_year_id == target_year_id:
+        raise ValueError("L'année d'arrivée doit être différente de l'année de départ.")
+    return write(insert_rollover, program_id, source_year_id, target_year_id)
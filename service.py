@@ -0,0 +1,489 @@
+"""Service HTTP/JSON local : plusieurs postes partagent une même base sans ouvrir le fichier eux-mêmes.
+
+    python3 service.py --port 8765 --pool 4
+    GESTION_SCOLAIRE_TOKEN=secret python3 service.py --host 192.168.1.10
+    GESTION_SCOLAIRE_API=http://192.168.1.10:8765 GESTION_SCOLAIRE_TOKEN=secret python3 main.py
+
+Par défaut le service n'écoute que sur 127.0.0.1. Sur une autre adresse, un jeton partagé
+(--token ou GESTION_SCOLAIRE_TOKEN) est obligatoire : toute requête sans l'en-tête
+« Authorization: Bearer <jeton> » est refusée (401).
+
+Les lectures s'exécutent dans un pool de threads, chacun avec sa connexion en lecture
+seule ; les écritures passent par le thread d'écriture de database.py. Chaque réponse
+de lecture porte un ETag qui change dès qu'une transaction est validée : un client qui
+renvoie If-None-Match reçoit 304 sans que la requête soit exécutée.
+
+Ressources (JSON) :
+    GET  /programs, /academic-years
+    GET  /students?program=&q=&sort=last_name|first_name|matricule&order=asc|desc&limit=&after=
+    GET  /students/count?program=&q=
+    GET  /students/{matricule}/academic-years
+    GET  /courses?program=&year_of_study=&semester=
+    GET  /grades?course=&year=&sort=last_name|matricule&order=&limit=&after=
+    GET  /grades/count?course=&year=
+    GET  /bulletins/{matricule}?year=&semester=
+    PUT  /grades/{matricule}/{course}/{year}      {"column": "grade1", "value": 12.5}
+    POST /enrollments                              {"matricule", "program", "academic_year", "year_of_study"}
+
+Application de bureau (service_client.py) :
+    POST /sql/query                  {"sql", "params"} : lecture seule, seuls les SELECT sont autorisés
+    POST /operations/{nom}           {"args": [...]} : opération d'écriture nommée (database.operation),
+                                     par exemple mutations.add_student, exécutée en une seule tâche
+                                     du thread d'écriture ; renvoie {"result"}
+"""
+
+import argparse
+import asyncio
+import base64
+import hmac
+import inspect
+import ipaddress
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from bulletins import student_bulletin
+from database import close_all, get_connection, open_connection, operation_named, read_cursor, submit_write
+from enrollments import enroll
+from functions import fts_match_expression, init_db
+from grades import GRADE_COLUMNS, parse_grade, save_grade
+import queries
+# Modules qui déclarent les opérations d'écriture exécutables par /operations.
+import intake  # noqa: F401
+import mutations  # noqa: F401
+import rollover  # noqa: F401
+
+# Taille par défaut et maximale d'une page de /students et /grades.
+PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+STUDENT_SORTS = {"matricule": 0, "last_name": 1, "first_name": 2}
+GRADE_SORTS = {"matricule": 0, "last_name": 1}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _encode_after(row):
+    return base64.urlsafe_b64encode(json.dumps(row).encode()).decode()
+
+
+def _decode_after(token):
+    try:
+        return json.loads(base64.urlsafe_b64decode(token.encode()))
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, "Paramètre after invalide.")
+
+
+def _integer(query, name, required=True):
+    value = query.get(name)
+    if value is None or value == "":
+        if required:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Paramètre {name} manquant.")
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Paramètre {name} invalide : {value}.")
+
+
+def _sort(query, choices):
+    sort = query.get('sort') or "last_name"
+    if sort not in choices:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Tri inconnu : {sort}.")
+    order = query.get('order') or "asc"
+    if order not in ("asc", "desc"):
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"Ordre inconnu : {order}.")
+    return choices[sort], order == "desc"
+
+
+def _page(cursor, select, conditions, params, sort_keys, descending, query, columns):
+    limit = min(_integer(query, 'limit', required=False) or PAGE_SIZE, MAX_PAGE_SIZE)
+    after = _decode_after(query['after']) if query.get('after') else None
+    sql, sql_params = queries.keyset_page(select, conditions, params, sort_keys, descending, after, limit)
+    cursor.execute(sql, sql_params)
+    rows = cursor.fetchall()
+    return {
+        'items': [dict(zip(columns, row)) for row in rows],
+        'next': _encode_after(rows[-1]) if len(rows) == limit else None,
+    }
+
+
+def _rows(cursor, sql, params, columns):
+    cursor.execute(sql, params)
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+# Lectures : exécutées dans le pool, sur la connexion en lecture seule du thread.
+
+def get_programs(cursor, query):
+    return _rows(cursor, "SELECT id, name, duration_years, department_id FROM programs ORDER BY name", (),
+                 ("id", "name", "duration_years", "department_id"))
+
+
+def get_academic_years(cursor, query):
+    return _rows(cursor, "SELECT id, name, start_year, end_year FROM academic_years ORDER BY start_year DESC", (),
+                 ("id", "name", "start_year", "end_year"))
+
+
+def _student_filters(query):
+    conditions, params = [], []
+    program_id = _integer(query, 'program', required=False)
+    if program_id is not None:
+        conditions.append(queries.STUDENTS_PROGRAM_FILTER)
+        params.append(program_id)
+    match = fts_match_expression(query.get('q', ""))
+    if match:
+        conditions.append(queries.STUDENTS_SEARCH_FILTER)
+        params.append(match)
+    return conditions, params
+
+
+def get_students(cursor, query):
+    conditions, params = _student_filters(query)
+    sort, descending = _sort(query, STUDENT_SORTS)
+    return _page(cursor, queries.STUDENTS, conditions, params, queries.STUDENTS_SORT_KEYS[sort], descending, query,
+                 ("matricule", "last_name", "first_name", "program", "academic_year", "year_of_study"))
+
+
+def get_students_count(cursor, query):
+    conditions, params = _student_filters(query)
+    cursor.execute(queries.students_count_query(conditions), params)
+    return {'count': cursor.fetchone()[0]}
+
+
+def get_student_academic_years(cursor, query, matricule):
+    return _rows(cursor, queries.STUDENT_ACADEMIC_YEARS, (matricule,), ("id", "name"))
+
+
+def get_courses(cursor, query):
+    params = (_integer(query, 'program'), _integer(query, 'year_of_study'), _integer(query, 'semester'))
+    return _rows(cursor, queries.COURSES_FOR_PROGRAM, params,
+                 ("id", "name", "credits", "semester", "has_two_grades", "validation_grade"))
+
+
+def _course_program(cursor, course_id):
+    cursor.execute("SELECT program_id FROM courses WHERE id = ?", (course_id,))
+    row = cursor.fetchone()
+    if row is None:
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"Matière inconnue : {course_id}.")
+    return row[0]
+
+
+def get_grades(cursor, query):
+    course_id, academic_year_id = _integer(query, 'course'), _integer(query, 'year')
+    sort, descending = _sort(query, GRADE_SORTS)
+    params = [course_id, _course_program(cursor, course_id), academic_year_id]
+    return _page(cursor, queries.GRADES_FOR_COURSE, [queries.GRADES_FOR_COURSE_FILTER], params,
+                 queries.GRADES_SORT_KEYS[sort], descending, query,
+                 ("matricule", "last_name", "first_name", "grade1", "grade2", "resit_grade"))
+
+
+def get_grades_count(cursor, query):
+    course_id, academic_year_id = _integer(query, 'course'), _integer(query, 'year')
+    cursor.execute(queries.GRADES_COUNT + " WHERE " + queries.GRADES_FOR_COURSE_FILTER,
+                   (_course_program(cursor, course_id), academic_year_id))
+    return {'count': cursor.fetchone()[0]}
+
+
+def get_bulletin(cursor, query, matricule):
+    bulletin = student_bulletin(matricule, _integer(query, 'year'), _integer(query, 'semester', required=False))
+    if bulletin is None:
+        raise HTTPError(HTTPStatus.NOT_FOUND, "Aucune inscription trouvée pour cet étudiant cette année-là.")
+    bulletin['rows'] = [dict(zip(("semester", "course", "final_grade", "status", "credits"), row))
+                        for row in bulletin['rows']]
+    return bulletin
+
+
+def sql_query(cursor, body):
+    cursor.execute(body['sql'], body.get('params', ()))
+    return {'rows': cursor.fetchall()}
+
+
+# Actions permises sur les connexions du pool de lecture (sqlite3 set_authorizer) : ni écriture,
+# ni PRAGMA, ni ATTACH, quelle que soit la requête envoyée à /sql/query.
+_READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+
+
+def _authorize_read(action, arg1, *_):
+    if action in _READ_ACTIONS:
+        return sqlite3.SQLITE_OK
+    # Ouverture de la table FTS5 (students_fts) : déclaration de son schéma et lecture de data_version.
+    if (action, arg1) in ((sqlite3.SQLITE_UPDATE, "sqlite_master"), (sqlite3.SQLITE_PRAGMA, "data_version")):
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+def _init_reader():
+    # Le pool de lecture ne peut pas écrire : seules les écritures du thread d'écriture modifient la base.
+    conn = get_connection()
+    conn.execute("PRAGMA query_only = ON")
+    conn.set_authorizer(_authorize_read)
+
+
+def _run_read(handler, *args):
+    with read_cursor(f"service.{handler.__name__}") as cursor:
+        return handler(cursor, *args)
+
+
+class Service:
+    """Routage des requêtes HTTP ; lectures dans le pool, écritures dans le thread d'écriture."""
+
+    def __init__(self, pool_size=4, token=None):
+        self.token = token
+        self.readers = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="sqlite-reader",
+                                          initializer=_init_reader)
+        # PRAGMA data_version change à chaque transaction validée par une autre connexion.
+        self._watch = open_connection()
+        self._watch_lock = threading.Lock()
+        self._nonce = os.urandom(4).hex()
+        self.routes = [
+            ("GET", r"/programs", self.read, get_programs),
+            ("GET", r"/academic-years", self.read, get_academic_years),
+            ("GET", r"/students", self.read, get_students),
+            ("GET", r"/students/count", self.read, get_students_count),
+            ("GET", r"/students/([^/]+)/academic-years", self.read, get_student_academic_years),
+            ("GET", r"/courses", self.read, get_courses),
+            ("GET", r"/grades", self.read, get_grades),
+            ("GET", r"/grades/count", self.read, get_grades_count),
+            ("GET", r"/bulletins/([^/]+)", self.read, get_bulletin),
+            ("PUT", r"/grades/([^/]+)/(\d+)/(\d+)", self.put_grade, None),
+            ("POST", r"/enrollments", self.post_enrollment, None),
+            ("POST", r"/sql/query", self.read_sql, None),
+            ("POST", r"/operations/([\w.]+)", self.run_operation, None),
+        ]
+
+    def close(self):
+        self.readers.shutdown()
+        self._watch.close()
+
+    def etag(self):
+        with self._watch_lock:
+            version = self._watch.execute("PRAGMA data_version").fetchone()[0]
+        return f'"{self._nonce}-{version}"'
+
+    async def dispatch(self, method, target, headers, body):
+        """Renvoie (statut, en-têtes, charge utile JSON ou None)."""
+        if self.token is not None and not hmac.compare_digest(headers.get('authorization', "").encode(),
+                                                              f"Bearer {self.token}".encode()):
+            raise HTTPError(HTTPStatus.UNAUTHORIZED, "Jeton d'accès absent ou invalide.")
+        url = urlsplit(target)
+        path = url.path.rstrip("/") or "/"
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        allowed = False
+        for route_method, pattern, handler, reader in self.routes:
+            match = re.fullmatch(pattern, path)
+            if not match:
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+            args = [unquote(group) for group in match.groups()]
+            if reader is not None:
+                return await handler(headers, reader, query, *args)
+            return await handler(headers, self._json(body), *args)
+        if allowed:
+            raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED, "Méthode non autorisée.")
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"Ressource inconnue : {path}.")
+
+    @staticmethod
+    def _json(body):
+        if not body:
+            return {}
+        try:
+            data = json.loads(body)
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Corps JSON invalide.")
+        if not isinstance(data, dict):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Le corps doit être un objet JSON.")
+        return data
+
+    async def _cached_read(self, headers, handler, *args):
+        # La version est lue avant la requête : au pire l'ETag est plus ancien que les données,
+        # ce qui ne fait que provoquer une relecture inutile.
+        etag = self.etag()
+        if headers.get('if-none-match') == etag:
+            return HTTPStatus.NOT_MODIFIED, {'ETag': etag}, None
+        loop = asyncio.get_running_loop()
+        payload = await loop.run_in_executor(self.readers, _run_read, handler, *args)
+        return HTTPStatus.OK, {'ETag': etag}, payload
+
+    async def read(self, headers, handler, query, *args):
+        return await self._cached_read(headers, handler, query, *args)
+
+    async def read_sql(self, headers, body):
+        if 'sql' not in body:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Champ sql manquant.")
+        return await self._cached_read(headers, sql_query, body)
+
+    async def _write(self, work, *args):
+        return await asyncio.wrap_future(submit_write(work, *args))
+
+    async def put_grade(self, headers, body, matricule, course_id, academic_year_id):
+        column = body.get('column')
+        if column not in GRADE_COLUMNS:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Colonne inconnue : {column}.")
+        try:
+            value = parse_grade(body.get('value'))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "La note doit être un nombre entre 0 et 20.")
+        await self._write(save_grade, matricule, int(course_id), int(academic_year_id), column, value)
+        return HTTPStatus.OK, {}, {'matricule': matricule, 'course': int(course_id),
+                                   'academic_year': int(academic_year_id), column: value}
+
+    async def post_enrollment(self, headers, body):
+        try:
+            values = (str(body['matricule']), int(body['program']), int(body['academic_year']),
+                      int(body['year_of_study']))
+        except (KeyError, TypeError, ValueError):
+            raise HTTPError(HTTPStatus.BAD_REQUEST,
+                            "Champs attendus : matricule, program, academic_year, year_of_study.")
+        refusal = await self._write(enroll, *values)
+        if refusal:
+            title, message = refusal
+            return HTTPStatus.CONFLICT, {}, {'error': message, 'title': title}
+        matricule, program_id, academic_year_id, year_of_study = values
+        return HTTPStatus.CREATED, {}, {'matricule': matricule, 'program': program_id,
+                                        'academic_year': academic_year_id, 'year_of_study': year_of_study}
+
+    async def run_operation(self, headers, body, name):
+        work = operation_named(name)
+        if work is None:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Opération inconnue : {name}.")
+        args = body.get('args', [])
+        if not isinstance(args, list):
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Le champ args doit être une liste.")
+        try:
+            inspect.signature(work).bind(None, *args)
+        except TypeError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Arguments invalides pour {name}.")
+        # Une seule tâche du thread d'écriture, sans aller-retour avec le client pendant la transaction.
+        return HTTPStatus.OK, {}, {'result': await self._write(work, *args)}
+
+
+def _error_payload(error):
+    return {'error': str(error), 'type': type(error).__name__}
+
+
+async def _read_request(reader):
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    method, target, version = request_line.decode('latin-1').split()
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode('latin-1').partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get('content-length') or 0)
+    if length > MAX_BODY_SIZE:
+        raise ValueError("corps trop volumineux")
+    body = await reader.readexactly(length) if length else b""
+    return method, target, version, headers, body
+
+
+def _response(status, headers, payload, keep_alive):
+    body = b"" if payload is None else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}",
+             f"Content-Length: {len(body)}",
+             f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    if payload is not None:
+        lines.append("Content-Type: application/json; charset=utf-8")
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body
+
+
+def make_handler(service, log=sys.stderr):
+    async def handle(reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except (ValueError, asyncio.IncompleteReadError):
+                    writer.write(_response(HTTPStatus.BAD_REQUEST, {}, {'error': "Requête invalide."}, False))
+                    break
+                if request is None:
+                    break
+                method, target, version, headers, body = request
+                keep_alive = version == "HTTP/1.1" and headers.get('connection', "").lower() != "close"
+                start = time.perf_counter()
+                try:
+                    status, response_headers, payload = await service.dispatch(method, target, headers, body)
+                except HTTPError as e:
+                    status, response_headers, payload = e.status, {}, _error_payload(e)
+                except ValueError as e:
+                    status, response_headers, payload = HTTPStatus.BAD_REQUEST, {}, _error_payload(e)
+                except sqlite3.Error as e:
+                    status, response_headers, payload = HTTPStatus.UNPROCESSABLE_ENTITY, {}, _error_payload(e)
+                except Exception as e:
+                    status, response_headers, payload = HTTPStatus.INTERNAL_SERVER_ERROR, {}, _error_payload(e)
+                duration = (time.perf_counter() - start) * 1000
+                response_headers['Server-Timing'] = f"app;dur={duration:.2f}"
+                print(f"{method} {target} {status.value} {duration:.1f} ms", file=log, flush=True)
+                writer.write(_response(status, response_headers, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return handle
+
+
+def _is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+async def serve(host, port, pool_size, token=None):
+    service = Service(pool_size, token)
+    server = await asyncio.start_server(make_handler(service), host, port)
+    print(f"Service à l'écoute sur http://{host}:{port} ({pool_size} lecteur(s))", file=sys.stderr, flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Service HTTP/JSON de la base de gestion scolaire.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pool", type=int, default=4, help="connexions de lecture simultanées")
+    parser.add_argument("--token", default=os.environ.get("GESTION_SCOLAIRE_TOKEN") or None,
+                        help="jeton partagé exigé des clients (par défaut : GESTION_SCOLAIRE_TOKEN)")
+    args = parser.parse_args(argv)
+    if args.token is None and not _is_loopback(args.host):
+        parser.error("un jeton (--token ou GESTION_SCOLAIRE_TOKEN) est obligatoire pour écouter "
+                     f"ailleurs que sur 127.0.0.1 ({args.host}).")
+    init_db()
+    try:
+        asyncio.run(serve(args.host, args.port, args.pool, args.token))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_all()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+"""Client du service HTTP (service.py) pour l'application de bureau.
+
+database.use_service(url) fait passer read_cursor, write et submit_write par ce client :
+les curseurs distants ont l'interface des curseurs sqlite3 utilisée par l'application
+(en lecture seule), une écriture est l'appel d'une opération nommée (database.operation)
+exécutée en une requête par le service, et les erreurs reviennent sous forme d'exceptions
+sqlite3. Le jeton partagé du service est lu dans GESTION_SCOLAIRE_TOKEN.
+"""
+
+import http.client
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+# Nombre de réponses de lecture gardées avec leur ETag, et taille maximale de chacune.
+CACHE_SIZE = 256
+CACHE_MAX_ROWS = 5000
+TIMEOUT = 60
+
+_ERRORS = {cls.__name__: cls for cls in (sqlite3.Error, sqlite3.DatabaseError, sqlite3.IntegrityError,
+                                           sqlite3.OperationalError, sqlite3.ProgrammingError,
+                                           sqlite3.DataError, sqlite3.InterfaceError,
+                                           sqlite3.InternalError, sqlite3.NotSupportedError, ValueError)}
+
+
+class _RemoteConnection:
+    """Ce que l'application attend de cursor.connection ; l'annulation reste locale."""
+
+    def set_progress_handler(self, handler, n):
+        pass
+
+
+class _Cursor:
+    """Curseur dont les lignes sont déjà reçues ; `run(op, sql, params)` renvoie la réponse du service."""
+
+    connection = _RemoteConnection()
+
+    def __init__(self, run):
+        self._run = run
+        self._rows = []
+        self._position = 0
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def _load(self, result):
+        self._rows = result.get('rows', [])
+        self._position = 0
+        self.rowcount = result.get('rowcount', -1)
+        self.lastrowid = result.get('lastrowid')
+        return self
+
+    def execute(self, sql, params=()):
+        return self._load(self._run("execute", sql, params))
+
+    def executemany(self, sql, seq_of_params):
+        return self._load(self._run("executemany", sql, [list(params) for params in seq_of_params]))
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        self._position += 1
+        return tuple(self._rows[self._position - 1])
+
+    def fetchmany(self, size=1):
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return [tuple(row) for row in rows]
+
+    def fetchall(self):
+        return self.fetchmany(len(self._rows))
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._rows = []
+
+
+class ServiceClient:
+    def __init__(self, url, token=None):
+        parts = urlsplit(url)
+        if parts.scheme != "http" or not parts.hostname:
+            raise ValueError(f"Adresse du service invalide : {url}")
+        self.host, self.port = parts.hostname, parts.port or 80
+        token = token if token is not None else os.environ.get("GESTION_SCOLAIRE_TOKEN")
+        self._auth = {'Authorization': f"Bearer {token}"} if token else {}
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        # Un seul thread pour submit_write : les écritures différées restent dans l'ordre.
+        self._writes = ThreadPoolExecutor(max_workers=1, thread_name_prefix="service-writer")
+
+    def close(self):
+        self._writes.shutdown()
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local.__dict__.clear()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=TIMEOUT)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def request(self, method, path, payload=None, headers=None):
+        """Envoie une requête JSON ; renvoie (statut, en-têtes, réponse décodée)."""
+        body = None if payload is None else json.dumps(payload).encode('utf-8')
+        headers = dict(headers or {}, **self._auth,
+                       **({'Content-Type': "application/json"} if body is not None else {}))
+        for attempt in (1, 2):
+            conn = self._connection()
+            try:
+                conn.request(method, path, body, headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except ConnectionError as e:
+                # Connexion gardée ouverte puis fermée par le service : une seule nouvelle tentative.
+                conn.close()
+                if attempt == 2:
+                    raise sqlite3.OperationalError(f"Service injoignable : {e}")
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                raise sqlite3.OperationalError(f"Service injoignable : {e}")
+        result = json.loads(data) if data else None
+        if response.status >= 400:
+            error = _ERRORS.get((result or {}).get('type'), sqlite3.OperationalError)
+            raise error((result or {}).get('error', response.reason))
+        return response.status, response, result
+
+    def query(self, op, sql, params):
+        """Lecture en dehors d'une transaction, avec le cache ETag."""
+        if op != "execute":
+            raise sqlite3.ProgrammingError("Le service n'accepte que des lectures (écrire avec une opération nommée).")
+        payload = {'sql': sql, 'params': list(params)}
+        key = json.dumps(payload)
+        cached = self._cache.get(key)
+        headers = {'If-None-Match': cached[0]} if cached else {}
+        status, response, result = self.request("POST", "/sql/query", payload, headers)
+        with self._lock:
+            if status == 304 and cached:
+                self._cache.move_to_end(key)
+                return cached[1]
+            etag = response.getheader('ETag')
+            if etag and len(result['rows']) <= CACHE_MAX_ROWS:
+                self._cache[key] = (etag, result)
+                while len(self._cache) > CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        return result
+
+    def cursor(self):
+        return _Cursor(self.query)
+
+    def write(self, work, *args):
+        """Fait exécuter par le service l'opération nommée work avec ses arguments ; renvoie son résultat."""
+        name = getattr(work, "operation_name", None)
+        if name is None:
+            raise sqlite3.NotSupportedError(f"Écriture impossible à travers le service : {work.__qualname__} "
+                                            "n'est pas une opération nommée (database.operation).")
+        return self.request("POST", f"/operations/{name}", {'args': list(args)})[2]['result']
+
+    def submit_write(self, work, *args):
+        return self._writes.submit(self.write, work, *args)
@@ -0,0 +1,39 @@
+"""Temps de démarrage de l'application de bureau.
+
+    GESTION_SCOLAIRE_TIMING=1 python3 main.py
+
+Affiche sur la sortie d'erreur le temps écoulé entre le lancement et l'écran de
+connexion prêt, puis entre la validation de la connexion et le premier onglet affiché.
+Ce module est importé avant Qt pour que le lancement soit mesuré au plus tôt.
+"""
+
+import os
+import sys
+import time
+
+LAUNCHED = time.perf_counter()
+enabled = bool(os.environ.get("GESTION_SCOLAIRE_TIMING"))
+
+_marks = {}
+_reported = set()
+
+
+def mark(name):
+    """Note l'instant d'une étape (remplace une mesure précédente de la même étape)."""
+    _marks[name] = time.perf_counter()
+
+
+def elapsed(start, end):
+    """Durée en millisecondes entre deux étapes notées (start=None : depuis le lancement)."""
+    begin = LAUNCHED if start is None else _marks.get(start)
+    if begin is None or end not in _marks:
+        return None
+    return (_marks[end] - begin) * 1000
+
+
+def report(label, start, end, stream=None):
+    """Écrit « label : n ms » une seule fois, si la mesure est activée et que les deux étapes ont été notées."""
+    duration = elapsed(start, end)
+    if enabled and duration is not None and label not in _reported:
+        _reported.add(label)
+        print(f"[démarrage] {label} : {duration:.0f} ms", file=stream or sys.stderr, flush=True)
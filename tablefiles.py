@@ -0,0 +1,193 @@
+"""Lecture et écriture en flux de fichiers tabulaires CSV, XLSX ou JSON lines (imports, exports).
+
+Les lignes sont lues ou écrites une à une : un fichier de plusieurs dizaines de
+milliers de lignes n'est jamais chargé en entier. L'écriture XLSX n'a besoin
+d'aucun paquet supplémentaire (la lecture nécessite openpyxl).
+"""
+
+import csv
+import json
+import os
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+
+class TableFileError(Exception):
+    """Fichier illisible ou en-tête incomplet."""
+
+
+def _read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=";,\t")
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def _read_xlsx(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise TableFileError("La lecture des fichiers XLSX nécessite le paquet openpyxl.")
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield ["" if value is None else value for value in row]
+    finally:
+        workbook.close()
+
+
+def read_records(path, aliases, required=None):
+    """Itère sur les lignes (n° de ligne, {colonne: valeur}) d'un fichier CSV ou XLSX.
+
+    aliases associe chaque en-tête accepté (en minuscules) à un nom de colonne ;
+    les autres colonnes et les lignes vides sont ignorées. required associe les
+    colonnes obligatoires à leur libellé pour le message d'erreur.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        rows = _read_xlsx(path) if extension == '.xlsx' else _read_csv(path)
+        header = next(rows, None)
+        if header is None:
+            raise TableFileError("Le fichier est vide.")
+        columns = [aliases.get(str(name).strip().lower()) for name in header]
+        for column, label in (required or {}).items():
+            if column not in columns:
+                raise TableFileError(f"Colonne « {label} » introuvable dans l'en-tête.")
+        for line_number, row in enumerate(rows, start=2):
+            if not any(str(value).strip() for value in row):
+                continue
+            yield line_number, {column: value for column, value in zip(columns, row) if column}
+    except (OSError, UnicodeDecodeError, csv.Error, zipfile.BadZipFile) as e:
+        raise TableFileError(f"Lecture du fichier impossible : {e}")
+
+
+def cell_text(value):
+    """Texte d'une cellule ; un nombre entier lu dans un XLSX (matricule…) perd son « .0 »."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return "" if value is None else str(value).strip()
+
+
+# Nombre maximal de lignes d'une feuille Excel, en-tête compris.
+XLSX_MAX_ROWS = 1048576
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '</Relationships>'),
+}
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _xlsx_cell(value):
+    if value is None or value == "":
+        return "<c/>"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"<c><v>{value!r}</v></c>"
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(_XML_INVALID.sub("", str(value)))}</t></is></c>'
+
+
+def _write_xlsx(path, labels, rows):
+    count = 0
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+        for name, content in _XLSX_PARTS.items():
+            archive.writestr(name, content)
+        with archive.open("xl/worksheets/sheet1.xml", 'w') as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            sheet.write(("<row>" + "".join(map(_xlsx_cell, labels)) + "</row>").encode('utf-8'))
+            for row in rows:
+                count += 1
+                if count >= XLSX_MAX_ROWS:
+                    raise TableFileError(f"Un fichier XLSX est limité à {XLSX_MAX_ROWS - 1} lignes : "
+                                         "utiliser le format CSV ou JSON lines.")
+                sheet.write(("<row>" + "".join(map(_xlsx_cell, row)) + "</row>").encode('utf-8'))
+            sheet.write(b"</sheetData></worksheet>")
+    return count
+
+
+# Tampon d'écriture des exports (octets).
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+def _write_csv(path, labels, rows):
+    count = 0
+    # BOM écrit une fois puis encodeur UTF-8 natif (utf-8-sig réencode à chaque écriture) ;
+    # le module csv écrit None comme une cellule vide.
+    with open(path, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+        f.write("\ufeff")
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(labels)
+        writerow = writer.writerow
+        for row in rows:
+            writerow(row)
+            count += 1
+    return count
+
+
+def _write_jsonl(path, keys, rows):
+    count = 0
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+    with open(path, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE) as f:
+        for row in rows:
+            f.write(encode(dict(zip(keys, row))))
+            f.write("\n")
+            count += 1
+    return count
+
+
+# Extension -> (fonction d'écriture, libellé du format).
+WRITERS = {
+    '.csv': (_write_csv, "CSV"),
+    '.xlsx': (_write_xlsx, "XLSX"),
+    '.jsonl': (_write_jsonl, "JSON lines"),
+}
+
+
+def write_records(path, columns, rows):
+    """Écrit au fil de l'eau les lignes rows dans un fichier CSV, XLSX ou JSON lines (selon l'extension).
+
+    columns est la liste des (clé, libellé) : les libellés forment l'en-tête CSV et XLSX,
+    les clés nomment les champs de chaque objet JSON. Renvoie le nombre de lignes écrites ;
+    en cas d'erreur, le fichier incomplet est supprimé.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in WRITERS:
+        raise TableFileError(f"Format non pris en charge : {extension or path} (CSV, XLSX ou JSONL).")
+    writer = WRITERS[extension][0]
+    keys, labels = zip(*columns)
+    try:
+        return writer(path, keys if extension == '.jsonl' else labels, rows)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
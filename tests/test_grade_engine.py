@@ -0,0 +1,44 @@
+"""Le calcul NumPy de grade_engine doit donner exactement les résultats du calcul en Python pur."""
+
+import importlib.util
+import random
+import unittest
+
+import grade_engine
+
+
+def _grade(rng):
+    return None if rng.random() < 0.1 else rng.choice((rng.randint(0, 80) / 4, round(rng.uniform(0, 20), 3)))
+
+
+def _rows(count, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(count):
+        rows.append((rng.randrange(count // 8 + 1), rng.randint(1, 6), rng.random() < 0.5,
+                     _grade(rng), _grade(rng), None if rng.random() < 0.6 else _grade(rng),
+                     rng.choice((None, 10.0, 12.0))))
+    return rows
+
+
+@unittest.skipUnless(importlib.util.find_spec("numpy"), "NumPy n'est pas installé")
+class NumpyPathTest(unittest.TestCase):
+    def test_use_numpy_true_before_first_check(self):
+        # use_numpy=True demandé avant tout calcul : NumPy doit être importé à ce moment-là.
+        grade_engine.np, grade_engine._numpy_checked = None, False
+        finals, statuses = grade_engine.compute_final_grades([10.0], [14.0], [None], [True], [12.0], use_numpy=True)
+        self.assertEqual((finals, statuses), ([12.0], [grade_engine.VALIDATED]))
+
+    def test_same_results_as_python(self):
+        rows = _rows(50000)
+        self.assertEqual(grade_engine.compute_cohort(rows, use_numpy=True),
+                         grade_engine.compute_cohort(rows, use_numpy=False))
+
+    def test_empty_and_missing_grades(self):
+        for rows in ([], [(1, 3, True, None, None, None, None)], [(1, 0, False, 15.0, None, None, 12.0)]):
+            self.assertEqual(grade_engine.compute_cohort(rows, use_numpy=True),
+                             grade_engine.compute_cohort(rows, use_numpy=False))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,220 @@
+import sqlite3
+import threading
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from database import read_cursor
+import profiling
+import queries
+
+# Nombre de lignes envoyées à l'interface par signal.
+CHUNK_SIZE = 500
+# Nombre d'instructions SQLite entre deux vérifications d'annulation.
+CANCEL_CHECK_INTERVAL = 10000
+
+_pool = None
+
+
+def thread_pool():
+    """Pool de threads des requêtes ; chaque thread garde sa connexion SQLite."""
+    global _pool
+    if _pool is None:
+        _pool = QThreadPool()
+        _pool.setMaxThreadCount(4)
+        _pool.setExpiryTimeout(-1)
+    return _pool
+
+
+class QuerySignals(QObject):
+    rows = Signal(int, list)
+    failed = Signal(int, str)
+    done = Signal(int)
+
+
+class QueryWorker(QRunnable):
+    """Exécute une requête de lecture hors du thread graphique et en diffuse les lignes par paquets."""
+
+    def __init__(self, generation, query, params=(), site=None):
+        super().__init__()
+        self.generation = generation
+        self.query = query
+        self.params = params
+        self.site = site
+        self.signals = QuerySignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def run(self):
+        try:
+            if self._cancelled.is_set():
+                return
+            with read_cursor(self.site) as cursor:
+                cursor.connection.set_progress_handler(self._cancelled.is_set, CANCEL_CHECK_INTERVAL)
+                try:
+                    cursor.execute(self.query, self.params)
+                    while not self._cancelled.is_set():
+                        chunk = cursor.fetchmany(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        self.signals.rows.emit(self.generation, chunk)
+                finally:
+                    cursor.connection.set_progress_handler(None, 0)
+        except sqlite3.Error as e:
+            if not self._cancelled.is_set():
+                self.signals.failed.emit(self.generation, str(e))
+        finally:
+            self.signals.done.emit(self.generation)
+
+
+class QueryLoader(QObject):
+    """Charge les données d'une table en arrière-plan.
+
+    Chaque appel à load() annule la requête précédente : les lignes d'une
+    requête dépassée ne sont jamais transmises.
+    """
+
+    rows_ready = Signal(list)
+    failed = Signal(str)
+    loaded = Signal()
+    loading_changed = Signal(bool)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._generation = 0
+        self._current = None
+        self._running = {}
+
+    def load(self, query, params=()):
+        self.cancel()
+        self._generation += 1
+        # La requête est mesurée au nom de la méthode qui a demandé le chargement (profiling.py).
+        worker = QueryWorker(self._generation, query, tuple(params), profiling.call_site())
+        worker.signals.rows.connect(self._on_rows)
+        worker.signals.failed.connect(self._on_failed)
+        worker.signals.done.connect(self._on_done)
+        self._current = worker
+        self._running[self._generation] = worker
+        self.loading_changed.emit(True)
+        thread_pool().start(worker)
+
+    def cancel(self):
+        if self._current is not None:
+            self._current.cancel()
+            self._current = None
+            self.loading_changed.emit(False)
+
+    def _on_rows(self, generation, rows):
+        if generation == self._generation and self._current is not None:
+            self.rows_ready.emit(rows)
+
+    def _on_failed(self, generation, message):
+        if generation == self._generation and self._current is not None:
+            self._current = None
+            self.loading_changed.emit(False)
+            self.failed.emit(message)
+
+    def _on_done(self, generation):
+        self._running.pop(generation, None)
+        if generation == self._generation and self._current is not None:
+            self._current = None
+            self.loading_changed.emit(False)
+            self.loaded.emit()
+
+
+class KeysetPager(QObject):
+    """Charge une requête triée page par page (pagination par clé), en arrière-plan.
+
+    Chaque page reprend après la dernière ligne reçue : le coût d'une page ne dépend
+    pas de sa position, et seules les pages parcourues sont gardées en mémoire.
+    Le nombre total de lignes est compté à part (count_ready).
+    """
+
+    rows_ready = Signal(list)
+    count_ready = Signal(int)
+    failed = Signal(str)
+    loading_changed = Signal(bool)
+
+    def __init__(self, page_size, parent=None):
+        super().__init__(parent)
+        self.page_size = page_size
+        self._query = None
+        self._last_row = None
+        self._received = 0
+        self._loading = False
+        self._exhausted = True
+        self._loader = QueryLoader(self)
+        self._loader.rows_ready.connect(self._on_rows)
+        self._loader.loaded.connect(self._on_loaded)
+        self._loader.failed.connect(self._on_failed)
+        self._loader.loading_changed.connect(self.loading_changed)
+        self._count_loader = QueryLoader(self)
+        self._count_loader.rows_ready.connect(lambda rows: self.count_ready.emit(rows[0][0]))
+
+    def load(self, select, conditions, params, sort_keys, descending=False, count=None):
+        """Recommence à la première page ; count = (requête COUNT(*), paramètres) facultatif."""
+        self.cancel()
+        self._query = (select, conditions, params, sort_keys, descending)
+        self._last_row = None
+        self._exhausted = False
+        self._request_page()
+        if count is not None:
+            self._count_loader.load(*count)
+
+    def can_fetch_more(self):
+        return not (self._loading or self._exhausted)
+
+    def fetch_more(self):
+        if self.can_fetch_more():
+            self._request_page()
+
+    def cancel(self):
+        self._loader.cancel()
+        self._count_loader.cancel()
+        self._loading = False
+        self._exhausted = True
+
+    def _request_page(self):
+        select, conditions, params, sort_keys, descending = self._query
+        query, page_params = queries.keyset_page(select, conditions, params, sort_keys, descending,
+                                                 self._last_row, self.page_size)
+        self._received = 0
+        self._loading = True
+        self._loader.load(query, page_params)
+
+    def _on_rows(self, rows):
+        self._received += len(rows)
+        self._last_row = rows[-1]
+        self.rows_ready.emit(rows)
+
+    def _on_loaded(self):
+        self._loading = False
+        self._exhausted = self._received < self.page_size
+
+    def _on_failed(self, message):
+        self._loading = False
+        self._exhausted = True
+        self.failed.emit(message)
+
+
+class WriteWatcher(QObject):
+    """Rappelle on_success(résultat) ou on_error(exception) dans le thread graphique
+    quand une écriture confiée au thread d'écriture (database.submit_write) se termine."""
+
+    _done = Signal()
+
+    def __init__(self, future, on_success, on_error, parent=None):
+        super().__init__(parent)
+        self._future = future
+        self._on_success = on_success
+        self._on_error = on_error
+        self._done.connect(self._deliver)
+        future.add_done_callback(lambda _: self._done.emit())
+
+    def _deliver(self):
+        error = self._future.exception()
+        if error is None:
+            self._on_success(self._future.result())
+        else:
+            self._on_error(error)
+        self.deleteLater()